@@ -0,0 +1,120 @@
+# src/adaptive_scheduler.py
+import logging
+
+# Detection settings from most to least expensive; index 1 matches the static defaults
+DETECTION_LEVELS = (
+    {'detect_every': 3, 'scale': 0.75, 'upsample': 1},
+    {'detect_every': 5, 'scale': 0.5, 'upsample': 1},
+    {'detect_every': 8, 'scale': 0.5, 'upsample': 0},
+    {'detect_every': 12, 'scale': 0.4, 'upsample': 0},
+    {'detect_every': 20, 'scale': 0.3, 'upsample': 0},
+)
+# Minimum frames between two encodings of the same track
+ENCODING_LEVELS = (1, 2, 3, 5)
+
+
+class AdaptiveScheduler:
+    """
+    Holds one stream's per-frame cost inside a latency budget.
+
+    The loop reports the time spent in each stage (`record`) and the total
+    per frame (`frame_done`); both are smoothed with an exponential moving
+    average. When the frame cost exceeds the budget, the stage that costs
+    more steps one level down its ladder: detection trades stride,
+    downscale factor and HOG upsampling, encoding trades how often a track
+    may be re-encoded. When the cost stays below `recover_ratio` of the
+    budget, the most recent degradation is undone. Changes are at least
+    `cooldown` frames apart so every level is measured before the next.
+
+    Attributes:
+        budget: Target seconds per processed frame
+        detection_level: Index into `detection_levels`
+        encoding_level: Index into `encoding_levels`
+        frame_cost: Smoothed seconds per frame
+        stage_costs: Smoothed seconds per frame of each reported stage
+    """
+
+    def __init__(self, target_fps=30, detection_levels=DETECTION_LEVELS, encoding_levels=ENCODING_LEVELS,
+                 start_level=1, alpha=0.1, recover_ratio=0.6, cooldown=30):
+        self.logger = logging.getLogger(__name__)
+        self.budget = 1.0 / target_fps
+        self.detection_levels = detection_levels
+        self.encoding_levels = encoding_levels
+        self.detection_level = min(start_level, len(detection_levels) - 1)
+        self.encoding_level = 0
+        self.alpha = alpha
+        self.recover_ratio = recover_ratio
+        self.cooldown = cooldown
+        self.frame_cost = None
+        self.stage_costs = {}
+        self._frame_stages = {}
+        self._frames_since_change = 0
+        self._degraded = []
+
+    @property
+    def settings(self):
+        """Current knobs: detect_every, scale, upsample and encode_every"""
+        settings = dict(self.detection_levels[self.detection_level])
+        settings['encode_every'] = self.encoding_levels[self.encoding_level]
+        return settings
+
+    def _smooth(self, previous, value):
+        return value if previous is None else self.alpha * value + (1 - self.alpha) * previous
+
+    def record(self, stage, seconds):
+        """Add time spent in a stage ('detect' or 'encode') on the current frame"""
+        self._frame_stages[stage] = self._frame_stages.get(stage, 0.0) + seconds
+
+    def frame_done(self, seconds):
+        """
+        Close the current frame with its total cost
+        Returns: True if the settings changed
+        """
+        self.frame_cost = self._smooth(self.frame_cost, seconds)
+        for stage in set(self.stage_costs) | set(self._frame_stages):
+            self.stage_costs[stage] = self._smooth(self.stage_costs.get(stage), self._frame_stages.get(stage, 0.0))
+        self._frame_stages = {}
+        self._frames_since_change += 1
+        if self._frames_since_change < self.cooldown:
+            return False
+
+        if self.frame_cost > self.budget:
+            changed = self._degrade()
+        elif self.frame_cost < self.budget * self.recover_ratio:
+            changed = self._recover()
+        else:
+            changed = False
+        if changed:
+            self._frames_since_change = 0
+            self.logger.info(f"Frame cost {1000 * self.frame_cost:.1f} ms against a "
+                             f"{1000 * self.budget:.1f} ms budget, now using {self.settings}")
+        return changed
+
+    def _degrade(self):
+        can_detect = self.detection_level < len(self.detection_levels) - 1
+        can_encode = self.encoding_level < len(self.encoding_levels) - 1
+        detect_cost = self.stage_costs.get('detect', 0.0)
+        encode_cost = self.stage_costs.get('encode', 0.0)
+        if can_detect and (detect_cost >= encode_cost or not can_encode):
+            self.detection_level += 1
+            self._degraded.append('detect')
+        elif can_encode:
+            self.encoding_level += 1
+            self._degraded.append('encode')
+        else:
+            return False
+        return True
+
+    def _recover(self):
+        if self._degraded:
+            stage = self._degraded.pop()
+            if stage == 'detect':
+                self.detection_level -= 1
+            else:
+                self.encoding_level -= 1
+            return True
+        if self.detection_level > 0:
+            # Spare budget beyond the starting level
+            self.detection_level -= 1
+            return True
+        return False
@@ -0,0 +1,407 @@
+# src/batch_recognize.py
+"""
+Recognize faces in archived footage without a camera or a window.
+
+    python -m src.batch_recognize footage/cam1.mp4 frames/ --output results.jsonl [--stride 5] [--workers 8]
+    python -m src.batch_recognize footage/ --output results.csv --db --start-time 2026-03-01T08:00:00
+
+Inputs are video files and directories. A directory contributes every
+video below it as its own source and the images of each sub-directory as
+one image sequence, in file name order. Frames are decoded on the
+RecognitionPipeline's capture thread, detected and encoded in a pool of
+worker processes and matched in this process, in frame order. Every face
+is streamed to JSONL or CSV as it comes out, and with --db the
+recognitions are folded into Sighting rows timed by the footage.
+"""
+import os
+import csv
+import json
+import time
+import logging
+import argparse
+import datetime
+from collections import deque, namedtuple
+import cv2
+from src.bulk_enroll import face_quality
+from src.config import BatchConfig, DetectionLogConfig, EnrollmentConfig, SightingConfig
+from src.database import DetectionLogWriter, Session, init_db
+from src.face_encoder import FaceEncoder
+from src.pipeline import RecognitionPipeline, detect_and_encode
+from src.sighting_aggregator import SightingAggregator
+from src.worker_pool import create_worker_pool
+
+Source = namedtuple('Source', ['name', 'paths', 'is_video'])
+FrameInfo = namedtuple('FrameInfo', ['sequence', 'source', 'index', 'position', 'timestamp', 'scale'])
+
+
+def sources_from_paths(paths, image_extensions=EnrollmentConfig.IMAGE_EXTENSIONS,
+                       video_extensions=BatchConfig.VIDEO_EXTENSIONS):
+    """
+    Video files and image sequences under the given files and directories
+    Returns: List of Sources in argument and path order
+    """
+    sources = []
+    for path in paths:
+        if not os.path.isdir(path):
+            if path.lower().endswith(video_extensions):
+                sources.append(Source(path, [path], True))
+            elif path.lower().endswith(image_extensions):
+                sources.append(Source(path, [path], False))
+            else:
+                logging.getLogger(__name__).warning(f"Skipping {path}, neither a video nor an image")
+            continue
+        for directory, subdirectories, files in os.walk(path):
+            subdirectories.sort()
+            images = []
+            for filename in sorted(files):
+                file_path = os.path.join(directory, filename)
+                if filename.lower().endswith(video_extensions):
+                    sources.append(Source(file_path, [file_path], True))
+                elif filename.lower().endswith(image_extensions):
+                    images.append(file_path)
+            if images:
+                sources.append(Source(directory, images, False))
+    return sources
+
+
+class FrameReader:
+    """
+    Decodes every `stride`th frame of each source in turn.
+
+    `read_frame` is the RecognitionPipeline frame source and runs on its
+    capture thread. Skipped video frames are only grabbed, not retrieved,
+    and frames larger than `max_side` are downscaled before they are sent
+    to the workers. The FrameInfo of every frame handed out is queued so
+    that `take` can pair a pipeline result with its source and position.
+
+    Video timestamps are `start_time` (epoch seconds, the file's
+    modification time when None) plus the position in the video; images
+    are timed by their modification time.
+
+    Attributes:
+        frames_read: Frames handed to the pipeline
+        frames_scanned: Frames decoded or skipped by the stride
+        media_seconds: Duration of the video read so far
+        unreadable: Sources or images that could not be opened
+    """
+
+    def __init__(self, sources, stride=1, max_side=None, start_time=None):
+        self.logger = logging.getLogger(__name__)
+        self.sources = sources
+        self.stride = max(1, int(stride))
+        self.max_side = max_side
+        self.start_time = start_time
+        self.frames_read = 0
+        self.frames_scanned = 0
+        self.media_seconds = 0.0
+        self.unreadable = 0
+        self._frames = self._iter_frames()
+        self._pending = deque()
+
+    def _iter_frames(self):
+        for source in self.sources:
+            if source.is_video:
+                yield from self._video_frames(source)
+            else:
+                yield from self._image_frames(source)
+
+    def _video_frames(self, source):
+        capture = cv2.VideoCapture(source.paths[0])
+        if not capture.isOpened():
+            self.logger.error(f"Could not open video {source.name}")
+            self.unreadable += 1
+            return
+        start_time = self.start_time if self.start_time is not None else os.path.getmtime(source.paths[0])
+        fps = capture.get(cv2.CAP_PROP_FPS) or 0.0
+        frame_seconds = 1.0 / fps if fps > 0 else 0.0
+        index = 0
+        position = 0.0
+        try:
+            while True:
+                if index % self.stride:
+                    # Advance without the colour conversion of a full read
+                    if not capture.grab():
+                        break
+                    index += 1
+                    self.frames_scanned += 1
+                    self.media_seconds += frame_seconds
+                    continue
+                ret, frame = capture.read()
+                if not ret:
+                    break
+                position = index / fps if fps > 0 else capture.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+                index += 1
+                self.frames_scanned += 1
+                self.media_seconds += frame_seconds
+                yield source.name, index - 1, position, start_time + position, frame
+        finally:
+            capture.release()
+            if fps <= 0:
+                self.media_seconds += position
+
+    def _image_frames(self, source):
+        for index, path in enumerate(source.paths):
+            self.frames_scanned += 1
+            if index % self.stride:
+                continue
+            frame = cv2.imread(path)
+            if frame is None:
+                self.logger.warning(f"Could not read image {path}")
+                self.unreadable += 1
+                continue
+            yield source.name, index, None, os.path.getmtime(path), frame
+
+    def read_frame(self):
+        """
+        Next sampled frame, downscaled to `max_side`
+        Returns: (ret, frame), ret is False once every source is exhausted
+        """
+        try:
+            name, index, position, timestamp, frame = next(self._frames)
+        except StopIteration:
+            return False, None
+        scale = min(1.0, self.max_side / max(frame.shape[:2])) if self.max_side else 1.0
+        if scale < 1.0:
+            frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        self._pending.append(FrameInfo(self.frames_read, name, index, position, timestamp, scale))
+        self.frames_read += 1
+        return True, frame
+
+    def take(self, sequence):
+        """
+        FrameInfo of the pipeline result with this sequence number, dropping
+        those of earlier frames that failed in the workers and have no result
+        """
+        while self._pending[0].sequence < sequence:
+            self._pending.popleft()
+        return self._pending.popleft()
+
+
+def face_records(info, frame, faces):
+    """
+    One output record per face of a pipeline result, with the box in the
+    coordinates of the original frame and unknown faces as person_id None
+    """
+    records = []
+    for box, _, candidates in faces:
+        top, right, bottom, left = [int(round(value / info.scale)) for value in box]
+        name, confidence, person_id = candidates[0] if candidates else (None, None, None)
+        records.append({
+            'source': info.source,
+            'frame': info.index,
+            'position': round(info.position, 3) if info.position is not None else None,
+            'timestamp': datetime.datetime.utcfromtimestamp(info.timestamp).isoformat(),
+            'top': top,
+            'right': right,
+            'bottom': bottom,
+            'left': left,
+            'person_id': person_id,
+            'name': name,
+            'confidence': round(confidence, 4) if confidence is not None else None,
+            'quality': round(face_quality(frame, box), 4),
+            'candidates': [[name, round(confidence, 4), person_id] for name, confidence, person_id in candidates]
+        })
+    return records
+
+
+class JsonlOutput:
+    """One JSON object per face and line"""
+
+    def __init__(self, path):
+        self.file = open(path, 'w')
+
+    def write(self, info, records):
+        for record in records:
+            self.file.write(json.dumps(record) + '\n')
+
+    def close(self):
+        self.file.close()
+
+
+class CsvOutput:
+    """One CSV row per face with the best match, without the other candidates"""
+
+    FIELDS = ['source', 'frame', 'position', 'timestamp', 'top', 'right', 'bottom', 'left',
+              'person_id', 'name', 'confidence', 'quality']
+
+    def __init__(self, path):
+        self.file = open(path, 'w', newline='')
+        self.writer = csv.DictWriter(self.file, fieldnames=self.FIELDS, extrasaction='ignore')
+        self.writer.writeheader()
+
+    def write(self, info, records):
+        self.writer.writerows(records)
+
+    def close(self):
+        self.file.close()
+
+
+class DatabaseOutput:
+    """
+    Folds recognized faces into Sighting rows, timed by the footage.
+
+    Each source is a camera for the SightingAggregator; its sessions close
+    when the footage time moves past the gap and all at once when the
+    next source starts. Unknown faces are not tracked offline and are
+    left to the file outputs.
+
+    Attributes:
+        writer: DetectionLogWriter the rows are queued on
+        aggregator: SightingAggregator keyed by source
+    """
+
+    def __init__(self, writer, gap=SightingConfig.GAP_SECONDS, raw_detections=SightingConfig.RAW_DETECTIONS):
+        self.writer = writer
+        self.aggregator = SightingAggregator(writer, gap=gap, raw_detections=raw_detections)
+        self._source = None
+
+    def write(self, info, records):
+        if info.source != self._source:
+            self.aggregator.close_all()
+            self._source = info.source
+        for record in records:
+            if record['person_id'] is None:
+                continue
+            self.aggregator.observe(
+                info.source,
+                record['person_id'],
+                record['confidence'],
+                record['quality'],
+                box=(record['top'], record['right'], record['bottom'], record['left']),
+                environment={'frame': info.index, 'position': record['position']},
+                timestamp=info.timestamp
+            )
+        self.aggregator.close_expired(now=info.timestamp)
+
+    def close(self):
+        self.aggregator.close_all()
+        self.writer.close()
+
+
+def run_batch(sources, face_encoder, outputs, workers=None, stride=BatchConfig.FRAME_STRIDE,
+              max_side=BatchConfig.MAX_FRAME_SIDE, upsample=BatchConfig.UPSAMPLE, top_k=1, start_time=None,
+              executor=None, worker_fn=detect_and_encode, progress=None, progress_interval=5.0):
+    """
+    Recognize the faces in every sampled frame of `sources` and pass them
+    to each output in frame order. The pipeline never drops frames: the
+    reader waits while the workers are busy.
+    Returns: Dict with frames, failed_frames, faces, recognized, unreadable,
+             frames_scanned, media_seconds, seconds, frames_per_second and
+             realtime_factor (footage seconds per wall-clock second)
+    """
+    reader = FrameReader(sources, stride, max_side, start_time)
+    workers = workers or BatchConfig.WORKERS or os.cpu_count()
+    owns_executor = executor is None
+    if owns_executor:
+        executor = create_worker_pool(workers)
+    pipeline = RecognitionPipeline(face_encoder, workers=workers, drop_frames=False, upsample=upsample,
+                                   top_k=top_k, executor=executor, worker_fn=worker_fn)
+    stats = {'frames': 0, 'faces': 0, 'recognized': 0}
+    start = last_progress = time.time()
+    pipeline.start(reader.read_frame)
+    try:
+        while True:
+            result = pipeline.get_result(timeout=1.0)
+            if result is None:
+                if pipeline.finished:
+                    break
+                continue
+            info = reader.take(result['sequence'])
+            records = face_records(info, result['frame'], result['faces'])
+            for output in outputs:
+                output.write(info, records)
+            stats['frames'] += 1
+            stats['faces'] += len(records)
+            stats['recognized'] += sum(1 for record in records if record['person_id'] is not None)
+
+            now = time.time()
+            if progress and now - last_progress >= progress_interval:
+                last_progress = now
+                progress(_progress_stats(stats, reader, start, now))
+    finally:
+        pipeline.stop()
+        if owns_executor:
+            executor.shutdown(cancel_futures=True)
+        for output in outputs:
+            output.close()
+
+    # Frames read without a result failed in the workers
+    stats['failed_frames'] = reader.frames_read - stats['frames']
+    stats.update(_progress_stats(stats, reader, start, time.time()))
+    return stats
+
+
+def _progress_stats(stats, reader, start, now):
+    seconds = now - start
+    return {
+        'frames': stats['frames'],
+        'faces': stats['faces'],
+        'recognized': stats['recognized'],
+        'unreadable': reader.unreadable,
+        'frames_scanned': reader.frames_scanned,
+        'media_seconds': reader.media_seconds,
+        'seconds': seconds,
+        'frames_per_second': stats['frames'] / seconds if seconds > 0 else 0.0,
+        'realtime_factor': reader.media_seconds / seconds if seconds > 0 else 0.0
+    }
+
+
+def print_progress(progress):
+    print(f"{progress['frames']} frames ({progress['frames_scanned']} scanned), {progress['faces']} faces, "
+          f"{progress['recognized']} recognized, {progress['frames_per_second']:.1f} frames/s, "
+          f"{progress['realtime_factor']:.1f}x real time", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recognize faces in video files and image directories")
+    parser.add_argument('inputs', nargs='+', help="Video files, images or directories of either")
+    parser.add_argument('--output', action='append', default=[],
+                        help="Result file, CSV for a .csv name and JSONL otherwise; may be repeated")
+    parser.add_argument('--db', action='store_true', help="Write the recognitions as sightings to the database")
+    parser.add_argument('--stride', type=int, default=BatchConfig.FRAME_STRIDE, help="Process every Nth frame")
+    parser.add_argument('--workers', type=int, default=BatchConfig.WORKERS)
+    parser.add_argument('--max-side', type=int, default=BatchConfig.MAX_FRAME_SIDE)
+    parser.add_argument('--upsample', type=int, default=BatchConfig.UPSAMPLE)
+    parser.add_argument('--top-k', type=int, default=1, help="Candidates per face in the JSONL output")
+    parser.add_argument('--scope', action='append', help="Only match members of this group; may be repeated")
+    parser.add_argument('--start-time', type=datetime.datetime.fromisoformat,
+                        help="UTC recording start of the videos, defaults to each file's modification time")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    if not args.output and not args.db:
+        parser.error("nothing to write, give --output and/or --db")
+
+    init_db()
+    sources = sources_from_paths(args.inputs)
+    print(f"Found {len(sources)} sources", flush=True)
+    outputs = [CsvOutput(path) if path.lower().endswith('.csv') else JsonlOutput(path) for path in args.output]
+    if args.db:
+        # Nothing may be dropped offline, the reader waits for the writer instead
+        writer = DetectionLogWriter(batch_size=DetectionLogConfig.BATCH_SIZE, overflow='block', block_timeout=None)
+        outputs.append(DatabaseOutput(writer))
+
+    face_encoder = FaceEncoder(Session(), scope=args.scope)
+    start_time = args.start_time.replace(tzinfo=datetime.timezone.utc).timestamp() if args.start_time else None
+    try:
+        stats = run_batch(
+            sources,
+            face_encoder,
+            outputs,
+            workers=args.workers,
+            stride=args.stride,
+            max_side=args.max_side,
+            upsample=args.upsample,
+            top_k=args.top_k,
+            start_time=start_time,
+            progress=print_progress
+        )
+    finally:
+        face_encoder.close()
+    print(f"Processed {stats['frames']} frames of {len(sources)} sources in {stats['seconds']:.1f}s: "
+          f"{stats['frames_per_second']:.1f} frames/s, {stats['realtime_factor']:.1f}x real time, "
+          f"{stats['faces']} faces, {stats['recognized']} recognized, {stats['failed_frames']} failed frames, "
+          f"{stats['unreadable']} unreadable inputs")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,445 @@
+# src/bulk_enroll.py
+"""
+Enroll people in bulk from a directory tree or a CSV manifest.
+
+    python -m src.bulk_enroll photos/ [--workers 8] [--checkpoint enroll.ckpt] [--failures failures.csv]
+    python -m src.bulk_enroll manifest.csv --group staff
+
+A directory holds one sub-directory per person (photos/Jane Doe/1.jpg) or
+images named after the person (photos/Jane Doe.jpg). A manifest has a
+header with `path` and `name` columns and an optional `groups` column of
+';'-separated group names; relative paths are resolved against the
+manifest's directory.
+"""
+import os
+import csv
+import json
+import time
+import logging
+import argparse
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, wait
+import cv2
+import numpy as np
+from sqlalchemy import insert, select
+from src.config import EnrollmentConfig
+from src.database import (Session, Person, Group, FaceEncoding, ReferenceImage, ENCODING_DTYPES, active_model_version,
+                          init_db, pack_encoding)
+from src.database.models import person_groups
+from src.worker_pool import create_worker_pool
+
+logger = logging.getLogger(__name__)
+
+ImageTask = namedtuple('ImageTask', ['path', 'name', 'groups'])
+
+
+def tasks_from_directory(root, extensions=EnrollmentConfig.IMAGE_EXTENSIONS):
+    """
+    Images under `root`, named after their sub-directory below `root`, or
+    after the file itself for images directly in `root`
+    Returns: List of ImageTasks in path order
+    """
+    tasks = []
+    for directory, subdirectories, files in os.walk(root):
+        subdirectories.sort()
+        for filename in sorted(files):
+            if not filename.lower().endswith(extensions):
+                continue
+            path = os.path.join(directory, filename)
+            relative = os.path.relpath(path, root)
+            parts = relative.split(os.sep)
+            name = parts[0] if len(parts) > 1 else os.path.splitext(filename)[0]
+            tasks.append(ImageTask(path, name, ()))
+    return tasks
+
+
+def tasks_from_manifest(manifest_path):
+    """
+    Images listed in a CSV manifest with path, name and optional groups columns
+    Returns: List of ImageTasks in manifest order
+    """
+    base = os.path.dirname(os.path.abspath(manifest_path))
+    tasks = []
+    with open(manifest_path, newline='') as manifest:
+        for row in csv.DictReader(manifest):
+            path = row['path'] if os.path.isabs(row['path']) else os.path.join(base, row['path'])
+            groups = tuple(group.strip() for group in (row.get('groups') or '').split(';') if group.strip())
+            tasks.append(ImageTask(path, row['name'].strip(), groups))
+    return tasks
+
+
+def face_quality(image, box):
+    """Brightness and sharpness of the face crop, on the same scale as the live frame quality"""
+    top, right, bottom, left = box
+    gray = cv2.cvtColor(image[top:bottom, left:right], cv2.COLOR_BGR2GRAY)
+    blur = cv2.Laplacian(gray, cv2.CV_64F).var()
+    return float(np.mean(gray) / 255.0 * 0.5 + min(blur / 1000.0, 0.5))
+
+
+def encode_image_data(image_data, upsample=1, max_side=EnrollmentConfig.MAX_IMAGE_SIDE, largest_face=False,
+                      num_jitters=1):
+    """
+    Decode an encoded image (JPEG, PNG, ...) and encode its face
+    Returns: Dict with 'status' ('enrolled' or 'failed') and either 'reason'
+             or the 'encoding', 'box' in original image coordinates and 'quality'
+    """
+    import face_recognition
+    image = cv2.imdecode(np.frombuffer(image_data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        return {'status': 'failed', 'reason': "not a decodable image"}
+
+    # Detect on a bounded size, large photos gain nothing but HOG time
+    scale = min(1.0, max_side / max(image.shape[:2])) if max_side else 1.0
+    if scale < 1.0:
+        image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    boxes = face_recognition.face_locations(rgb_image, number_of_times_to_upsample=upsample, model='hog')
+    if not boxes:
+        return {'status': 'failed', 'reason': "no face found"}
+    if len(boxes) > 1 and not largest_face:
+        return {'status': 'failed', 'reason': f"{len(boxes)} faces found"}
+    box = max(boxes, key=lambda b: (b[2] - b[0]) * (b[1] - b[3]))
+    encodings = face_recognition.face_encodings(rgb_image, [box], num_jitters=num_jitters)
+    if not encodings:
+        return {'status': 'failed', 'reason': "face could not be encoded"}
+    return {
+        'status': 'enrolled',
+        'encoding': np.asarray(encodings[0], dtype=np.float32),
+        'box': [int(round(value / scale)) for value in box],
+        'quality': face_quality(image, box)
+    }
+
+
+def encode_image(task, upsample=1, max_side=EnrollmentConfig.MAX_IMAGE_SIDE, largest_face=False):
+    """
+    Worker stage: read one image file and encode its face
+    Returns: encode_image_data result with the task and, when enrolled, the raw 'image_data'
+    """
+    try:
+        with open(task.path, 'rb') as image_file:
+            image_data = image_file.read()
+    except OSError as e:
+        return {'task': task, 'status': 'failed', 'reason': f"unreadable: {e.strerror}"}
+    result = encode_image_data(image_data, upsample, max_side, largest_face)
+    result['task'] = task
+    if result['status'] == 'enrolled':
+        result['image_data'] = image_data
+    return result
+
+
+class Checkpoint:
+    """Append-only list of image paths already handled, enrolled or failed"""
+
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        if path and os.path.exists(path):
+            with open(path) as checkpoint:
+                self.done = {line.rstrip('\n') for line in checkpoint if line.strip()}
+
+    def record(self, paths):
+        if not self.path:
+            self.done.update(paths)
+            return
+        with open(self.path, 'a') as checkpoint:
+            for path in paths:
+                checkpoint.write(path + '\n')
+                self.done.add(path)
+            checkpoint.flush()
+            os.fsync(checkpoint.fileno())
+
+
+class EnrollmentWriter:
+    """
+    Writes encoded images in chunks, one transaction per chunk.
+
+    Persons are matched by name against the active persons in the
+    database, new ones are created with one flush per chunk. Encodings,
+    reference images and group memberships go in as bulk INSERTs.
+    Without a `model_version`, encodings are written under the active
+    model version read with the first chunk.
+
+    Attributes:
+        persons_created: Persons added so far
+        encodings_written: FaceEncoding rows added so far
+    """
+
+    def __init__(self, session_factory=Session, dtype='float32', model_version=None,
+                 store_images=True, groups=()):
+        self.session_factory = session_factory
+        self.dtype = dtype
+        self.model_version = model_version
+        self.store_images = store_images
+        self.groups = tuple(groups)
+        self.persons_created = 0
+        self.encodings_written = 0
+        self._person_ids = None
+        self._group_ids = {}
+        self._memberships = set()
+
+    def _load(self, session):
+        if self.model_version is None:
+            self.model_version = active_model_version(session)
+        self._person_ids = {}
+        for person_id, name in session.query(Person.id, Person.name).filter(Person.is_active == True)\
+                .order_by(Person.id):
+            self._person_ids.setdefault(name, person_id)
+        self._group_ids = dict(session.query(Group.name, Group.id).all())
+        self._memberships = set(session.execute(select(person_groups.c.person_id, person_groups.c.group_id)).all())
+
+    def committed_sources(self, paths):
+        """
+        Paths among `paths` already stored as the source of an enrollment
+        reference image, e.g. by a chunk committed just before a crash
+        Returns: Set of paths
+        """
+        paths = set(paths)
+        sources = set()
+        session = self.session_factory()
+        try:
+            query = session.query(ReferenceImage.image_metadata).filter(ReferenceImage.image_type == 'enrollment')
+            for metadata, in query.yield_per(1000):
+                source = json.loads(metadata).get('source') if metadata else None
+                if source in paths:
+                    sources.add(source)
+        finally:
+            session.close()
+        return sources
+
+    def write(self, results):
+        """Insert one chunk of enrolled results"""
+        if not results:
+            return
+        session = self.session_factory()
+        try:
+            if self._person_ids is None:
+                self._load(session)
+
+            new_persons = {}
+            for result in results:
+                name = result['task'].name
+                if name not in self._person_ids and name not in new_persons:
+                    new_persons[name] = Person(name=name)
+            new_groups = {}
+            for result in results:
+                for group in self.groups + tuple(result['task'].groups):
+                    if group not in self._group_ids and group not in new_groups:
+                        new_groups[group] = Group(name=group)
+            session.add_all(list(new_persons.values()) + list(new_groups.values()))
+            session.flush()
+            person_ids = dict(self._person_ids, **{name: person.id for name, person in new_persons.items()})
+            group_ids = dict(self._group_ids, **{name: group.id for name, group in new_groups.items()})
+
+            memberships = set()
+            encoding_rows = []
+            image_rows = []
+            for result in results:
+                task = result['task']
+                person_id = person_ids[task.name]
+                for group in self.groups + tuple(task.groups):
+                    membership = (person_id, group_ids[group])
+                    if membership not in self._memberships:
+                        memberships.add(membership)
+                encoding_data, dim = pack_encoding(result['encoding'], self.dtype)
+                encoding_rows.append({
+                    'person_id': person_id,
+                    'encoding_data': encoding_data,
+                    'dim': dim,
+                    'dtype': self.dtype,
+                    'model_version': self.model_version,
+                    'is_active': True,
+                    'quality_score': result['quality']
+                })
+                if self.store_images:
+                    image_rows.append({
+                        'person_id': person_id,
+                        'image_data': result['image_data'],
+                        'image_type': 'enrollment',
+                        'image_metadata': json.dumps({
+                            'source': task.path,
+                            'quality': round(result['quality'], 4),
+                            'box': result['box']
+                        })
+                    })
+            if memberships:
+                session.execute(person_groups.insert(),
+                                [{'person_id': person_id, 'group_id': group_id} for person_id, group_id in memberships])
+            if image_rows:
+                # Link every encoding to the image it came from, for later re-encoding
+                image_ids = session.scalars(
+                    insert(ReferenceImage).returning(ReferenceImage.id, sort_by_parameter_order=True),
+                    image_rows
+                ).all()
+                for encoding_row, image_id in zip(encoding_rows, image_ids):
+                    encoding_row['reference_image_id'] = image_id
+            session.execute(insert(FaceEncoding), encoding_rows)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+        # Only committed rows enter the caches
+        self._person_ids, self._group_ids = person_ids, group_ids
+        self._memberships |= memberships
+        self.persons_created += len(new_persons)
+        self.encodings_written += len(encoding_rows)
+
+
+def run_enrollment(tasks, session_factory=Session, workers=None, chunk_size=EnrollmentConfig.CHUNK_SIZE,
+                   checkpoint_path=None, failure_report=None, upsample=EnrollmentConfig.UPSAMPLE,
+                   dtype='float32', model_version=None, store_images=True, groups=(),
+                   largest_face=False, executor=None, encode=encode_image, progress=None,
+                   progress_interval=5.0):
+    """
+    Encode every task across a pool of worker processes and write the
+    results in chunks. Tasks already in the checkpoint are skipped; a chunk
+    enters the checkpoint once it is committed, so an interrupted run
+    resumes after the last committed chunk. With a checkpoint, images
+    already stored as enrollment reference images are skipped as well, so
+    a crash between a commit and its checkpoint record does not enroll
+    the chunk twice. Without stored images that window remains.
+    Returns: Dict with total, skipped, enrolled, failed, persons_created,
+             seconds and images_per_second
+    """
+    checkpoint = Checkpoint(checkpoint_path)
+    pending_tasks = [task for task in tasks if task.path not in checkpoint.done]
+    writer = EnrollmentWriter(session_factory, dtype, model_version, store_images, groups)
+    if checkpoint_path and store_images:
+        committed = writer.committed_sources(task.path for task in pending_tasks)
+        if committed:
+            logger.info(f"Found {len(committed)} images enrolled after the last checkpoint record")
+            checkpoint.record(sorted(committed))
+            pending_tasks = [task for task in pending_tasks if task.path not in committed]
+    stats = {'total': len(tasks), 'skipped': len(tasks) - len(pending_tasks), 'enrolled': 0, 'failed': 0}
+    start = time.time()
+    last_progress = start
+
+    owns_executor = executor is None
+    if owns_executor:
+        executor = create_worker_pool(workers or EnrollmentConfig.WORKERS or os.cpu_count())
+    max_in_flight = 4 * (getattr(executor, '_max_workers', None) or os.cpu_count() or 1)
+
+    report = None
+    if failure_report:
+        write_header = not os.path.exists(failure_report)
+        report_file = open(failure_report, 'a', newline='')
+        report = csv.writer(report_file)
+        if write_header:
+            report.writerow(['path', 'name', 'reason'])
+
+    enrolled = []
+    failed = []
+
+    def flush():
+        writer.write(enrolled)
+        if report:
+            report.writerows([result['task'].path, result['task'].name, result['reason']] for result in failed)
+            report_file.flush()
+        checkpoint.record([result['task'].path for result in enrolled + failed])
+        stats['enrolled'] += len(enrolled)
+        stats['failed'] += len(failed)
+        enrolled.clear()
+        failed.clear()
+
+    try:
+        task_iter = iter(pending_tasks)
+        in_flight = set()
+        while True:
+            # Keep a bounded number of images in the pool, not the whole list
+            for task in task_iter:
+                in_flight.add(executor.submit(encode, task, upsample, largest_face=largest_face))
+                if len(in_flight) >= max_in_flight:
+                    break
+            if not in_flight:
+                break
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                (enrolled if result['status'] == 'enrolled' else failed).append(result)
+            if len(enrolled) + len(failed) >= chunk_size:
+                flush()
+
+            now = time.time()
+            if progress and now - last_progress >= progress_interval:
+                last_progress = now
+                progress(progress_stats(stats['enrolled'], stats['failed'], start, now, len(pending_tasks),
+                                        buffered=len(enrolled) + len(failed)))
+        flush()
+    finally:
+        if owns_executor:
+            executor.shutdown(cancel_futures=True)
+        if report:
+            report_file.close()
+
+    stats['persons_created'] = writer.persons_created
+    stats['seconds'] = time.time() - start
+    handled = stats['enrolled'] + stats['failed']
+    stats['images_per_second'] = handled / stats['seconds'] if stats['seconds'] > 0 else 0.0
+    return stats
+
+
+def progress_stats(enrolled, failed, start, now, total, buffered=0):
+    """
+    Progress of an encoding job for `progress` callbacks; `buffered` counts
+    results encoded but not yet written
+    """
+    handled = enrolled + failed + buffered
+    rate = handled / (now - start) if now > start else 0.0
+    return {
+        'handled': handled,
+        'total': total,
+        'enrolled': enrolled,
+        'failed': failed,
+        'images_per_second': rate,
+        'eta_seconds': (total - handled) / rate if rate else None
+    }
+
+
+def print_progress(progress):
+    eta = f", ETA {progress['eta_seconds'] / 60:.1f} min" if progress['eta_seconds'] is not None else ""
+    print(f"{progress['handled']}/{progress['total']} images, {progress['enrolled']} enrolled, "
+          f"{progress['failed']} failed, {progress['images_per_second']:.1f} images/s{eta}", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Enroll people from a directory of images or a CSV manifest")
+    parser.add_argument('source', help="Directory tree of images or a CSV manifest with path,name[,groups]")
+    parser.add_argument('--workers', type=int, default=EnrollmentConfig.WORKERS)
+    parser.add_argument('--chunk-size', type=int, default=EnrollmentConfig.CHUNK_SIZE)
+    parser.add_argument('--checkpoint', help="File of handled images, enables resuming an interrupted run")
+    parser.add_argument('--failures', help="CSV report of images that could not be enrolled")
+    parser.add_argument('--group', action='append', default=[], help="Add every enrolled person to this group")
+    parser.add_argument('--upsample', type=int, default=EnrollmentConfig.UPSAMPLE)
+    parser.add_argument('--largest-face', action='store_true', help="Enroll the largest of several faces")
+    parser.add_argument('--dtype', choices=ENCODING_DTYPES, default='float32')
+    parser.add_argument('--no-images', action='store_true', help="Do not keep the photos as reference images")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+
+    if os.path.isdir(args.source):
+        tasks = tasks_from_directory(args.source)
+    else:
+        tasks = tasks_from_manifest(args.source)
+    print(f"Found {len(tasks)} images", flush=True)
+    stats = run_enrollment(
+        tasks,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        checkpoint_path=args.checkpoint,
+        failure_report=args.failures,
+        upsample=args.upsample,
+        dtype=args.dtype,
+        store_images=not args.no_images,
+        groups=args.group,
+        largest_face=args.largest_face,
+        progress=print_progress
+    )
+    print(f"Enrolled {stats['enrolled']} images ({stats['persons_created']} new persons), {stats['failed']} failed, "
+          f"{stats['skipped']} skipped from the checkpoint, {stats['images_per_second']:.1f} images/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,6 +3,8 @@
 import cv2
 import time
 import logging
+import threading
+from collections import deque
 from src.config import CameraConfig
 from src.face_detector import FaceDetector
 
@@ -10,27 +12,114 @@ class CameraError(Exception):
     """Base exception for camera-related errors"""
     pass
 
+class FrameBuffer:
+    """
+    Bounded buffer between a capture thread and its consumer.
+
+    The newest frame always wins: when the buffer is full the oldest frame
+    is overwritten, and a consumer taking the latest frame discards any
+    older ones still waiting. Both cases are counted as dropped frames.
+    `on_drop` is called with every discarded frame, e.g. to release its
+    shared-memory slot.
+
+    Attributes:
+        captured: Frames put into the buffer
+        consumed: Frames handed to the consumer
+        dropped: Frames discarded without being consumed
+    """
+
+    def __init__(self, capacity=2, on_drop=None):
+        self._frames = deque(maxlen=max(1, capacity))
+        self._on_drop = on_drop
+        self._condition = threading.Condition()
+        self._closed = False
+        self.captured = 0
+        self.consumed = 0
+        self.dropped = 0
+
+    def put(self, frame):
+        with self._condition:
+            if len(self._frames) == self._frames.maxlen:
+                self._drop(self._frames.popleft()[2])
+            self._frames.append((self.captured, time.time(), frame))
+            self.captured += 1
+            self._condition.notify()
+
+    def get_latest(self, timeout=None):
+        """
+        Wait for and take the newest frame
+        Returns: (sequence, capture_time, frame) or None on timeout or close
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._frames or self._closed, timeout):
+                return None
+            if not self._frames:
+                return None
+            item = self._frames.pop()
+            while self._frames:
+                self._drop(self._frames.popleft()[2])
+            self.consumed += 1
+            return item
+
+    def skip(self):
+        """Count a frame the producer discarded without putting it in the buffer"""
+        with self._condition:
+            self.dropped += 1
+
+    def _drop(self, frame):
+        self.dropped += 1
+        if self._on_drop is not None:
+            self._on_drop(frame)
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            while self._frames:
+                self._drop(self._frames.popleft()[2])
+            self._condition.notify_all()
+
+    @property
+    def closed(self):
+        return self._closed
+
 class CameraManager:
     """
     Manages webcam operations including frame capture and face detection.
     
+    Frames can be read synchronously or, after `start_capture`, from a
+    background thread that keeps only the freshest frames so processing
+    never falls behind on stale buffered ones. With a SharedFramePool the
+    capture thread reads straight into shared-memory slots and consumers
+    take slot handles from `read_handle`, so frames reach worker processes
+    without being copied or pickled.
+
     Attributes:
+        camera_id: OpenCV device index or stream URL
         cap: OpenCV VideoCapture object
         face_detector: FaceDetector instance
         fps: Current frames per second
+        frame_buffer: FrameBuffer fed by the capture thread, None when synchronous
+        frame_latency: Seconds between capture and consumption of the last frame
+        frame_pool: SharedFramePool written by the capture thread, or None
     """
     
-    def __init__(self):
+    def __init__(self, camera_id=None):
         self.logger = logging.getLogger(__name__)
+        self.camera_id = CameraConfig.CAMERA_ID if camera_id is None else camera_id
         try:
-            self.cap = cv2.VideoCapture(CameraConfig.CAMERA_ID)
+            self.cap = cv2.VideoCapture(self.camera_id)
             if not self.cap.isOpened():
-                raise CameraError("Failed to open camera")
+                raise CameraError(f"Failed to open camera {self.camera_id}")
                 
             self._setup_camera()
             self.face_detector = FaceDetector()
             self.last_frame_time = time.time()
             self.fps = 0
+            self.frame_buffer = None
+            self.frame_latency = 0.0
+            self.frame_pool = None
+            self._capture_thread = None
+            self._stop_capture = threading.Event()
             
         except Exception as e:
             self.logger.error(f"Camera initialization failed: {str(e)}")
@@ -59,7 +148,112 @@ class CameraManager:
         if self.fps < CameraConfig.TARGET_FPS * 0.8:  # Alert if FPS drops below 80% of target
             self.logger.warning(f"Low FPS detected: {self.fps:.2f}")
 
+    def start_capture(self, buffer_size=None, frame_pool=None):
+        """Start reading frames on a background thread, into `frame_pool` slots if given"""
+        if self._capture_thread is not None:
+            return
+        self.frame_pool = frame_pool
+        self.frame_buffer = FrameBuffer(
+            buffer_size or CameraConfig.CAPTURE_BUFFER_SIZE,
+            on_drop=frame_pool.release if frame_pool is not None else None
+        )
+        self._stop_capture.clear()
+        self._capture_thread = threading.Thread(target=self._capture_loop, name="camera-capture", daemon=True)
+        self._capture_thread.start()
+        self.logger.info("Started threaded frame capture")
+
+    def stop_capture(self):
+        """
+        Stop the capture thread
+        Returns: True once it has ended, False if it is still blocked in a
+                 read and keeps using the frame pool
+        """
+        if self._capture_thread is None:
+            return True
+        self._stop_capture.set()
+        self._capture_thread.join(timeout=2.0)
+        if self._capture_thread.is_alive():
+            self.logger.warning("Capture thread did not stop within 2s, keeping its frame pool")
+            return False
+        self._capture_thread = None
+        self.frame_buffer.close()
+        self.frame_pool = None
+        return True
+
+    def _read_into_pool(self):
+        """Read the next frame straight into a free pool slot"""
+        handle = self.frame_pool.acquire(self.frame_buffer.captured, time.time(),
+                                         timeout=CameraConfig.CAPTURE_READ_TIMEOUT)
+        if handle is None:
+            # Every slot is still held downstream, skip this frame
+            self.cap.grab()
+            self.frame_buffer.skip()
+            return True, None
+        slot = self.frame_pool.view(handle)
+        ret, frame = self.cap.read(slot)
+        if ret and frame is not slot:
+            # The backend allocated its own image, e.g. for a different resolution
+            if frame.shape == slot.shape:
+                slot[...] = frame
+            else:
+                cv2.resize(frame, (slot.shape[1], slot.shape[0]), dst=slot)
+        if not ret:
+            self.frame_pool.release(handle)
+            return False, None
+        return True, handle
+
+    def _capture_loop(self):
+        failures = 0
+        while not self._stop_capture.is_set():
+            if self.frame_pool is not None:
+                ret, frame = self._read_into_pool()
+            else:
+                ret, frame = self.cap.read()
+            if not ret:
+                failures += 1
+                if failures >= CameraConfig.CAPTURE_MAX_FAILURES:
+                    self.logger.error("Failed to grab frames, stopping capture thread")
+                    break
+                continue
+            failures = 0
+            if frame is not None:
+                self.frame_buffer.put(frame)
+        self.frame_buffer.close()
+
+    def read_handle(self):
+        """
+        Take the newest frame as a FrameHandle into the frame pool; the
+        caller owns one reference and must release it
+        Returns: (ret, handle)
+        """
+        item = self.frame_buffer.get_latest(timeout=CameraConfig.CAPTURE_READ_TIMEOUT)
+        if item is None:
+            self.logger.error("Failed to grab frame")
+            return False, None
+        _, captured_at, handle = item
+        self.frame_latency = time.time() - captured_at
+        self.calculate_fps()
+        return True, handle
+
     def read_frame(self):
+        if self.frame_pool is not None:
+            ret, handle = self.read_handle()
+            if not ret:
+                return False, None
+            frame = self.frame_pool.view(handle).copy()
+            self.frame_pool.release(handle)
+            return True, frame
+
+        if self.frame_buffer is not None:
+            item = self.frame_buffer.get_latest(timeout=CameraConfig.CAPTURE_READ_TIMEOUT)
+            if item is None:
+                self.logger.error("Failed to grab frame")
+                return False, None
+            _, captured_at, frame = item
+            self.frame_latency = time.time() - captured_at
+            self.calculate_fps()
+            return True, frame
+
         ret, frame = self.cap.read()
         if not ret:
             self.logger.error("Failed to grab frame")
@@ -67,6 +261,17 @@ class CameraManager:
         self.calculate_fps()
         return ret, frame
 
+    def capture_stats(self):
+        """Captured, consumed and dropped frame counters of the capture thread"""
+        if self.frame_buffer is None:
+            return None
+        return {
+            'captured': self.frame_buffer.captured,
+            'consumed': self.frame_buffer.consumed,
+            'dropped': self.frame_buffer.dropped,
+            'latency': self.frame_latency
+        }
+
     def process_frame(self, frame):
         faces = self.face_detector.detect_faces(frame)
         frame = self.face_detector.draw_faces(frame, faces)
@@ -80,6 +285,8 @@ class CameraManager:
 
     def run(self):
         self.logger.info("Starting camera feed")
+        if CameraConfig.CAPTURE_THREADED:
+            self.start_capture()
         try:
             while True:
                 ret, frame = self.read_frame()
@@ -99,6 +306,7 @@ class CameraManager:
 
     def release(self):
         self.logger.info("Releasing camera resources")
+        self.stop_capture()
         self.cap.release()
         cv2.destroyAllWindows()
 
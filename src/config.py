@@ -8,10 +8,15 @@ load_dotenv()
 
 class CameraConfig:
     CAMERA_ID = 0  # Default webcam
+    CAMERA_IDS = [CAMERA_ID]  # Device indexes or stream URLs processed by main.py
     FRAME_WIDTH = 640
     FRAME_HEIGHT = 480
     TARGET_FPS = 30
     WINDOW_NAME = "Facial Recognition"
+    CAPTURE_THREADED = True  # Read frames on a background thread, newest frame wins
+    CAPTURE_BUFFER_SIZE = 2  # Frames held between the capture thread and the consumer
+    CAPTURE_READ_TIMEOUT = 1.0  # Seconds to wait for a frame before giving up
+    CAPTURE_MAX_FAILURES = 30  # Consecutive failed reads before the capture thread stops
 
 class FaceDetectionConfig:
     CASCADE_PATH = os.path.join(cv2.data.haarcascades, 'haarcascade_frontalface_default.xml')
@@ -21,6 +26,99 @@ class FaceDetectionConfig:
     RECTANGLE_COLOR = (0, 255, 0)  # BGR Green
     RECTANGLE_THICKNESS = 2
 
+class DetectionCascadeConfig:
+    ENABLED = True  # Route keyframe detection through the stages below
+    MOTION_GATE = True  # Reuse the previous result while the scene is static
+    MOTION_PIXEL_DELTA = 25  # Grey-level change that counts a pixel as moving
+    MOTION_CHANGED_FRACTION = 0.01  # Share of moving pixels that counts as motion
+    REGION_PADDING = 0.5  # Candidate region growth, as a share of the Haar box size
+    FULL_SCAN_EVERY = 30  # Full-frame HOG cadence to catch faces the other stages miss
+    ROI_SEARCH = True  # Search around the previous face boxes before anything else
+    ROI_PADDING = 0.75  # ROI window growth, as a share of the previous face box size
+
+class RecognitionConfig:
+    MATCH_THRESHOLD = 0.6  # Minimum confidence (1 - distance) for a match
+    INDEX_TYPE = 'brute_force'  # 'brute_force', 'ivf', 'quantized' or 'prototype'
+    IVF_MIN_GALLERY_SIZE = 10000  # Live encodings below which the IVF index falls back to an exact scan
+    IVF_LISTS = None  # Number of IVF cells, None derives it from the gallery size
+    IVF_PROBES = 8  # Cells visited per query, higher means better recall but slower
+    # The codes come on top of the float32 gallery, which the rerank needs. Without
+    # GALLERY_SNAPSHOT_DIR those rows stay resident in every process; with it they
+    # are memory-mapped and only the reranked rows are paged in
+    QUANTIZED_PRECISION = 'int8'  # 'int8' (a quarter of float32) or 'float16' (half)
+    QUANTIZED_RERANK = 32  # Candidates per query reranked against the float32 rows
+    QUANTIZED_MIN_GALLERY_SIZE = 10000  # Live encodings below which the float32 rows are scanned directly
+    PROTOTYPE_EXEMPLARS = 3  # Encodings kept per person besides the centroid
+    PROTOTYPE_CANDIDATES = 8  # Persons whose exemplars are compared after the centroid scan
+    PROTOTYPE_MIN_GALLERY_SIZE = 10000  # Live encodings below which every encoding is scanned
+    SEARCH_SCOPE = None  # Group name or list of names to match against, None matches everyone
+    COMPACTION_TOMBSTONE_RATIO = 0.25  # Compact the gallery once this share of rows is removed
+    GALLERY_SNAPSHOT_DIR = os.getenv('FACE_GALLERY_SNAPSHOT_DIR')  # None disables snapshots
+    SNAPSHOT_REFRESH_RATIO = 0.1  # Write a new snapshot generation once replayed changes exceed this share of it
+
+class BatchingConfig:
+    ENABLED = True  # Match the frames of every camera pipeline through one shared micro-batcher
+    MAX_BATCH_SIZE = 32  # Requests merged into one matching batch
+    MAX_WAIT = 0.005  # Seconds the oldest request waits for the batch to fill
+
+class AdaptiveConfig:
+    ENABLED = True  # Trade detection and encoding work for frame rate under load
+    TARGET_FPS = None  # Per-camera budget, None uses CameraConfig.TARGET_FPS
+    COOLDOWN_FRAMES = 30  # Frames between two setting changes of one stream
+    RECOVER_RATIO = 0.6  # Undo a degradation once the frame cost is below this share of the budget
+
+class TrackingConfig:
+    DETECT_EVERY_N_FRAMES = 5  # Full detection cadence while faces are tracked
+    IOU_THRESHOLD = 0.3  # Minimum overlap to continue a track
+    MAX_CENTROID_SHIFT = 0.5  # Fallback match distance, in face widths
+    MAX_MISSES = 2  # Detection rounds a track survives without a match
+    CONFIDENCE_DECAY = 0.98  # Per-frame decay of a track's identity confidence
+    REENCODE_BELOW = 0.45  # Re-encode a track once its decayed confidence drops below this
+    USE_CV_TRACKERS = False  # Follow faces between keyframes with OpenCV trackers
+    VOTING_ENABLED = True  # Fuse matches over several frames before labelling a track
+    VOTE_CANDIDATES = 3  # Candidates per observation
+    VOTE_CANDIDATE_THRESHOLD = 0.4  # Weakest match confidence counted as evidence
+    VOTE_EMA_ALPHA = 0.5  # Weight of the newest observation
+    VOTE_MIN_VOTES = 3  # Observations of the leader needed for a label
+    VOTE_MARGIN = 0.05  # Required lead over the runner-up
+    VOTE_EARLY_ACCEPT = 0.75  # Single-frame confidence that labels a track at once
+    VOTE_MAX_OBSERVATIONS = 10  # Conclude unknown after this many observations
+    VOTE_REVERIFY_FRAMES = 150  # Verification encoding cadence for labelled tracks
+
+class PipelineConfig:
+    ENABLED = False  # Run detection and encoding in a worker process pool instead of the tracked loop
+    WORKERS = None  # Worker processes, None uses all but one CPU
+    QUEUE_SIZE = 8  # Frames held between consecutive stages
+    MAX_IN_FLIGHT = None  # Frames inside the worker pool at once, None is twice the workers
+    DROP_FRAMES = True  # Drop the oldest waiting frame when capture outpaces the workers
+    UPSAMPLE = 1  # HOG upsampling used by the workers
+    SHARED_FRAMES = True  # Pass frames to workers through a shared-memory pool instead of pickling them
+    FRAME_POOL_SLOTS = None  # Shared frame slots, None sizes the pool to cover every queue
+
+class DetectionLogConfig:
+    MAX_QUEUE = 10000  # Detection events held in memory before the overflow policy applies
+    BATCH_SIZE = 256  # Events written per bulk insert
+    FLUSH_INTERVAL = 1.0  # Seconds an event may wait before a flush
+    OVERFLOW = 'drop_oldest'  # 'drop_oldest', 'drop_newest' or 'block'
+
+class SightingConfig:
+    GAP_SECONDS = 2.0  # A sighting closes after this long without seeing the person
+    RAW_DETECTIONS = False  # Debug mode, also write one DetectionLog row per recognized frame
+
+class EnrollmentConfig:
+    WORKERS = None  # Encoding processes for bulk enrollment, None uses every CPU
+    CHUNK_SIZE = 500  # Images written per transaction and checkpoint entry
+    UPSAMPLE = 1  # HOG upsampling, raise for photos with small faces
+    MAX_IMAGE_SIDE = 1600  # Larger photos are downscaled before detection
+    IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+class BatchConfig:
+    WORKERS = None  # Detection processes for offline recognition, None uses every CPU
+    FRAME_STRIDE = 5  # Process every Nth frame of a video or image sequence
+    MAX_FRAME_SIDE = 1280  # Larger frames are downscaled before detection, None keeps full size
+    UPSAMPLE = 1  # HOG upsampling used by the workers
+    VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.webm', '.m4v')
+
 class DatabaseConfig:
     DB_PATH = 'face_recognition.db'
     
@@ -32,4 +130,4 @@ def setup_logging():
     logging.basicConfig(
         level=logging.INFO,
         format='%(asctime)s - %(levelname)s - %(message)s'
-    )
\ No newline at end of file
+    )
@@ -1,11 +0,0 @@
-from database import Base, Session, engine
-from database import Person, Group, FaceEncoding, ReferenceImage, DetectionLog
-from database import DatabaseManager
-from database import init_db
-
-__all__ = [
-    'Base', 'Session', 'engine',
-    'Person', 'Group', 'FaceEncoding', 'ReferenceImage', 'DetectionLog',
-    'DatabaseManager',
-    'init_db'
-]
\ No newline at end of file
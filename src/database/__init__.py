@@ -1,13 +1,20 @@
 from .base import Base, Session, engine
-from .models import Person, Group, FaceEncoding, ReferenceImage, DetectionLog
+from .models import Person, Group, FaceEncoding, ReferenceImage, DetectionLog, Sighting, PersonStatistics, Setting
+from .encoding_codec import DEFAULT_MODEL_VERSION, ENCODING_DTYPES, pack_encoding, unpack_encodings
+from .settings import ACTIVE_MODEL_VERSION, active_model_version, get_setting, set_setting
 from .manager import DatabaseManager
+from .statistics import PersonStatisticsCache
+from .log_writer import DetectionLogWriter
 
 def init_db():
+    """Create every missing table; existing tables are left as they are"""
     Base.metadata.create_all(engine)
 
 __all__ = [
     'Base', 'Session', 'engine',
-    'Person', 'Group', 'FaceEncoding', 'ReferenceImage', 'DetectionLog',
-    'DatabaseManager',
+    'Person', 'Group', 'FaceEncoding', 'ReferenceImage', 'DetectionLog', 'Sighting', 'PersonStatistics', 'Setting',
+    'DatabaseManager', 'DetectionLogWriter', 'PersonStatisticsCache',
+    'DEFAULT_MODEL_VERSION', 'ENCODING_DTYPES', 'pack_encoding', 'unpack_encodings',
+    'ACTIVE_MODEL_VERSION', 'active_model_version', 'get_setting', 'set_setting',
     'init_db'
 ]
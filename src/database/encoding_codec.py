@@ -0,0 +1,41 @@
+import numpy as np
+
+# Storage dtypes for FaceEncoding.encoding_data; float16 halves the size at ~1e-3 precision
+ENCODING_DTYPES = ('float32', 'float16')
+DEFAULT_ENCODING_DTYPE = 'float32'
+# dlib_face_recognition_resnet_model_v1, the model behind face_recognition.face_encodings
+DEFAULT_MODEL_VERSION = 'dlib_resnet_v1'
+
+
+def pack_encoding(encoding, dtype=DEFAULT_ENCODING_DTYPE):
+    """
+    Serialize one encoding as raw little-endian bytes
+    Returns: (bytes, dim)
+    """
+    if dtype not in ENCODING_DTYPES:
+        raise ValueError(f"Unsupported encoding dtype '{dtype}', expected one of {ENCODING_DTYPES}")
+    encoding = np.asarray(encoding, dtype=np.dtype(dtype).newbyteorder('<')).ravel()
+    return encoding.tobytes(), len(encoding)
+
+
+def unpack_encodings(buffers, dtypes, dim):
+    """
+    Decode stored encodings into one float32 matrix, one frombuffer per dtype
+    Returns: (encodings, valid) where valid indexes the buffers that decoded,
+    i.e. had a known dtype and exactly `dim` values
+    """
+    dtypes = np.array([dtype or DEFAULT_ENCODING_DTYPE for dtype in dtypes], dtype=object)
+    sizes = np.fromiter((len(buffer) if buffer is not None else -1 for buffer in buffers),
+                        dtype=np.int64, count=len(buffers))
+    valid = np.zeros(len(buffers), dtype=bool)
+    for dtype in ENCODING_DTYPES:
+        valid |= (dtypes == dtype) & (sizes == dim * np.dtype(dtype).itemsize)
+    valid = np.flatnonzero(valid)
+
+    encodings = np.empty((len(valid), dim), dtype=np.float32)
+    for dtype in ENCODING_DTYPES:
+        positions = np.flatnonzero(dtypes[valid] == dtype)
+        if len(positions):
+            data = b''.join(buffers[i] for i in valid[positions])
+            encodings[positions] = np.frombuffer(data, dtype=np.dtype(dtype).newbyteorder('<')).reshape(-1, dim)
+    return encodings, valid
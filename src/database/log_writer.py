@@ -0,0 +1,193 @@
+import time
+import logging
+import datetime
+import threading
+from itertools import groupby
+from collections import deque
+from sqlalchemy.exc import SQLAlchemyError
+from .base import Session
+from .models import DetectionLog, Sighting
+from .statistics import accumulate_statistics
+
+OVERFLOW_POLICIES = ('drop_oldest', 'drop_newest', 'block')
+
+
+class DetectionLogWriter:
+    """
+    Write-behind logger for detection events.
+
+    `log` and `log_sighting` only append the row to a bounded in-memory
+    queue, so the recognition loop never waits on SQLite. A background thread flushes the
+    queue as one bulk INSERT per transaction whenever `batch_size` events
+    are waiting or `flush_interval` seconds have passed since the oldest
+    one was queued. `close` writes whatever is left before returning.
+
+    The person_statistics counters are updated in the same transaction as
+    the rows they count, and pushed to the `statistics` cache (a
+    PersonStatisticsCache) once committed.
+
+    When the queue is full the overflow policy decides: 'drop_oldest'
+    discards the oldest queued event, 'drop_newest' discards the incoming
+    one and 'block' makes `log` wait for the writer (up to `block_timeout`).
+
+    Attributes:
+        written: Events committed to the database
+        dropped: Events discarded by the overflow policy
+        failed: Events lost to failed flushes
+        batches: Flushes committed
+    """
+
+    def __init__(self, session_factory=Session, max_queue=10000, batch_size=256, flush_interval=1.0,
+                 overflow='drop_oldest', block_timeout=1.0, statistics=None):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy '{overflow}', expected one of {OVERFLOW_POLICIES}")
+        self.logger = logging.getLogger(__name__)
+        self.session_factory = session_factory
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.statistics = statistics
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+        self._events = deque()
+        self._condition = threading.Condition()
+        self._flush_requested = False
+        self._in_flight = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="detection-log-writer", daemon=True)
+        self._thread.start()
+
+    def log(self, person_id, confidence, frame_quality=None, location_x=None, location_y=None,
+            environment_data=None, detection_time=None, box=None):
+        """
+        Queue one detection event; a (top, right, bottom, left) `box` fills
+        location_x/location_y with its top-left corner
+        Returns: True if the event was queued, False if it was dropped
+        """
+        if box is not None:
+            location_x, location_y = int(box[3]), int(box[0])
+        return self._enqueue(DetectionLog.__table__, {
+            'person_id': int(person_id),
+            'confidence': float(confidence),
+            'frame_quality': float(frame_quality) if frame_quality is not None else None,
+            'location_x': location_x,
+            'location_y': location_y,
+            'detection_time': detection_time or datetime.datetime.utcnow(),
+            'environment_data': environment_data
+        })
+
+    def log_sighting(self, row):
+        """Queue one closed sighting, a dict of Sighting column values"""
+        return self._enqueue(Sighting.__table__, row)
+
+    def _enqueue(self, table, row):
+        event = (table, row, time.time())
+        with self._condition:
+            if self._closed:
+                self.dropped += 1
+                return False
+            if len(self._events) >= self.max_queue:
+                if self.overflow == 'drop_newest':
+                    self.dropped += 1
+                    return False
+                if self.overflow == 'drop_oldest':
+                    self._events.popleft()
+                    self.dropped += 1
+                elif not self._condition.wait_for(lambda: len(self._events) < self.max_queue or self._closed,
+                                                  self.block_timeout) or self._closed:
+                    self.dropped += 1
+                    return False
+            self._events.append(event)
+            # Wake the writer to start the flush timer, or to flush a full batch
+            if len(self._events) == 1 or len(self._events) >= self.batch_size:
+                self._condition.notify_all()
+            return True
+
+    @property
+    def pending(self):
+        with self._condition:
+            return len(self._events) + self._in_flight
+
+    def _flush_due(self):
+        if self._closed or self._flush_requested or len(self._events) >= self.batch_size:
+            return True
+        return bool(self._events) and time.time() - self._events[0][2] >= self.flush_interval
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._flush_due():
+                    if self._events:
+                        timeout = self._events[0][2] + self.flush_interval - time.time()
+                    else:
+                        timeout = None
+                    self._condition.wait(timeout)
+                if self._closed and not self._events:
+                    break
+                batch = [self._events.popleft() for _ in range(min(self.batch_size, len(self._events)))]
+                self._in_flight = len(batch)
+                if not self._events:
+                    self._flush_requested = False
+                # Room in the queue again for writers blocked by the 'block' policy
+                self._condition.notify_all()
+
+            if batch:
+                self._write(batch)
+            with self._condition:
+                self._in_flight = 0
+                self._condition.notify_all()
+        remove = getattr(self.session_factory, 'remove', None)
+        if remove is not None:
+            remove()
+
+    def _write(self, batch):
+        session = self.session_factory()
+        try:
+            # One executemany per run of rows for the same table, all in one transaction
+            changed = {}
+            for table, events in groupby(batch, key=lambda event: event[0]):
+                rows = [row for _, row, _ in events]
+                session.execute(table.insert(), rows)
+                for stats in accumulate_statistics(session, table, rows):
+                    changed[stats.person_id] = stats
+            committed = [stats.to_dict() for stats in changed.values()]
+            session.commit()
+            if self.statistics is not None:
+                self.statistics.update(committed)
+            self.written += len(batch)
+            self.batches += 1
+        except SQLAlchemyError as e:
+            session.rollback()
+            self.failed += len(batch)
+            self.logger.error(f"Failed to write {len(batch)} log rows: {str(e)}")
+        finally:
+            session.close()
+
+    def flush(self, timeout=None):
+        """Wait until everything queued so far is written"""
+        with self._condition:
+            self._flush_requested = True
+            self._condition.notify_all()
+            return self._condition.wait_for(lambda: not self._events and not self._in_flight, timeout)
+
+    def stats(self):
+        return {
+            'pending': self.pending,
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'batches': self.batches
+        }
+
+    def close(self, timeout=10.0):
+        """Flush the remaining events and stop the writer thread"""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join(timeout)
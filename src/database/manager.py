@@ -1,12 +1,20 @@
 import json
 from contextlib import contextmanager
+from sqlalchemy import func
 from sqlalchemy.exc import SQLAlchemyError
 from .base import Session
-from .models import Person, Group, FaceEncoding, ReferenceImage, DetectionLog
+from .models import Person, Group, FaceEncoding, ReferenceImage, DetectionLog, Sighting, PersonStatistics
+from .encoding_codec import DEFAULT_ENCODING_DTYPE, pack_encoding
+from .settings import active_model_version
+from .statistics import PersonStatisticsCache, min_known, max_known
 
 class DatabaseManager:
-    def __init__(self):
-        self.session = Session()
+    def __init__(self, session=None, statistics=None, recognizer=None):
+        self.session = session or Session()
+        # Shared with the DetectionLogWriter, which keeps it current
+        self.statistics = statistics or PersonStatisticsCache()
+        # FaceEncoder whose in-memory gallery follows committed removals and renames
+        self.recognizer = recognizer
 
     def __del__(self):
         self.session.close()
@@ -36,9 +44,11 @@ class DatabaseManager:
                         person.groups.append(group)
                 
                 session.add(person)
-                return person
         except SQLAlchemyError as e:
             raise Exception(f"Error creating person: {str(e)}")
+        if self.recognizer is not None and groups:
+            self.recognizer.set_person_groups(person.id, groups)
+        return person
 
     def get_or_create_group(self, name, description=None):
         """Get existing group or create new one"""
@@ -49,13 +59,22 @@ class DatabaseManager:
                 session.add(group)
             return group
 
-    def add_face_encoding(self, person_id, encoding, quality_score=None):
-        """Add a face encoding for a person"""
+    def add_face_encoding(self, person_id, encoding, quality_score=None, dtype=DEFAULT_ENCODING_DTYPE,
+                          model_version=None, reference_image_id=None):
+        """
+        Add a face encoding for a person, stored as a float32 or float16 blob,
+        under the active model version unless `model_version` is given
+        """
         try:
             with self.session_scope() as session:
+                encoding_data, dim = pack_encoding(encoding, dtype)
                 face_encoding = FaceEncoding(
                     person_id=person_id,
-                    encoding=json.dumps(encoding.tolist()),
+                    encoding_data=encoding_data,
+                    dim=dim,
+                    dtype=dtype,
+                    model_version=model_version or active_model_version(session),
+                    reference_image_id=reference_image_id,
                     quality_score=quality_score
                 )
                 session.add(face_encoding)
@@ -139,17 +158,90 @@ class DatabaseManager:
             'avg_frame_quality': float(stats.avg_frame_quality) if stats and stats.avg_frame_quality else 0.0
         }
 
+    def get_person_statistics(self, person_id):
+        """
+        Get a person's detection counters from the in-memory cache; only the
+        first call loads the person_statistics table
+        """
+        if not self.statistics.loaded:
+            self.statistics.load(self.session)
+        return self.statistics.get(person_id)
+
+    def rebuild_person_statistics(self):
+        """Recompute person_statistics from detection_logs and sightings, e.g. for history logged before it existed"""
+        try:
+            with self.session_scope() as session:
+                session.query(PersonStatistics).delete()
+                stats = {}
+                def entry(person_id):
+                    if person_id not in stats:
+                        stats[person_id] = PersonStatistics(person_id=person_id, total_detections=0,
+                                                            total_sightings=0, frames_seen=0, confidence_sum=0.0)
+                    return stats[person_id]
+
+                for person_id, count, total, best, first, last in session.query(
+                        DetectionLog.person_id, func.count(DetectionLog.id), func.sum(DetectionLog.confidence),
+                        func.max(DetectionLog.confidence), func.min(DetectionLog.detection_time),
+                        func.max(DetectionLog.detection_time)).group_by(DetectionLog.person_id):
+                    row = entry(person_id)
+                    row.total_detections = count
+                    row.confidence_sum += total or 0.0
+                    row.best_confidence = best
+                    row.first_seen, row.last_seen = first, last
+
+                for person_id, count, frames, total, best, first, last in session.query(
+                        Sighting.person_id, func.count(Sighting.id), func.sum(Sighting.frame_count),
+                        func.sum(Sighting.mean_confidence * Sighting.frame_count), func.max(Sighting.best_confidence),
+                        func.min(Sighting.first_seen), func.max(Sighting.last_seen))\
+                        .filter(Sighting.person_id.isnot(None)).group_by(Sighting.person_id):
+                    row = entry(person_id)
+                    row.total_sightings = count
+                    row.frames_seen = frames or 0
+                    row.confidence_sum += total or 0.0
+                    row.best_confidence = max_known(row.best_confidence, best)
+                    row.first_seen = min_known(row.first_seen, first)
+                    row.last_seen = max_known(row.last_seen, last)
+
+                session.add_all(stats.values())
+                self.statistics.update([row.to_dict() for row in stats.values()])
+                return len(stats)
+        except SQLAlchemyError as e:
+            raise Exception(f"Error rebuilding person statistics: {str(e)}")
+
+    def get_sightings(self, person_id, since=None, limit=100):
+        """Get a person's sightings, most recent first"""
+        query = self.session.query(Sighting).filter_by(person_id=person_id)
+        if since is not None:
+            query = query.filter(Sighting.last_seen >= since)
+        return query.order_by(Sighting.first_seen.desc()).limit(limit).all()
+
     def soft_delete_person(self, person_id):
-        """Soft delete a person"""
+        """Soft delete a person and drop their encodings from the recognizer's gallery"""
         try:
             with self.session_scope() as session:
                 person = session.query(Person).filter_by(id=person_id).first()
-                if person:
-                    person.is_active = False
-                    return True
-                return False
+                if not person:
+                    return False
+                person.is_active = False
         except SQLAlchemyError as e:
             raise Exception(f"Error soft deleting person: {str(e)}")
+        if self.recognizer is not None:
+            self.recognizer.remove_person(person_id)
+        return True
+
+    def deactivate_face_encoding(self, encoding_id):
+        """Deactivate one face encoding and drop it from the recognizer's gallery"""
+        try:
+            with self.session_scope() as session:
+                face_encoding = session.query(FaceEncoding).filter_by(id=encoding_id).first()
+                if not face_encoding:
+                    return False
+                face_encoding.is_active = False
+        except SQLAlchemyError as e:
+            raise Exception(f"Error deactivating face encoding: {str(e)}")
+        if self.recognizer is not None:
+            self.recognizer.remove_known_face(encoding_id)
+        return True
 
     def update_person(self, person_id, name=None, notes=None, metadata=None, groups=None):
         """Update person information"""
@@ -167,7 +259,11 @@ class DatabaseManager:
                     person.person_metadata = json.dumps(metadata)
                 if groups is not None:
                     person.groups = [self.get_or_create_group(g) for g in groups]
-
-                return person
         except SQLAlchemyError as e:
             raise Exception(f"Error updating person: {str(e)}")
+        if self.recognizer is not None:
+            if name:
+                self.recognizer.rename_person(person_id, name)
+            if groups is not None:
+                self.recognizer.set_person_groups(person_id, groups)
+        return person
@@ -0,0 +1,185 @@
+"""
+Convert face encodings stored as JSON text into binary blobs.
+
+Older databases keep each encoding as json.dumps(encoding.tolist()) in
+face_encodings.encoding. This adds the encoding_data, dim, dtype,
+model_version, is_active and reference_image_id columns, converts the
+JSON rows in batches and, once every row is converted, drops the JSON
+column. Rows that cannot be decoded keep their JSON, in a column made
+nullable so that new encodings can still be inserted.
+
+SQLite before 3.35 has no DROP COLUMN and no SQLite version can relax
+NOT NULL, so on SQLite the table is rebuilt from the FaceEncoding model
+instead; other databases use ALTER TABLE.
+
+    python -m src.database.migrate_encodings [--dtype float16] [--batch-size 1000]
+"""
+import json
+import argparse
+import logging
+import numpy as np
+from sqlalchemy import Column, MetaData, Table, Text, bindparam, inspect, select, text
+from .base import Base, engine as default_engine
+from .models import FaceEncoding
+from .encoding_codec import DEFAULT_ENCODING_DTYPE, DEFAULT_MODEL_VERSION, ENCODING_DTYPES
+
+logger = logging.getLogger(__name__)
+
+# Values for rows that existed before the column did
+_BACKFILL = {
+    'dtype': DEFAULT_ENCODING_DTYPE,
+    'model_version': DEFAULT_MODEL_VERSION,
+    'is_active': True
+}
+
+
+def add_missing_columns(engine):
+    """
+    Add the FaceEncoding columns and indexes the face_encodings table lacks
+    Returns: Names of the added columns
+    """
+    existing = {column['name'] for column in inspect(engine).get_columns('face_encodings')}
+    added = []
+    with engine.begin() as connection:
+        for column in FaceEncoding.__table__.columns:
+            if column.name in existing:
+                continue
+            # Added as nullable, existing rows have no value yet
+            column_type = column.type.compile(dialect=engine.dialect)
+            connection.execute(text(f"ALTER TABLE face_encodings ADD COLUMN {column.name} {column_type}"))
+            if column.name in _BACKFILL:
+                connection.execute(text(f"UPDATE face_encodings SET {column.name} = :value"),
+                                   {'value': _BACKFILL[column.name]})
+            added.append(column.name)
+        for index in FaceEncoding.__table__.indexes:
+            index.create(connection, checkfirst=True)
+    return added
+
+
+def _rebuild_sqlite_table(connection, keep_json):
+    """
+    Recreate face_encodings with the FaceEncoding columns, plus a nullable
+    JSON `encoding` column if `keep_json`, and copy every row over
+    """
+    metadata = MetaData()
+    # Referenced tables, so the copied foreign keys resolve; they are not created
+    for name in ('persons', 'reference_images'):
+        Base.metadata.tables[name].to_metadata(metadata)
+    rebuilt = FaceEncoding.__table__.to_metadata(metadata, name='face_encodings_rebuilt')
+    # Index names must stay free until the old table is gone
+    rebuilt.indexes.clear()
+    if keep_json:
+        # Rows that failed to convert only have their JSON
+        for name in ('encoding_data', 'dim'):
+            rebuilt.c[name].nullable = True
+        rebuilt.append_column(Column('encoding', Text))
+    rebuilt.create(connection)
+    columns = ', '.join(column.name for column in rebuilt.columns)
+    connection.execute(text(f"INSERT INTO face_encodings_rebuilt ({columns}) SELECT {columns} FROM face_encodings"))
+    connection.execute(text("DROP TABLE face_encodings"))
+    connection.execute(text("ALTER TABLE face_encodings_rebuilt RENAME TO face_encodings"))
+    for index in FaceEncoding.__table__.indexes:
+        index.create(connection)
+
+
+def migrate_json_encodings(engine=None, dtype=DEFAULT_ENCODING_DTYPE, model_version=DEFAULT_MODEL_VERSION,
+                           batch_size=1000, vacuum=True):
+    """
+    Convert every JSON encoding into a blob, one transaction per batch, so an
+    interrupted run resumes where it stopped
+    Returns: Dict with converted and failed row counts, failed ids and
+    whether the JSON column was dropped
+    """
+    if dtype not in ENCODING_DTYPES:
+        raise ValueError(f"Unsupported encoding dtype '{dtype}', expected one of {ENCODING_DTYPES}")
+    engine = engine or default_engine
+    added = add_missing_columns(engine)
+    if added:
+        logger.info(f"Added columns {added} to face_encodings")
+
+    table = Table('face_encodings', MetaData(), autoload_with=engine, resolve_fks=False)
+    if 'encoding' not in table.c:
+        return {'converted': 0, 'failed': 0, 'failed_ids': [], 'dropped_json': False}
+
+    update = table.update()\
+        .where(table.c.id == bindparam('row_id'))\
+        .values(encoding_data=bindparam('data'), dim=bindparam('row_dim'), dtype=dtype, model_version=model_version)
+    converted = 0
+    failed_ids = []
+    last_id = 0
+    while True:
+        # Keyset pagination over rows still waiting for a blob
+        with engine.begin() as connection:
+            rows = connection.execute(
+                select(table.c.id, table.c.encoding)
+                .where(table.c.encoding_data.is_(None), table.c.id > last_id)
+                .order_by(table.c.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            vectors = {}
+            for row in rows:
+                try:
+                    vectors[row.id] = np.asarray(json.loads(row.encoding), dtype=np.float32).ravel()
+                except (TypeError, ValueError):
+                    failed_ids.append(row.id)
+            dims = {len(vector) for vector in vectors.values()}
+            if len(dims) == 1:
+                # Common case: one shape, one cast for the whole batch
+                ids = list(vectors)
+                packed = np.stack([vectors[row_id] for row_id in ids]).astype(np.dtype(dtype).newbyteorder('<'))
+                params = [{'row_id': row_id, 'data': packed[i].tobytes(), 'row_dim': packed.shape[1]}
+                          for i, row_id in enumerate(ids)]
+            else:
+                params = [{'row_id': row_id, 'data': vector.astype(np.dtype(dtype).newbyteorder('<')).tobytes(),
+                           'row_dim': len(vector)} for row_id, vector in vectors.items()]
+            if params:
+                connection.execute(update, params)
+            converted += len(params)
+        logger.info(f"Converted {converted} encodings")
+
+    dropped = False
+    sqlite = engine.dialect.name == 'sqlite'
+    if failed_ids:
+        logger.error(f"{len(failed_ids)} encodings could not be decoded, keeping the JSON column: {failed_ids[:20]}")
+        if not table.c.encoding.nullable:
+            # Inserts through FaceEncoding leave the unmapped column empty
+            with engine.begin() as connection:
+                if sqlite:
+                    _rebuild_sqlite_table(connection, keep_json=True)
+                else:
+                    connection.execute(text("ALTER TABLE face_encodings ALTER COLUMN encoding DROP NOT NULL"))
+    else:
+        with engine.begin() as connection:
+            if sqlite:
+                _rebuild_sqlite_table(connection, keep_json=False)
+            else:
+                connection.execute(text("ALTER TABLE face_encodings DROP COLUMN encoding"))
+        dropped = True
+        if vacuum and sqlite:
+            # Give the space of the JSON text back to the file system
+            with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+                connection.execute(text("VACUUM"))
+    return {'converted': converted, 'failed': len(failed_ids), 'failed_ids': failed_ids, 'dropped_json': dropped}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert JSON face encodings into binary blobs")
+    parser.add_argument('--dtype', choices=ENCODING_DTYPES, default=DEFAULT_ENCODING_DTYPE)
+    parser.add_argument('--model-version', default=DEFAULT_MODEL_VERSION)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--no-vacuum', action='store_true', help="Skip reclaiming disk space afterwards")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    result = migrate_json_encodings(dtype=args.dtype, model_version=args.model_version,
+                                    batch_size=args.batch_size, vacuum=not args.no_vacuum)
+    print(f"Converted {result['converted']} encodings, {result['failed']} failed"
+          + (", dropped the JSON column" if result['dropped_json'] else ""))
+
+
+if __name__ == '__main__':
+    main()
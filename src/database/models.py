@@ -28,6 +28,8 @@ class Person(Base):
     groups = relationship("Group", secondary=person_groups, back_populates="persons")
     reference_images = relationship("ReferenceImage", back_populates="person", cascade="all, delete-orphan")
     detection_logs = relationship("DetectionLog", back_populates="person")
+    sightings = relationship("Sighting", back_populates="person")
+    statistics = relationship("PersonStatistics", back_populates="person", uselist=False)
     
     __table_args__ = (Index('idx_person_name_active', 'name', 'is_active'),)
 
@@ -67,19 +69,33 @@ class FaceEncoding(Base):
     
     id = Column(Integer, primary_key=True)
     person_id = Column(Integer, ForeignKey('persons.id'), nullable=False)
-    encoding = Column(String(2000), nullable=False)  # Stored as JSON string
+    encoding_data = Column(LargeBinary, nullable=False)  # Raw vector, see encoding_codec
+    dim = Column(Integer, nullable=False)
+    dtype = Column(String(10), nullable=False, default='float32')  # 'float32' or 'float16'
+    model_version = Column(String(50), nullable=False)
+    is_active = Column(Boolean, default=True)
+    reference_image_id = Column(Integer, ForeignKey('reference_images.id'))  # Source image, if stored
     quality_score = Column(Float)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
     
     # Relationships
     person = relationship("Person", back_populates="face_encodings")
+    reference_image = relationship("ReferenceImage")
     
-    __table_args__ = (Index('idx_person_encoding', 'person_id'),)
+    __table_args__ = (
+        Index('idx_person_encoding', 'person_id'),
+        Index('idx_encoding_version_image', 'model_version', 'reference_image_id'),
+    )
 
     def to_dict(self):
         return {
             'id': self.id,
             'person_id': self.person_id,
+            'dim': self.dim,
+            'dtype': self.dtype,
+            'model_version': self.model_version,
+            'is_active': self.is_active,
+            'reference_image_id': self.reference_image_id,
             'quality_score': self.quality_score,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
@@ -135,3 +151,75 @@ class DetectionLog(Base):
             'detection_time': self.detection_time.isoformat() if self.detection_time else None,
             'environment': json.loads(self.environment_data) if self.environment_data else {}
         }
+
+class Sighting(Base):
+    __tablename__ = 'sightings'
+    
+    id = Column(Integer, primary_key=True)
+    person_id = Column(Integer, ForeignKey('persons.id'))  # None for an unidentified track
+    camera_id = Column(String(200))
+    track_id = Column(Integer)
+    first_seen = Column(DateTime, nullable=False)
+    last_seen = Column(DateTime, nullable=False)
+    frame_count = Column(Integer, nullable=False)
+    best_confidence = Column(Float)
+    mean_confidence = Column(Float)
+    best_frame_quality = Column(Float)
+    environment_data = Column(String(500))  # JSON field for environment data of the best frame
+    
+    # Relationships
+    person = relationship("Person", back_populates="sightings")
+    
+    __table_args__ = (
+        Index('idx_sighting_person_time', 'person_id', 'first_seen'),
+        Index('idx_sighting_camera_time', 'camera_id', 'first_seen'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'person_id': self.person_id,
+            'camera_id': self.camera_id,
+            'track_id': self.track_id,
+            'first_seen': self.first_seen.isoformat() if self.first_seen else None,
+            'last_seen': self.last_seen.isoformat() if self.last_seen else None,
+            'frame_count': self.frame_count,
+            'best_confidence': self.best_confidence,
+            'mean_confidence': self.mean_confidence,
+            'best_frame_quality': self.best_frame_quality,
+            'environment': json.loads(self.environment_data) if self.environment_data else {}
+        }
+
+class Setting(Base):
+    __tablename__ = 'settings'
+
+    key = Column(String(50), primary_key=True)
+    value = Column(String(255))
+
+class PersonStatistics(Base):
+    __tablename__ = 'person_statistics'
+    
+    person_id = Column(Integer, ForeignKey('persons.id'), primary_key=True)
+    total_detections = Column(Integer, nullable=False, default=0)  # DetectionLog rows
+    total_sightings = Column(Integer, nullable=False, default=0)
+    frames_seen = Column(Integer, nullable=False, default=0)  # Frames covered by sightings
+    confidence_sum = Column(Float, nullable=False, default=0.0)  # Over detections and sighting frames
+    best_confidence = Column(Float)
+    first_seen = Column(DateTime)
+    last_seen = Column(DateTime)
+    
+    # Relationships
+    person = relationship("Person", back_populates="statistics")
+
+    def to_dict(self):
+        observations = (self.total_detections or 0) + (self.frames_seen or 0)
+        return {
+            'person_id': self.person_id,
+            'total_detections': self.total_detections or 0,
+            'total_sightings': self.total_sightings or 0,
+            'frames_seen': self.frames_seen or 0,
+            'avg_confidence': self.confidence_sum / observations if observations else 0.0,
+            'best_confidence': self.best_confidence,
+            'first_seen': self.first_seen.isoformat() if self.first_seen else None,
+            'last_seen': self.last_seen.isoformat() if self.last_seen else None
+        }
@@ -0,0 +1,20 @@
+from .models import Setting
+from .encoding_codec import DEFAULT_MODEL_VERSION
+
+# Model version of the active gallery and of new enrollments, set by the re-encode switch
+ACTIVE_MODEL_VERSION = 'active_model_version'
+
+
+def get_setting(session, key, default=None):
+    setting = session.get(Setting, key)
+    return setting.value if setting is not None else default
+
+
+def set_setting(session, key, value):
+    """Stage `key` = `value` in the session's transaction, the caller commits"""
+    session.merge(Setting(key=key, value=value))
+
+
+def active_model_version(session):
+    """Model version new encodings are written under, DEFAULT_MODEL_VERSION until a switch"""
+    return get_setting(session, ACTIVE_MODEL_VERSION, DEFAULT_MODEL_VERSION)
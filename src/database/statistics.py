@@ -0,0 +1,84 @@
+import threading
+from .models import DetectionLog, Sighting, PersonStatistics
+
+
+def max_known(a, b):
+    """Larger of two values, ignoring None"""
+    return b if a is None or (b is not None and b > a) else a
+
+
+def min_known(a, b):
+    """Smaller of two values, ignoring None"""
+    return b if a is None or (b is not None and b < a) else a
+
+
+def accumulate_statistics(session, table, rows):
+    """
+    Fold freshly inserted DetectionLog or Sighting rows into the
+    person_statistics counters, inside the caller's transaction
+    Returns: The PersonStatistics rows that changed
+    """
+    changed = {}
+    for row in rows:
+        person_id = row.get('person_id')
+        if person_id is None:
+            continue
+        stats = changed.get(person_id) or session.get(PersonStatistics, person_id)
+        if stats is None:
+            stats = PersonStatistics(person_id=person_id, total_detections=0, total_sightings=0,
+                                     frames_seen=0, confidence_sum=0.0)
+            session.add(stats)
+        changed[person_id] = stats
+
+        if table is DetectionLog.__table__:
+            stats.total_detections += 1
+            confidence = row['confidence']
+            stats.confidence_sum += confidence
+            stats.best_confidence = max_known(stats.best_confidence, confidence)
+            stats.first_seen = min_known(stats.first_seen, row['detection_time'])
+            stats.last_seen = max_known(stats.last_seen, row['detection_time'])
+        elif table is Sighting.__table__:
+            stats.total_sightings += 1
+            stats.frames_seen += row['frame_count']
+            stats.confidence_sum += (row['mean_confidence'] or 0.0) * row['frame_count']
+            stats.best_confidence = max_known(stats.best_confidence, row['best_confidence'])
+            stats.first_seen = min_known(stats.first_seen, row['first_seen'])
+            stats.last_seen = max_known(stats.last_seen, row['last_seen'])
+    return list(changed.values())
+
+
+class PersonStatisticsCache:
+    """
+    In-memory copy of the person_statistics table.
+
+    Loaded with one query, then kept current by the DetectionLogWriter
+    after every flush, so lookups from the render loop never touch the
+    database. People without statistics yet read as zero counters.
+    """
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+        self.loaded = False
+
+    def load(self, session):
+        stats = {row.person_id: row.to_dict() for row in session.query(PersonStatistics)}
+        with self._lock:
+            # Rows updated by a flush during the query are at least as recent
+            stats.update(self._stats)
+            self._stats = stats
+            self.loaded = True
+
+    def update(self, stats):
+        """Store committed statistics, a list of PersonStatistics.to_dict() results"""
+        with self._lock:
+            for entry in stats:
+                self._stats[entry['person_id']] = entry
+
+    def get(self, person_id):
+        with self._lock:
+            stats = self._stats.get(person_id)
+        if stats is None:
+            return PersonStatistics(person_id=person_id, total_detections=0, total_sightings=0,
+                                    frames_seen=0, confidence_sum=0.0).to_dict()
+        return dict(stats)
@@ -0,0 +1,168 @@
+# src/detection_cascade.py
+import logging
+import cv2
+import numpy as np
+
+
+def expand_region(box, padding, frame_shape):
+    """Grow a (top, right, bottom, left) box by `padding` of its size on each side, clipped to the frame"""
+    top, right, bottom, left = box
+    height, width = frame_shape[:2]
+    pad_y = int((bottom - top) * padding)
+    pad_x = int((right - left) * padding)
+    return (max(0, top - pad_y), min(width, right + pad_x),
+            min(height, bottom + pad_y), max(0, left - pad_x))
+
+
+def merge_regions(regions):
+    """Merge overlapping (top, right, bottom, left) regions until none overlap"""
+    regions = list(regions)
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(regions)):
+            for j in range(i + 1, len(regions)):
+                a, b = regions[i], regions[j]
+                if a[3] < b[1] and b[3] < a[1] and a[0] < b[2] and b[0] < a[2]:
+                    regions[i] = (min(a[0], b[0]), max(a[1], b[1]), max(a[2], b[2]), min(a[3], b[3]))
+                    del regions[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return regions
+
+
+class MotionGate:
+    """
+    Frame differencing on a small grayscale copy of each frame.
+    Reports whether enough pixels changed since the previous frame.
+    """
+
+    def __init__(self, pixel_delta=25, changed_fraction=0.01, width=160):
+        self.pixel_delta = pixel_delta
+        self.changed_fraction = changed_fraction
+        self.width = width
+        self._previous = None
+
+    def has_motion(self, frame):
+        scale = self.width / float(frame.shape[1])
+        small = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        gray = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+        previous, self._previous = self._previous, gray
+        if previous is None or previous.shape != gray.shape:
+            return True
+        changed = np.count_nonzero(cv2.absdiff(gray, previous) > self.pixel_delta)
+        return changed >= self.changed_fraction * gray.size
+
+
+class DetectionCascade:
+    """
+    Runs face detection as a cascade of increasingly expensive stages.
+
+    1. An optional motion gate reuses the previous result when the scene
+       has not changed.
+    2. A cheap detector (the Haar-cascade FaceDetector) proposes candidate
+       regions; frames without candidates stop here.
+    3. The expensive detector (HOG) runs only inside the padded, merged
+       candidate regions, and its boxes are mapped back to frame coordinates.
+
+    With `roi_padding` set, frames after a face was found skip straight to
+    the expensive detector inside windows grown around the previous boxes
+    (plus any fresh candidates from the cheap detector), so detection cost
+    follows face size rather than frame size. If the windows come up empty
+    the normal stages run on the same frame.
+
+    Every `full_scan_every` frames the expensive detector scans the whole
+    frame instead, so faces the cheap stage misses and new arrivals outside
+    the windows are still picked up.
+
+    Attributes:
+        stats: Counters of frames resolved at each stage
+    """
+
+    def __init__(self, detect, gate=None, motion_gate=None, region_padding=0.5, full_scan_every=30,
+                 roi_padding=None):
+        self.logger = logging.getLogger(__name__)
+        self.detect_full = detect
+        self.gate = gate
+        self.motion_gate = motion_gate
+        self.region_padding = region_padding
+        self.full_scan_every = full_scan_every
+        self.roi_padding = roi_padding
+        self.frame_index = 0
+        self._last_faces = []
+        self.stats = {'frames': 0, 'static': 0, 'gated': 0, 'regions': 0, 'roi_searches': 0, 'full_scans': 0}
+
+    def reset(self):
+        """Forget the previous result, e.g. after the frame size changed"""
+        self._last_faces = []
+        if self.motion_gate is not None:
+            self.motion_gate._previous = None
+
+    def _full_scan_due(self):
+        return self.full_scan_every and self.frame_index % self.full_scan_every == 0
+
+    def candidate_regions(self, frame):
+        """Padded, merged candidate regions from the cheap detector"""
+        if self.gate is None:
+            return None
+        boxes = [(y, x + w, y + h, x) for (x, y, w, h) in self.gate.detect_faces(frame)]
+        return merge_regions(expand_region(box, self.region_padding, frame.shape) for box in boxes)
+
+    def roi_regions(self, frame, previous, candidates=None):
+        """Search windows around previous face boxes, merged with fresh cheap-stage candidates"""
+        regions = [expand_region(box, self.roi_padding, frame.shape) for box in previous]
+        regions.extend(candidates or [])
+        return merge_regions(regions)
+
+    def detect_in_regions(self, frame, regions):
+        """Run the expensive detector on each region and map boxes back to the frame"""
+        faces = []
+        for top, right, bottom, left in regions:
+            crop = frame[top:bottom, left:right]
+            if crop.size == 0:
+                continue
+            for face_top, face_right, face_bottom, face_left in self.detect_full(crop):
+                faces.append((face_top + top, face_right + left, face_bottom + top, face_left + left))
+        return faces
+
+    def detect(self, frame, previous=None):
+        """
+        Locate faces in a BGR frame. `previous` overrides the boxes the ROI
+        search starts from, e.g. with tracked boxes; by default the last
+        result is used.
+        Returns: List of (top, right, bottom, left) boxes
+        """
+        self.stats['frames'] += 1
+        full_scan = self._full_scan_due()
+        self.frame_index += 1
+
+        if self.motion_gate is not None and not self.motion_gate.has_motion(frame) and not full_scan:
+            self.stats['static'] += 1
+            return list(self._last_faces)
+
+        candidates = None if full_scan else self.candidate_regions(frame)
+        if previous is None:
+            previous = self._last_faces
+        if self.roi_padding is not None and previous and not full_scan:
+            self.stats['roi_searches'] += 1
+            faces = self.detect_in_regions(frame, self.roi_regions(frame, previous, candidates))
+            if faces:
+                self._last_faces = faces
+                return faces
+
+        if full_scan or self.gate is None:
+            self.stats['full_scans'] += 1
+            faces = self.detect_full(frame)
+        else:
+            regions = candidates
+            if not regions:
+                self.stats['gated'] += 1
+                faces = []
+            else:
+                self.stats['regions'] += len(regions)
+                faces = self.detect_in_regions(frame, regions)
+
+        self._last_faces = faces
+        return faces
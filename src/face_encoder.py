@@ -2,128 +2,469 @@
 import face_recognition
 import cv2
 import numpy as np
+import json
 import logging
-from database import Person, FaceEncoding, DetectionLog, DatabaseManager, Session
-from sqlalchemy import desc
+from src.database import Person, Group, FaceEncoding, DatabaseManager, DetectionLogWriter, unpack_encodings
+from src.gallery import FaceGallery
+from src.search_index import BruteForceIndex, create_index, search_rows
+from src.group_scopes import GroupScopes
+from src.gallery_snapshot import SnapshotError, read_snapshot, write_snapshot
+from src.micro_batcher import MicroBatcher
+from src.config import BatchingConfig, DetectionLogConfig, RecognitionConfig
 
 class FaceEncoder:
-    def __init__(self, db_session):
+    def __init__(self, db_session, index_type=None, snapshot_dir=None, log_writer=None, scope=None):
         self.db_session = db_session
+        self._log_writer = log_writer
         self.logger = logging.getLogger(__name__)
-        self.known_face_encodings = []
-        self.known_face_ids = []
-        self.known_face_names = []
+        self.gallery = FaceGallery()
+        self.scopes = GroupScopes(self.gallery)
+        # Group name(s) searched by default, None searches the whole gallery
+        self.scope = scope if scope is not None else RecognitionConfig.SEARCH_SCOPE
+        self.index_type = index_type or RecognitionConfig.INDEX_TYPE
+        self.index = BruteForceIndex(self.gallery)
+        self.active_index_type = 'brute_force'
+        # Quality score per encoding id, shared with the prototype index
+        self.qualities = {}
+        self.snapshot_dir = snapshot_dir or RecognitionConfig.GALLERY_SNAPSHOT_DIR
         self.last_face_location = None
-        self.load_known_faces()
+        self.last_face_locations = []
+        if not (self.snapshot_dir and self.load_snapshot(self.snapshot_dir)):
+            if self.load_known_faces() and self.snapshot_dir:
+                self.save_snapshot(self.snapshot_dir)
+
+    @property
+    def known_face_ids(self):
+        return self.gallery.person_ids
+
+    @property
+    def known_face_names(self):
+        return self.gallery.names
+        
+    def _active_encodings_query(self):
+        return self.db_session.query(FaceEncoding)\
+            .join(Person)\
+            .filter(FaceEncoding.is_active == True)\
+            .filter(Person.is_active == True)
+
+    def _decode_rows(self, query):
+        """Fetch FaceEncoding rows from a query and decode them into (encodings, person_ids, names, encoding_ids)"""
+        rows = query.with_entities(
+            FaceEncoding.id,
+            FaceEncoding.person_id,
+            Person.name,
+            FaceEncoding.encoding_data,
+            FaceEncoding.dtype
+        ).all()
+        if not rows:
+            return np.empty((0, self.gallery.dim), dtype=np.float32), [], [], []
+        encoding_ids, person_ids, names, buffers, dtypes = zip(*rows)
+
+        # Decode every row in one pass
+        encodings, valid = unpack_encodings(buffers, dtypes, self.gallery.dim)
+        if len(valid) < len(rows):
+            skipped = np.setdiff1d(np.arange(len(rows)), valid)
+            self.logger.warning(f"Skipping {len(skipped)} encodings with an unexpected size or dtype, "
+                                f"ids {[encoding_ids[i] for i in skipped[:10]]}")
+        return (
+            encodings,
+            [person_ids[i] for i in valid],
+            [names[i] for i in valid],
+            [encoding_ids[i] for i in valid]
+        )
         
     def load_known_faces(self):
         """Load known faces from database"""
         try:
             # Get all active face encodings
-            face_encodings = self.db_session.query(FaceEncoding)\
-                .join(Person)\
-                .filter(FaceEncoding.is_active == True)\
-                .filter(Person.is_active == True)\
-                .all()
-                
-            self.known_face_encodings = []
-            self.known_face_ids = []
-            self.known_face_names = []
-            
-            for face_encoding in face_encodings:
-                encoding = np.frombuffer(face_encoding.encoding_data, dtype=np.float32)
-                if encoding.shape[0] == 128:
-                    self.known_face_encodings.append(encoding)
-                    self.known_face_ids.append(face_encoding.person_id)
-                    self.known_face_names.append(face_encoding.person.name)
-                else:
-                    self.logger.warning(f"Incorrect encoding shape for person {face_encoding.person.name}, skipping")
+            encodings, person_ids, names, encoding_ids = self._decode_rows(self._active_encodings_query())
+            self.gallery.load(encodings, person_ids, names, encoding_ids)
+            self.load_groups()
+            self.build_index()
+            return True
         except Exception as e:
             self.logger.error(f"Failed to load known faces: {str(e)}")
+            return False
+
+    def load_snapshot(self, directory):
+        """
+        Attach a memory-mapped gallery snapshot, then replay only the database
+        changes made since it was written. Once the replayed changes exceed
+        SNAPSHOT_REFRESH_RATIO of the snapshot, the patched gallery is written
+        back as a new generation, so later starts do not replay them again.
+        """
+        try:
+            snapshot = read_snapshot(directory)
+        except SnapshotError as e:
+            self.logger.warning(f"Gallery snapshot unavailable, loading from database: {str(e)}")
+            return False
+
+        try:
+            self._attach_snapshot(snapshot)
+            changes = self._replay_changes(snapshot)
+            if changes > RecognitionConfig.SNAPSHOT_REFRESH_RATIO * max(len(snapshot), 1):
+                self.refresh_snapshot(directory)
+            if self.gallery.tombstone_ratio >= RecognitionConfig.COMPACTION_TOMBSTONE_RATIO:
+                self.gallery.compact()
+            self.load_groups()
+            self.build_index()
+        except Exception as e:
+            self.logger.error(f"Failed to replay gallery snapshot: {str(e)}")
+            self.gallery.clear()
+            return False
+        self.logger.info(f"Loaded gallery snapshot with {len(snapshot)} encodings from {directory}")
+        return True
+
+    def _attach_snapshot(self, snapshot):
+        self.gallery.attach(
+            snapshot.encodings,
+            snapshot.person_ids,
+            snapshot.names,
+            snapshot.encoding_ids,
+            snapshot.sq_norms
+        )
+
+    def _add_decoded(self, query):
+        encodings, person_ids, names, encoding_ids = self._decode_rows(query)
+        for row in range(len(encoding_ids)):
+            self.gallery.add(encodings[row], person_ids[row], names[row], encoding_ids[row])
+
+    def _replay_changes(self, snapshot, chunk_size=500):
+        """
+        Patch snapshot rows with enrollments, removals and renames made since it was written
+        Returns: Number of encodings removed or added
+        """
+        active_ids = np.fromiter(
+            (row.id for row in self._active_encodings_query().with_entities(FaceEncoding.id)),
+            dtype=np.int64
+        )
+
+        # Encodings or persons deactivated since the snapshot
+        stale = np.flatnonzero(~np.isin(self.gallery.encoding_ids, active_ids))
+        self.gallery.remove_rows(stale)
+
+        # Encodings enrolled since the snapshot all lie past its high-water mark
+        newer = int(np.count_nonzero(active_ids > snapshot.high_water_mark))
+        if newer:
+            self._add_decoded(self._active_encodings_query()
+                              .filter(FaceEncoding.id > snapshot.high_water_mark)
+                              .order_by(FaceEncoding.id))
+
+        # Older encodings missing from the snapshot were reactivated since
+        missing = np.setdiff1d(active_ids, self.gallery.encoding_ids).tolist()
+        for start in range(0, len(missing), chunk_size):
+            self._add_decoded(
+                self._active_encodings_query().filter(FaceEncoding.id.in_(missing[start:start + chunk_size]))
+            )
+
+        renamed = self.db_session.query(Person.id, Person.name)\
+            .filter(Person.last_updated_at > snapshot.created_at)\
+            .all()
+        for person_id, name in renamed:
+            self.gallery.rename_person(person_id, name)
+
+        self.logger.info(f"Replayed snapshot: {len(stale)} removed, {newer} enrolled, {len(missing)} reactivated, "
+                         f"{len(renamed)} renamed")
+        return len(stale) + newer + len(missing)
+
+    def refresh_snapshot(self, directory=None):
+        """
+        Write the live gallery rows as a new snapshot generation and attach
+        it, dropping tombstones and the rows copied in by the replay
+        Returns: True if the new generation is attached
+        """
+        directory = directory or self.snapshot_dir
+        if not directory or not self.save_snapshot(directory):
+            return False
+        try:
+            self._attach_snapshot(read_snapshot(directory))
+        except SnapshotError as e:
+            # The gallery is still intact, it is just not backed by the new generation
+            self.logger.error(f"Failed to attach refreshed gallery snapshot: {str(e)}")
+            return False
+        self.logger.info(f"Refreshed gallery snapshot in {directory} with {len(self.gallery)} encodings")
+        return True
+
+    def save_snapshot(self, directory):
+        """Write the live gallery rows as a snapshot other processes can memory-map"""
+        try:
+            rows = np.flatnonzero(self.gallery.alive)
+            encoding_ids = self.gallery.encoding_ids[rows]
+            write_snapshot(
+                directory,
+                self.gallery.take(rows),
+                self.gallery.person_ids[rows],
+                encoding_ids,
+                self.gallery.names[rows],
+                high_water_mark=int(encoding_ids.max()) if len(rows) else 0
+            )
+            return True
+        except Exception as e:
+            self.logger.error(f"Failed to save gallery snapshot: {str(e)}")
+            return False
             
-    def encode_face(self, frame):
-        """Convert frame to face encoding using face_recognition library"""
+    def load_groups(self):
+        """Reload group membership of active persons from person_groups"""
+        memberships = self.db_session.query(Group.name, Person.id)\
+            .select_from(Person)\
+            .join(Person.groups)\
+            .filter(Person.is_active == True)\
+            .all()
+        self.scopes.load(memberships)
+
+    def set_person_groups(self, person_id, groups):
+        """Apply a membership change (e.g. from DatabaseManager.update_person) without reloading"""
+        self.scopes.set_person_groups(person_id, groups)
+
+    def _quality_scores(self):
+        """quality_score of every active encoding, keyed by encoding id"""
+        return dict(self._active_encodings_query()
+                    .with_entities(FaceEncoding.id, FaceEncoding.quality_score)
+                    .filter(FaceEncoding.quality_score.isnot(None))
+                    .all())
+
+    def _wanted_index_type(self):
+        """The configured index type, or brute force while the live gallery is below its size threshold"""
+        thresholds = {
+            'ivf': RecognitionConfig.IVF_MIN_GALLERY_SIZE,
+            'quantized': RecognitionConfig.QUANTIZED_MIN_GALLERY_SIZE,
+            'prototype': RecognitionConfig.PROTOTYPE_MIN_GALLERY_SIZE
+        }
+        if self.gallery.live_count < thresholds.get(self.index_type, 0):
+            return 'brute_force'
+        return self.index_type
+
+    def build_index(self):
+        """(Re)build the search index over the current gallery rows"""
+        index_type = self._wanted_index_type()
+        if index_type == 'quantized':
+            self.index = create_index(
+                self.gallery,
+                self.index_type,
+                precision=RecognitionConfig.QUANTIZED_PRECISION,
+                rerank=RecognitionConfig.QUANTIZED_RERANK
+            )
+        elif index_type == 'prototype':
+            self.qualities.update(self._quality_scores())
+            self.index = create_index(
+                self.gallery,
+                self.index_type,
+                qualities=self.qualities,
+                n_exemplars=RecognitionConfig.PROTOTYPE_EXEMPLARS,
+                n_candidates=RecognitionConfig.PROTOTYPE_CANDIDATES
+            )
+        elif index_type != 'brute_force':
+            self.index = create_index(
+                self.gallery,
+                self.index_type,
+                n_lists=RecognitionConfig.IVF_LISTS,
+                n_probe=RecognitionConfig.IVF_PROBES
+            )
+        else:
+            self.index = BruteForceIndex(self.gallery)
+        self.active_index_type = index_type
+        self.index.build()
+            
+    def add_known_face(self, person_id, name, encoding, encoding_id=None, quality=None):
+        """Add one enrolled encoding to the gallery without reloading from the database"""
+        encoding = np.asarray(encoding, dtype=np.float32)
+        if encoding.shape != (self.gallery.dim,):
+            self.logger.error(f"Invalid encoding shape: {encoding.shape}")
+            return False
+        if quality is not None and encoding_id is not None:
+            self.qualities[int(encoding_id)] = quality
+        row = self.gallery.add(encoding, person_id, name, encoding_id)
+        if self._wanted_index_type() != self.active_index_type:
+            # The gallery grew past the size threshold of the configured index
+            self.build_index()
+        else:
+            self.index.add(row)
+        self.scopes.rows_added(row)
+        return True
+
+    def remove_known_face(self, encoding_id):
+        """Remove a deactivated encoding from the gallery"""
+        rows = self.gallery.rows_for_encoding(encoding_id)
+        removed = self.gallery.remove_rows(rows)
+        self.index.remove(rows)
+        self._maybe_compact()
+        return removed > 0
+
+    def remove_person(self, person_id):
+        """Remove every encoding of a deleted or deactivated person from the gallery"""
+        rows = self.gallery.rows_for_person(person_id)
+        removed = self.gallery.remove_rows(rows)
+        self.index.remove(rows)
+        self._maybe_compact()
+        return removed > 0
+
+    def rename_person(self, person_id, name):
+        """Show a renamed person under the new name without reloading"""
+        self.gallery.rename_person(person_id, name)
+
+    def compact_gallery(self):
+        """Drop tombstoned rows from the gallery and the search index"""
+        mapping = self.gallery.compact()
+        if self._wanted_index_type() != self.active_index_type:
+            self.build_index()
+        else:
+            self.index.remap(mapping)
+        self.scopes.remap(mapping)
+
+    def _maybe_compact(self):
+        if self.gallery.tombstone_ratio >= RecognitionConfig.COMPACTION_TOMBSTONE_RATIO:
+            self.compact_gallery()
+            
+    def hog_locations(self, frame, upsample=1):
+        """Run the HOG face detector on a BGR frame or crop"""
         rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
         # Use HOG-based model for CPU
-        face_locations = face_recognition.face_locations(rgb_frame, model='hog')
+        return face_recognition.face_locations(rgb_frame, number_of_times_to_upsample=upsample, model='hog')
+
+    def detect_faces(self, frame, upsample=1):
+        """
+        Locate faces in a BGR frame with the HOG detector
+        Returns: List of (top, right, bottom, left) boxes
+        """
+        face_locations = self.hog_locations(frame, upsample)
+        self.last_face_locations = face_locations
         if face_locations:
             self.last_face_location = face_locations[0]  # Store for later use
-            face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
-            if face_encodings:
-                return face_encodings[0]  # 128-dimensional encoding
+        return face_locations
+
+    def encode_locations(self, frame, face_locations):
+        """Encode the faces at known locations of a BGR frame in one face_encodings call"""
+        if not face_locations:
+            return []
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        return face_recognition.face_encodings(rgb_frame, list(face_locations))
+
+    def encode_faces(self, frame):
+        """
+        Detect and encode every face in a frame with a single face_encodings call
+        Returns: List of ((top, right, bottom, left), encoding) tuples
+        """
+        face_locations = self.detect_faces(frame)
+        face_encodings = self.encode_locations(frame, face_locations)
+        return list(zip(face_locations, face_encodings))
+
+    def encode_face(self, frame):
+        """Convert frame to face encoding using face_recognition library"""
+        faces = self.encode_faces(frame)
+        if faces:
+            return faces[0][1]  # 128-dimensional encoding
         return None
             
+    def match_batch(self, requests, top_k=1, threshold=None, scope=None):
+        """
+        Match the encoding lists of several requests in one gallery search
+        Returns: List per request of match_faces results
+        """
+        flat = [encoding for encodings in requests for encoding in encodings]
+        matches = self.match_faces(flat, top_k=top_k, threshold=threshold, scope=scope)
+        results = []
+        start = 0
+        for encodings in requests:
+            results.append(matches[start:start + len(encodings)])
+            start += len(encodings)
+        return results
+
+    def create_match_batcher(self, top_k=1, threshold=None, max_batch_size=None, max_wait=None, scope=None):
+        """
+        Micro-batcher that lets concurrent callers (e.g. the match stages of
+        one pipeline per camera) share gallery searches. Submit a list of
+        encodings, the result is its match_faces list.
+        """
+        max_batch_size = max_batch_size or BatchingConfig.MAX_BATCH_SIZE
+        max_wait = BatchingConfig.MAX_WAIT if max_wait is None else max_wait
+        return MicroBatcher(
+            lambda requests: self.match_batch(requests, top_k=top_k, threshold=threshold, scope=scope),
+            max_batch_size, max_wait, name='match-batcher'
+        )
+
     def compare_faces(self, encoding):
         """Compare face encoding with known faces and return (name, confidence, person_id)"""
-        if not self.known_face_encodings or encoding is None:
+        if encoding is None:
             return None
+        matches = self.match_faces([encoding], top_k=1)[0]
+        return matches[0] if matches else None
 
-        if len(self.known_face_encodings) > 0:
-            # Convert list to numpy array
-            known_encodings = np.array(self.known_face_encodings)
-            # Calculate distances
-            distances = face_recognition.face_distance(known_encodings, encoding)
-            
-            if len(distances) > 0:
-                min_distance = np.min(distances)
-                best_match_index = np.argmin(distances)
-                confidence = 1 - min_distance
-                
-                if confidence >= 0.6:
-                    return (
-                        self.known_face_names[best_match_index],
-                        confidence,
-                        self.known_face_ids[best_match_index]
-                    )
-        
-        return None
+    def match_faces(self, encodings, top_k=1, threshold=None, scope=None):
+        """
+        Match several encodings against the gallery in one batched search.
+        With a scope (a group name or list of names, defaulting to
+        self.scope) only the encodings of members of those groups are scanned.
+        Returns: List per encoding of up to top_k (name, confidence, person_id)
+                 tuples above the match threshold, best first, one per person
+        """
+        if threshold is None:
+            threshold = RecognitionConfig.MATCH_THRESHOLD
+        if len(encodings) == 0:
+            return []
+        if self.gallery.live_count == 0:
+            return [[] for _ in encodings]
+
+        results = []
+        # Over-fetch so that several encodings of one person don't crowd out others
+        k = top_k * 4 if top_k > 1 else 1
+        scope = scope if scope is not None else self.scope
+        if scope:
+            candidates = search_rows(self.gallery, self.scopes.rows(scope), encodings, k)
+        else:
+            candidates = self.index.search_batch(encodings, k)
+        for rows, distances in candidates:
+            matches = []
+            seen = set()
+            for row, distance in zip(rows, distances):
+                confidence = 1 - float(distance)
+                person_id = int(self.known_face_ids[row])
+                if confidence < threshold:
+                    break
+                if person_id in seen:
+                    continue
+                seen.add(person_id)
+                matches.append((self.known_face_names[row], confidence, person_id))
+                if len(matches) == top_k:
+                    break
+            results.append(matches)
+        return results
         
-    def log_detection(self, person_id, confidence, frame_quality, detection_environment, location_data):
-        """Log a face detection event"""
+    def log_detection(self, person_id, confidence, frame_quality, detection_environment, location_data, box=None):
+        """
+        Queue a face detection event for the write-behind log writer.
+        The person id comes straight from the gallery match, no lookup is needed.
+        `box` is the (top, right, bottom, left) face box whose corner is stored
+        as location_x/location_y; the relative location is kept with the environment.
+        """
         try:
-            # Get the most recent face encoding for this person
-            face_encoding = self.db_session.query(FaceEncoding)\
-                .filter_by(person_id=person_id)\
-                .filter_by(is_active=True)\
-                .order_by(desc(FaceEncoding.created_at))\
-                .first()
-                
-            if face_encoding:
-                detection_log = DetectionLog(
-                    face_encoding_id=face_encoding.id,
-                    confidence=confidence,
-                    frame_quality=frame_quality,
-                    detection_environment=detection_environment,
-                    location_data=location_data
-                )
-                self.db_session.add(detection_log)
-                self.db_session.commit()
-                return True
+            environment = json.loads(detection_environment) if isinstance(detection_environment, str) \
+                else dict(detection_environment or {})
+            environment['location'] = json.loads(location_data) if isinstance(location_data, str) else location_data
+            return self.log_writer.log(
+                person_id,
+                confidence,
+                frame_quality,
+                environment_data=json.dumps(environment),
+                box=box
+            )
         except Exception as e:
             self.logger.error(f"Failed to log detection: {str(e)}")
-            self.db_session.rollback()
         return False
 
-# In your main application or a separate script
-def re_encode_known_faces():
-    db_session = Session()
-    face_encoder = FaceEncoder(db_session)
-    # Clear existing known faces
-    db_session.query(FaceEncoding).delete()
-    db_session.commit()
-
-    # Re-add known faces
-    images_and_names = [("person1.jpg", "Person 1"), ("person2.jpg", "Person 2")]
-    for image_path, name in images_and_names:
-        image = cv2.imread(image_path)
-        encoding = face_encoder.encode_face(image)
-        if encoding is not None:
-            person = Person(name=name)
-            db_session.add(person)
-            db_session.commit()
-            face_encoding = FaceEncoding(person_id=person.id, encoding_data=encoding.tobytes())
-            db_session.add(face_encoding)
-            db_session.commit()
-            print(f"Added {name} with encoding size {encoding.shape}")
-        else:
-            print(f"Face not detected in {image_path}")
\ No newline at end of file
+    @property
+    def log_writer(self):
+        """DetectionLogWriter used by log_detection, started on first use"""
+        if self._log_writer is None:
+            self._log_writer = DetectionLogWriter(
+                max_queue=DetectionLogConfig.MAX_QUEUE,
+                batch_size=DetectionLogConfig.BATCH_SIZE,
+                flush_interval=DetectionLogConfig.FLUSH_INTERVAL,
+                overflow=DetectionLogConfig.OVERFLOW
+            )
+        return self._log_writer
+
+    def close(self):
+        """Flush queued detection logs and stop the writer"""
+        if self._log_writer is not None:
+            self._log_writer.close()
+            self._log_writer = None
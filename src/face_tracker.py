@@ -0,0 +1,260 @@
+# src/face_tracker.py
+import itertools
+import logging
+import cv2
+import numpy as np
+
+
+def box_iou(a, b):
+    """Intersection over union of two (top, right, bottom, left) boxes"""
+    top = max(a[0], b[0])
+    right = min(a[1], b[1])
+    bottom = min(a[2], b[2])
+    left = max(a[3], b[3])
+    intersection = max(0, right - left) * max(0, bottom - top)
+    if intersection == 0:
+        return 0.0
+    area_a = (a[1] - a[3]) * (a[2] - a[0])
+    area_b = (b[1] - b[3]) * (b[2] - b[0])
+    return intersection / float(area_a + area_b - intersection)
+
+
+def box_centroid(box):
+    top, right, bottom, left = box
+    return (left + right) / 2.0, (top + bottom) / 2.0
+
+
+def _create_cv_tracker():
+    """Create the best available OpenCV single-object tracker, or None"""
+    for name in ('TrackerKCF_create', 'TrackerCSRT_create', 'TrackerMIL_create'):
+        factory = getattr(cv2, name, None) or getattr(getattr(cv2, 'legacy', None), name, None)
+        if factory is not None:
+            return factory()
+    return None
+
+
+class Track:
+    """
+    A face followed across frames.
+
+    Attributes:
+        track_id: Stable id for the lifetime of the track
+        box: Latest (top, right, bottom, left) box
+        identity: (name, confidence, person_id) carried forward, or None if unknown
+        evidence: Accumulated match evidence when identity voting is enabled
+        misses: Consecutive detection rounds without a matching detection
+        lost: True when the OpenCV tracker failed to follow the face
+    """
+
+    def __init__(self, track_id, box, frame_index):
+        self.track_id = track_id
+        self.box = tuple(int(v) for v in box)
+        self.identity = None
+        self.evidence = None
+        self.first_frame = frame_index
+        self.last_seen_frame = frame_index
+        self.last_encoded_frame = None
+        self.misses = 0
+        self.lost = False
+        self.cv_tracker = None
+
+    @property
+    def person_id(self):
+        return self.identity[2] if self.identity else None
+
+    def identity_score(self, frame_index, decay):
+        """Match confidence decayed by the number of frames since the last encoding"""
+        if self.identity is None or self.last_encoded_frame is None:
+            return 0.0
+        return self.identity[1] * decay ** (frame_index - self.last_encoded_frame)
+
+
+class FaceTracker:
+    """
+    Associates face detections across frames so detection and encoding
+    only need to run on keyframes.
+
+    Detections are matched to tracks greedily by IoU, falling back to
+    centroid distance for fast-moving faces. Between keyframes, boxes are
+    carried forward (or followed by an OpenCV tracker when enabled).
+    A track is (re)encoded only when it is new, still unidentified on a
+    keyframe, or its identity score has decayed below `reencode_below`.
+
+    With an IdentityVoter, matches from several frames are fused per track
+    instead: the track is encoded until its evidence is conclusive, then
+    only for an occasional verification every `reverify_every` frames or
+    after it drifts (is continued by the weaker centroid association).
+
+    Attributes:
+        detect_every: Run full detection every N frames
+        encode_every: Minimum frames between two encodings of one track
+        tracks: Active tracks keyed by track id
+    """
+
+    def __init__(self, detect_every=5, iou_threshold=0.3, max_centroid_shift=0.5,
+                 max_misses=2, confidence_decay=0.98, reencode_below=0.45,
+                 use_cv_trackers=False, match_threshold=0.6, voter=None, reverify_every=150,
+                 encode_every=1):
+        self.logger = logging.getLogger(__name__)
+        self.detect_every = max(1, detect_every)
+        self.iou_threshold = iou_threshold
+        self.max_centroid_shift = max_centroid_shift
+        self.max_misses = max_misses
+        self.confidence_decay = confidence_decay
+        self.reencode_below = reencode_below
+        self.use_cv_trackers = use_cv_trackers
+        self.match_threshold = match_threshold
+        self.voter = voter
+        self.reverify_every = reverify_every
+        self.encode_every = encode_every
+        self.tracks = {}
+        self.frame_index = 0
+        self._last_detection_frame = None
+        self._ids = itertools.count(1)
+
+    def needs_detection(self):
+        """True if the current frame should run full face detection"""
+        if self._last_detection_frame is None or not self.tracks:
+            return True
+        if any(track.lost for track in self.tracks.values()):
+            return True
+        return self.frame_index - self._last_detection_frame >= self.detect_every
+
+    def _associate(self, boxes):
+        """Greedy one-to-one matching of detections to tracks"""
+        tracks = list(self.tracks.values())
+        pairs = []
+        for t, track in enumerate(tracks):
+            for d, box in enumerate(boxes):
+                iou = box_iou(track.box, box)
+                if iou >= self.iou_threshold:
+                    pairs.append((iou, t, d))
+                else:
+                    # Centroid fallback, normalised by the track's face size
+                    tx, ty = box_centroid(track.box)
+                    dx, dy = box_centroid(box)
+                    size = max(track.box[1] - track.box[3], track.box[2] - track.box[0], 1)
+                    shift = np.hypot(tx - dx, ty - dy) / size
+                    if shift <= self.max_centroid_shift:
+                        # Rank below every IoU match
+                        pairs.append((-shift, t, d))
+
+        matches = {}
+        used_tracks = set()
+        for score, t, d in sorted(pairs, reverse=True):
+            if t in used_tracks or d in matches:
+                continue
+            used_tracks.add(t)
+            matches[d] = (tracks[t], score < 0)
+        return matches
+
+    def update(self, boxes, frame=None):
+        """
+        Feed the detections of a keyframe
+        Returns: List of tracks matched or created for this frame
+        """
+        self._last_detection_frame = self.frame_index
+        matches = self._associate(boxes)
+        current = []
+        for d, box in enumerate(boxes):
+            track, drifted = matches.get(d, (None, False))
+            if track is None:
+                track = Track(next(self._ids), box, self.frame_index)
+                if self.voter is not None:
+                    track.evidence = self.voter.new_evidence()
+                self.tracks[track.track_id] = track
+            else:
+                if drifted and track.evidence is not None:
+                    # Weak association, the label may belong to someone else
+                    track.evidence.reset()
+                track.box = tuple(int(v) for v in box)
+                track.last_seen_frame = self.frame_index
+                track.misses = 0
+                track.lost = False
+            if self.use_cv_trackers and frame is not None:
+                self._start_cv_tracker(track, frame)
+            current.append(track)
+
+        matched_ids = {track.track_id for track in current}
+        for track_id in list(self.tracks):
+            if track_id in matched_ids:
+                continue
+            track = self.tracks[track_id]
+            track.misses += 1
+            if track.misses > self.max_misses:
+                del self.tracks[track_id]
+        return current
+
+    def predict(self, frame=None):
+        """
+        Carry tracks forward on a frame without detection
+        Returns: List of tracks matched on the last keyframe
+        """
+        if self.use_cv_trackers and frame is not None:
+            for track in self.tracks.values():
+                if track.cv_tracker is None:
+                    continue
+                ok, (x, y, w, h) = track.cv_tracker.update(frame)
+                if ok:
+                    track.box = (int(y), int(x + w), int(y + h), int(x))
+                    track.last_seen_frame = self.frame_index
+                else:
+                    track.lost = True
+        return [track for track in self.tracks.values() if track.misses == 0]
+
+    def _start_cv_tracker(self, track, frame):
+        track.cv_tracker = _create_cv_tracker()
+        if track.cv_tracker is None:
+            self.logger.warning("No OpenCV tracker available, falling back to IoU tracking only")
+            self.use_cv_trackers = False
+            return
+        top, right, bottom, left = track.box
+        track.cv_tracker.init(frame, (left, top, right - left, bottom - top))
+
+    def needs_encoding(self, track):
+        """True if the track's identity should be (re)computed on this frame"""
+        if track.last_seen_frame != self.frame_index:
+            # Only encode from a box that was confirmed on this frame
+            return False
+        if track.last_encoded_frame is None:
+            return True
+        if self.frame_index - track.last_encoded_frame < self.encode_every:
+            return False
+        if track.evidence is not None:
+            if not track.evidence.decided:
+                return True
+            return self.frame_index - track.last_encoded_frame >= self.reverify_every
+        if track.identity is None:
+            return self.frame_index - track.last_encoded_frame >= self.detect_every
+        return track.identity_score(self.frame_index, self.confidence_decay) < self.reencode_below
+
+    def set_identity(self, track, identity):
+        """Record the result of encoding and matching a track on this frame"""
+        track.identity = identity
+        track.last_encoded_frame = self.frame_index
+
+    def observe(self, track, candidates):
+        """
+        Record the candidates, (name, confidence, person_id) best first,
+        from encoding and matching a track on this frame
+        Returns: True if the track got a new conclusive identity worth logging
+        """
+        if track.evidence is None:
+            identity = candidates[0] if candidates and candidates[0][1] >= self.match_threshold else None
+            self.set_identity(track, identity)
+            return identity is not None
+
+        track.last_encoded_frame = self.frame_index
+        decided = self.voter.observe(track.evidence, candidates)
+        track.identity = track.evidence.identity
+        return decided and track.identity is not None
+
+    def rescale(self, factor):
+        """Scale every track box after the frame size changed, and detect on the next frame"""
+        for track in self.tracks.values():
+            track.box = tuple(int(round(v * factor)) for v in track.box)
+            track.cv_tracker = None
+        self._last_detection_frame = None
+
+    def next_frame(self):
+        self.frame_index += 1
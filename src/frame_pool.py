@@ -0,0 +1,129 @@
+# src/frame_pool.py
+import logging
+import threading
+from collections import namedtuple
+from multiprocessing import shared_memory
+import numpy as np
+
+# What travels between stages instead of the pixels: a few ints and a name
+FrameHandle = namedtuple('FrameHandle', ['pool_name', 'slot', 'generation', 'sequence', 'captured_at'])
+
+_attached_pools = {}
+
+
+class FramePoolError(Exception):
+    """Raised for stale handles or a pool that cannot be created or attached"""
+    pass
+
+
+class SharedFramePool:
+    """
+    Fixed-size pool of frame slots in one shared-memory block.
+
+    The owning process acquires a free slot, writes a frame into it (e.g.
+    `VideoCapture.read` straight into the slot view) and passes the small
+    FrameHandle on. Any process can turn a handle into a NumPy view of the
+    slot without copying by attaching to the pool by name.
+
+    Reference counts live in the owning process: `acquire` hands out a slot
+    with one reference, `retain` adds one for every extra holder, and the
+    slot is recycled when `release` drops the count to zero. Each slot's
+    generation is bumped on reuse and kept in a small shared header, so a
+    view requested through a handle to a recycled slot raises instead of
+    silently reading someone else's frame.
+
+    Attributes:
+        name: Shared-memory block name used to attach from other processes
+        slots: Number of frame slots
+        shape: Shape of every frame
+        dtype: NumPy dtype of every frame
+    """
+
+    def __init__(self, slots, shape, dtype=np.uint8, name=None, create=True):
+        self.logger = logging.getLogger(__name__)
+        self.slots = slots
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.frame_nbytes = int(np.prod(self.shape)) * self.dtype.itemsize
+        self._header_nbytes = slots * np.dtype(np.int64).itemsize
+        self.owner = create
+        try:
+            self._shm = shared_memory.SharedMemory(
+                name=name, create=create,
+                size=self._header_nbytes + slots * self.frame_nbytes if create else 0
+            )
+        except (OSError, ValueError) as e:
+            raise FramePoolError(f"Cannot {'create' if create else 'attach'} frame pool: {str(e)}")
+        self.name = self._shm.name
+        self._generations = np.ndarray((slots,), dtype=np.int64, buffer=self._shm.buf)
+        self._frames = np.ndarray((slots,) + self.shape, dtype=self.dtype,
+                                  buffer=self._shm.buf, offset=self._header_nbytes)
+        if create:
+            self._generations[:] = 0
+            self._refcounts = [0] * slots
+            self._free = list(range(slots))
+            self._condition = threading.Condition()
+
+    @classmethod
+    def attach(cls, name, slots, shape, dtype=np.uint8):
+        """Attach to a pool created by another process, cached per process"""
+        pool = _attached_pools.get(name)
+        if pool is None:
+            pool = _attached_pools[name] = cls(slots, shape, dtype, name=name, create=False)
+        return pool
+
+    def spec(self):
+        """Arguments for `SharedFramePool.attach` in another process"""
+        return self.name, self.slots, self.shape, self.dtype.str
+
+    @property
+    def free_slots(self):
+        return len(self._free)
+
+    def acquire(self, sequence=0, captured_at=0.0, timeout=None):
+        """
+        Take a free slot with one reference
+        Returns: FrameHandle, or None if no slot was freed within `timeout`
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._free, timeout):
+                return None
+            slot = self._free.pop()
+            self._refcounts[slot] = 1
+            self._generations[slot] += 1
+            return FrameHandle(self.name, slot, int(self._generations[slot]), sequence, captured_at)
+
+    def retain(self, handle):
+        with self._condition:
+            self._check(handle)
+            self._refcounts[handle.slot] += 1
+
+    def release(self, handle):
+        """Drop one reference; the slot is recycled when none are left"""
+        with self._condition:
+            self._check(handle)
+            self._refcounts[handle.slot] -= 1
+            if self._refcounts[handle.slot] == 0:
+                self._free.append(handle.slot)
+                self._condition.notify()
+
+    def _check(self, handle):
+        if handle.pool_name != self.name or self._generations[handle.slot] != handle.generation:
+            raise FramePoolError(f"Stale handle for slot {handle.slot}")
+
+    def view(self, handle):
+        """Writable NumPy view of a handle's slot, no copy is made"""
+        self._check(handle)
+        return self._frames[handle.slot]
+
+    def close(self):
+        """Detach this process; the owner also removes the shared-memory block"""
+        self._generations = None
+        self._frames = None
+        _attached_pools.pop(self.name, None)
+        self._shm.close()
+        if self.owner:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,282 @@
+# src/gallery.py
+import numpy as np
+
+
+class FaceGallery:
+    """
+    In-memory store of known face encodings used for matching.
+
+    Encodings are kept in one preallocated, C-contiguous float32 matrix with
+    their squared norms cached alongside, so matching a probe is a single
+    matrix-vector product rather than rebuilding an array every frame.
+    Person ids, names and encoding ids are parallel NumPy arrays indexed by
+    the same row number.
+
+    Rows can be appended and removed in place. Removed rows are tombstoned
+    (masked out of every distance computation) until `compact` packs the
+    live rows together again.
+
+    The leading rows may instead be attached from an existing read-only
+    matrix, such as a memory-mapped gallery snapshot. Those rows are never
+    copied; rows added afterwards go into the private growable buffer.
+
+    Attributes:
+        dim: Length of each encoding vector
+        size: Number of rows currently held, including tombstones
+        base_size: Number of leading rows backed by the attached matrix
+        tombstones: Number of removed rows awaiting compaction
+    """
+
+    def __init__(self, dim=128, capacity=1024):
+        self.dim = dim
+        self.size = 0
+        self.base_size = 0
+        self.tombstones = 0
+        self._base = None
+        self._allocate(max(int(capacity), 1))
+
+    def __len__(self):
+        return self.size
+
+    def _allocate(self, capacity):
+        # Encodings of rows past the attached base, metadata for every row
+        self._encodings = np.zeros((capacity - self.base_size, self.dim), dtype=np.float32)
+        self._sq_norms = np.zeros(capacity, dtype=np.float32)
+        self._person_ids = np.zeros(capacity, dtype=np.int64)
+        self._encoding_ids = np.full(capacity, -1, dtype=np.int64)
+        self._names = np.empty(capacity, dtype=object)
+        self._alive = np.zeros(capacity, dtype=bool)
+
+    def _metadata(self):
+        return (self._sq_norms, self._person_ids, self._encoding_ids,
+                self._names, self._alive)
+
+    @property
+    def capacity(self):
+        return self._alive.shape[0]
+
+    @property
+    def encodings(self):
+        """
+        All encodings as one matrix. A view while the rows live in one
+        buffer; a copy once rows were added to an attached base, so search
+        code reads rows through `take` and `distances` instead.
+        """
+        tail = self._encodings[:self.size - self.base_size]
+        if self._base is None:
+            return tail
+        if self.size == self.base_size:
+            return self._base
+        return np.concatenate((self._base, tail))
+
+    @property
+    def sq_norms(self):
+        return self._sq_norms[:self.size]
+
+    @property
+    def person_ids(self):
+        return self._person_ids[:self.size]
+
+    @property
+    def encoding_ids(self):
+        return self._encoding_ids[:self.size]
+
+    @property
+    def names(self):
+        return self._names[:self.size]
+
+    @property
+    def alive(self):
+        return self._alive[:self.size]
+
+    @property
+    def live_count(self):
+        return self.size - self.tombstones
+
+    @property
+    def tombstone_ratio(self):
+        return self.tombstones / self.size if self.size else 0.0
+
+    def take(self, rows):
+        """Encodings of the given rows, gathered from the base and private buffer"""
+        rows = np.asarray(rows, dtype=np.int64)
+        if self._base is None:
+            return self._encodings[rows]
+        out = np.empty((len(rows), self.dim), dtype=np.float32)
+        in_base = rows < self.base_size
+        out[in_base] = self._base[rows[in_base]]
+        out[~in_base] = self._encodings[rows[~in_base] - self.base_size]
+        return out
+
+    def reserve(self, capacity):
+        """Grow the backing arrays so at least `capacity` rows fit"""
+        if capacity <= self.capacity:
+            return
+        new_capacity = self.capacity
+        while new_capacity < capacity:
+            new_capacity *= 2
+
+        old_encodings = self._encodings
+        old_metadata = self._metadata()
+        self._allocate(new_capacity)
+        tail_size = self.size - self.base_size
+        self._encodings[:tail_size] = old_encodings[:tail_size]
+        for new, current in zip(self._metadata(), old_metadata):
+            new[:self.size] = current[:self.size]
+
+    def _materialize(self):
+        """Copy attached base rows into the private buffer"""
+        if self._base is None:
+            return
+        encodings = self.encodings
+        self._base = None
+        self.base_size = 0
+        self._encodings = np.zeros((self.capacity, self.dim), dtype=np.float32)
+        self._encodings[:self.size] = encodings
+
+    def clear(self):
+        self.size = 0
+        self.tombstones = 0
+        if self._base is not None:
+            self._base = None
+            self.base_size = 0
+            self._allocate(self.capacity)
+
+    def load(self, encodings, person_ids, names, encoding_ids=None):
+        """Replace the gallery contents with the given rows"""
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, self.dim)
+        count = encodings.shape[0]
+        if len(person_ids) != count or len(names) != count:
+            raise ValueError("Encodings, person ids and names must have the same length")
+
+        self.clear()
+        self.reserve(count)
+        self._encodings[:count] = encodings
+        self._sq_norms[:count] = np.einsum('ij,ij->i', encodings, encodings)
+        self._person_ids[:count] = person_ids
+        self._names[:count] = names
+        self._encoding_ids[:count] = -1 if encoding_ids is None else encoding_ids
+        self._alive[:count] = True
+        self.size = count
+
+    def attach(self, encodings, person_ids, names, encoding_ids=None, sq_norms=None):
+        """
+        Replace the gallery contents with rows backed by an existing matrix.
+        The matrix is referenced, not copied, so a read-only memmap stays
+        shared with every other process mapping the same file.
+        """
+        if encodings.dtype != np.float32 or encodings.ndim != 2 or encodings.shape[1] != self.dim:
+            raise ValueError(f"Expected a float32 matrix with {self.dim} columns")
+        count = encodings.shape[0]
+        if len(person_ids) != count or len(names) != count:
+            raise ValueError("Encodings, person ids and names must have the same length")
+
+        self.clear()
+        self._base = encodings
+        self.base_size = count
+        self._allocate(count + max(self.capacity - count, 1024))
+        if sq_norms is None:
+            sq_norms = np.einsum('ij,ij->i', encodings, encodings)
+        self._sq_norms[:count] = sq_norms
+        self._person_ids[:count] = person_ids
+        self._names[:count] = names
+        self._encoding_ids[:count] = -1 if encoding_ids is None else encoding_ids
+        self._alive[:count] = True
+        self.size = count
+
+    def add(self, encoding, person_id, name, encoding_id=-1):
+        """
+        Append one encoding to the gallery
+        Returns: Row number of the new encoding
+        """
+        encoding = np.asarray(encoding, dtype=np.float32).reshape(self.dim)
+        if self.size == self.capacity:
+            self.reserve(self.size + 1)
+        row = self.size
+        self._encodings[row - self.base_size] = encoding
+        self._sq_norms[row] = encoding @ encoding
+        self._person_ids[row] = person_id
+        self._names[row] = name
+        self._encoding_ids[row] = -1 if encoding_id is None else encoding_id
+        self._alive[row] = True
+        self.size += 1
+        return row
+
+    def remove_rows(self, rows):
+        """
+        Tombstone the given rows
+        Returns: Number of rows that were live before the call
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        rows = rows[self._alive[rows]]
+        self._alive[rows] = False
+        self.tombstones += len(rows)
+        return len(rows)
+
+    def rename_person(self, person_id, name):
+        self._names[:self.size][self.person_ids == person_id] = name
+
+    def rows_for_person(self, person_id):
+        return np.flatnonzero((self.person_ids == person_id) & self.alive)
+
+    def rows_for_encoding(self, encoding_id):
+        return np.flatnonzero((self.encoding_ids == encoding_id) & self.alive)
+
+    def compact(self):
+        """
+        Drop tombstoned rows and pack live rows to the front. An attached
+        base matrix is copied into the private buffer first.
+        Returns: Array mapping each old row to its new row, or -1 if it was removed
+        """
+        self._materialize()
+        keep = np.flatnonzero(self.alive)
+        mapping = np.full(self.size, -1, dtype=np.int64)
+        mapping[keep] = np.arange(len(keep))
+        for array in (self._encodings,) + self._metadata():
+            array[:len(keep)] = array[keep]
+        self.size = len(keep)
+        self.tombstones = 0
+        return mapping
+
+    def distances(self, encoding):
+        """Euclidean distance from one encoding to every row in the gallery"""
+        query = np.asarray(encoding, dtype=np.float32).reshape(self.dim)
+        # |a - b|^2 = |a|^2 + |b|^2 - 2ab, with the gallery side precomputed
+        sq = np.empty(self.size, dtype=np.float32)
+        if self._base is not None:
+            np.matmul(self._base, query, out=sq[:self.base_size])
+        np.matmul(self._encodings[:self.size - self.base_size], query, out=sq[self.base_size:])
+        sq *= -2.0
+        sq += self.sq_norms
+        sq += query @ query
+        np.maximum(sq, 0.0, out=sq)
+        if self.tombstones:
+            sq[~self.alive] = np.inf
+        return np.sqrt(sq, out=sq)
+
+    def distances_batch(self, encodings):
+        """Euclidean distances from several encodings at once, shape (queries, rows)"""
+        queries = np.asarray(encodings, dtype=np.float32).reshape(-1, self.dim)
+        tail = self._encodings[:self.size - self.base_size]
+        if self._base is None:
+            sq = queries @ tail.T
+        else:
+            sq = np.hstack((queries @ self._base.T, queries @ tail.T))
+        sq *= -2.0
+        sq += self.sq_norms
+        sq += np.einsum('ij,ij->i', queries, queries)[:, None]
+        np.maximum(sq, 0.0, out=sq)
+        if self.tombstones:
+            sq[:, ~self.alive] = np.inf
+        return np.sqrt(sq, out=sq)
+
+    def best_match(self, encoding):
+        """
+        Find the closest gallery row to an encoding
+        Returns: (row, distance) or None if the gallery is empty
+        """
+        if self.live_count == 0:
+            return None
+        distances = self.distances(encoding)
+        row = int(np.argmin(distances))
+        return row, float(distances[row])
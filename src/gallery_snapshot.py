@@ -0,0 +1,143 @@
+# src/gallery_snapshot.py
+import os
+import json
+import glob
+import datetime
+import numpy as np
+
+SNAPSHOT_FORMAT_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+
+
+class SnapshotError(Exception):
+    """Raised when a gallery snapshot is missing, incomplete or of an unknown format"""
+    pass
+
+
+class GallerySnapshot:
+    """
+    Gallery rows read back from disk.
+
+    The encoding matrix and squared norms are read-only memory maps when
+    loaded with `mmap=True`, so every process mapping the same snapshot
+    shares a single page-cached copy.
+
+    Attributes:
+        manifest: Dict with format version, row count, dim and high-water mark
+        encodings: (count, dim) float32 matrix
+        sq_norms: Squared norm of every encoding
+        person_ids: Person id of every row
+        encoding_ids: FaceEncoding id of every row
+        names: Person name of every row
+    """
+
+    def __init__(self, manifest, encodings, sq_norms, person_ids, encoding_ids, names):
+        self.manifest = manifest
+        self.encodings = encodings
+        self.sq_norms = sq_norms
+        self.person_ids = person_ids
+        self.encoding_ids = encoding_ids
+        self.names = names
+
+    @property
+    def high_water_mark(self):
+        return self.manifest['high_water_mark']
+
+    @property
+    def created_at(self):
+        return datetime.datetime.fromisoformat(self.manifest['created_at'])
+
+    def __len__(self):
+        return self.manifest['count']
+
+
+def _array_path(directory, generation, name):
+    return os.path.join(directory, f"{name}.{generation}.npy")
+
+
+def write_snapshot(directory, encodings, person_ids, encoding_ids, names, high_water_mark):
+    """
+    Write gallery rows as a new snapshot generation.
+
+    Arrays are written under generation-numbered file names and the manifest
+    is swapped in last with an atomic rename, so readers never see a
+    half-written snapshot. Files of older generations are removed afterwards.
+    Returns: The manifest dict that was written
+    """
+    os.makedirs(directory, exist_ok=True)
+    encodings = np.ascontiguousarray(encodings, dtype=np.float32)
+    if encodings.ndim != 2:
+        raise SnapshotError("Encodings must be a 2-D matrix")
+
+    try:
+        generation = read_manifest(directory)['generation'] + 1
+    except SnapshotError:
+        generation = 1
+
+    arrays = {
+        'encodings': encodings,
+        'sq_norms': np.einsum('ij,ij->i', encodings, encodings),
+        'person_ids': np.asarray(person_ids, dtype=np.int64),
+        'encoding_ids': np.asarray(encoding_ids, dtype=np.int64),
+        'names': np.asarray([str(name) for name in names], dtype=str),
+    }
+    for name, array in arrays.items():
+        if array.shape[0] != encodings.shape[0]:
+            raise SnapshotError(f"Array '{name}' does not match the number of encodings")
+        np.save(_array_path(directory, generation, name), array)
+
+    manifest = {
+        'format_version': SNAPSHOT_FORMAT_VERSION,
+        'generation': generation,
+        'count': int(encodings.shape[0]),
+        'dim': int(encodings.shape[1]),
+        'dtype': 'float32',
+        'high_water_mark': int(high_water_mark),
+        'created_at': datetime.datetime.utcnow().isoformat()
+    }
+    manifest_path = os.path.join(directory, MANIFEST_NAME)
+    with open(manifest_path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+    for path in glob.glob(os.path.join(directory, '*.npy')):
+        if not path.endswith(f".{generation}.npy"):
+            try:
+                os.remove(path)
+            except OSError:
+                # Another process may still have the old generation mapped
+                pass
+    return manifest
+
+
+def read_manifest(directory):
+    manifest_path = os.path.join(directory, MANIFEST_NAME)
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        raise SnapshotError(f"Cannot read snapshot manifest: {str(e)}")
+
+    if manifest.get('format_version') != SNAPSHOT_FORMAT_VERSION:
+        raise SnapshotError(f"Unsupported snapshot format: {manifest.get('format_version')}")
+    return manifest
+
+
+def read_snapshot(directory, mmap=True):
+    """Load the current snapshot generation, memory-mapping the large arrays read-only"""
+    manifest = read_manifest(directory)
+    generation = manifest['generation']
+    mmap_mode = 'r' if mmap else None
+
+    try:
+        encodings = np.load(_array_path(directory, generation, 'encodings'), mmap_mode=mmap_mode)
+        sq_norms = np.load(_array_path(directory, generation, 'sq_norms'), mmap_mode=mmap_mode)
+        person_ids = np.load(_array_path(directory, generation, 'person_ids'))
+        encoding_ids = np.load(_array_path(directory, generation, 'encoding_ids'))
+        names = np.load(_array_path(directory, generation, 'names'))
+    except (OSError, ValueError) as e:
+        raise SnapshotError(f"Snapshot generation {generation} is incomplete: {str(e)}")
+
+    if encodings.shape != (manifest['count'], manifest['dim']) or encodings.dtype != np.float32:
+        raise SnapshotError("Snapshot encodings do not match the manifest")
+    return GallerySnapshot(manifest, encodings, sq_norms, person_ids, encoding_ids, names.astype(object))
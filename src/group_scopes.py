@@ -0,0 +1,86 @@
+# src/group_scopes.py
+import numpy as np
+
+
+class GroupScopes:
+    """
+    Group membership of gallery persons, for searches limited to some groups.
+
+    Membership mirrors the person_groups table. For every group the gallery
+    rows of its members are precomputed on first use and kept up to date as
+    rows are added or the gallery is compacted, so a scoped search starts
+    from the member rows instead of scanning the whole gallery. Membership
+    changes only invalidate the rows of the groups involved. Tombstoned
+    rows are filtered out when a scope is resolved.
+
+    Attributes:
+        gallery: FaceGallery whose rows are grouped
+        members: Person ids of every group, keyed by group name
+    """
+
+    def __init__(self, gallery):
+        self.gallery = gallery
+        self.members = {}
+        self._groups_by_person = {}
+        self._rows = {}
+
+    def load(self, memberships):
+        """Replace all membership with (group_name, person_id) pairs"""
+        self.members = {}
+        self._groups_by_person = {}
+        self._rows = {}
+        for group, person_id in memberships:
+            self.members.setdefault(group, set()).add(int(person_id))
+            self._groups_by_person.setdefault(int(person_id), set()).add(group)
+
+    def set_person_groups(self, person_id, groups):
+        """Replace the groups of one person, e.g. after update_person"""
+        person_id = int(person_id)
+        old = self._groups_by_person.get(person_id, set())
+        new = set(groups)
+        for group in old - new:
+            self.members[group].discard(person_id)
+            self._rows.pop(group, None)
+        for group in new - old:
+            self.members.setdefault(group, set()).add(person_id)
+            self._rows.pop(group, None)
+        self._groups_by_person[person_id] = new
+
+    def groups_of(self, person_id):
+        return set(self._groups_by_person.get(int(person_id), ()))
+
+    def rows_added(self, rows):
+        """Append new gallery rows to the cached rows of their persons' groups"""
+        rows = np.atleast_1d(np.asarray(rows, dtype=np.int64))
+        for row in rows:
+            for group in self._groups_by_person.get(int(self.gallery.person_ids[row]), ()):
+                if group in self._rows:
+                    self._rows[group] = np.append(self._rows[group], row)
+
+    def remap(self, mapping):
+        """Rewrite cached rows after the gallery has been compacted"""
+        for group, rows in self._rows.items():
+            rows = mapping[rows]
+            self._rows[group] = rows[rows >= 0]
+
+    def _group_rows(self, group):
+        rows = self._rows.get(group)
+        if rows is None:
+            members = np.fromiter(self.members.get(group, ()), dtype=np.int64)
+            rows = np.flatnonzero(np.isin(self.gallery.person_ids, members))
+            self._rows[group] = rows
+        return rows
+
+    def rows(self, scope):
+        """
+        Live gallery rows of the members of one group name or a list of names
+        Returns: Sorted array of row numbers
+        """
+        groups = [scope] if isinstance(scope, str) else list(scope)
+        if len(groups) == 1:
+            rows = self._group_rows(groups[0])
+        else:
+            rows = np.unique(np.concatenate([self._group_rows(group) for group in groups] or [[]])).astype(np.int64)
+        if self.gallery.tombstones:
+            rows = rows[self.gallery.alive[rows]]
+        return rows
@@ -0,0 +1,105 @@
+# src/identity_voting.py
+
+
+class IdentityEvidence:
+    """
+    Match evidence accumulated for one track.
+
+    Attributes:
+        scores: person_id -> [smoothed confidence, votes, name]
+        observations: Number of encodings fused so far
+        decided: True once the evidence is conclusive
+        identity: (name, confidence, person_id) of the current leader, or None
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.scores = {}
+        self.observations = 0
+        self.decided = False
+        self.identity = None
+
+    def ranking(self):
+        """Candidates ordered by smoothed confidence, best first"""
+        return sorted(
+            ((score, votes, name, person_id) for person_id, (score, votes, name) in self.scores.items()),
+            reverse=True
+        )
+
+
+class IdentityVoter:
+    """
+    Fuses per-frame matches of a track into one identity decision.
+
+    Each observation updates an exponential moving average of match
+    confidence per candidate person; candidates missing from an observation
+    decay towards `missing_confidence`. A track is labelled once its leader
+    has enough votes, clears `accept_confidence` and leads the runner-up by
+    `margin`, or immediately when a single match reaches `early_accept`.
+    After `max_observations` without a winner the track is concluded
+    unknown. Decided tracks are only re-checked by an occasional
+    verification observation, which restarts voting if it disagrees.
+    """
+
+    def __init__(self, accept_confidence=0.6, alpha=0.5, min_votes=3, margin=0.05,
+                 early_accept=0.75, max_observations=10, missing_confidence=0.4):
+        self.accept_confidence = accept_confidence
+        self.alpha = alpha
+        self.min_votes = min_votes
+        self.margin = margin
+        self.early_accept = early_accept
+        self.max_observations = max_observations
+        self.missing_confidence = missing_confidence
+
+    def new_evidence(self):
+        return IdentityEvidence()
+
+    def observe(self, evidence, candidates):
+        """
+        Fuse one frame's candidates, a list of (name, confidence, person_id)
+        Returns: True if this observation made the evidence conclusive
+        """
+        if evidence.decided:
+            leader = candidates[0][2] if candidates else None
+            identity = evidence.identity[2] if evidence.identity else None
+            if leader == identity:
+                return False
+            # The track no longer looks like its label, start voting again
+            evidence.reset()
+
+        evidence.observations += 1
+        observed = set()
+        for name, confidence, person_id in candidates:
+            observed.add(person_id)
+            if person_id in evidence.scores:
+                entry = evidence.scores[person_id]
+                entry[0] = self.alpha * confidence + (1 - self.alpha) * entry[0]
+                entry[1] += 1
+            else:
+                evidence.scores[person_id] = [confidence, 1, name]
+        for person_id, entry in evidence.scores.items():
+            if person_id not in observed:
+                entry[0] = self.alpha * self.missing_confidence + (1 - self.alpha) * entry[0]
+
+        return self._decide(evidence)
+
+    def _decide(self, evidence):
+        ranking = evidence.ranking()
+        if ranking:
+            score, votes, name, person_id = ranking[0]
+            runner_up = ranking[1][0] if len(ranking) > 1 else self.missing_confidence
+            evidence.identity = (name, score, person_id) if score >= self.accept_confidence else None
+
+            early = evidence.observations == 1 and score >= self.early_accept
+            settled = votes >= self.min_votes and score >= self.accept_confidence
+            if (early or settled) and score - runner_up >= self.margin:
+                evidence.decided = True
+                return True
+
+        if evidence.observations >= self.max_observations:
+            evidence.identity = None
+            evidence.decided = True
+            return True
+        return False
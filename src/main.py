@@ -2,8 +2,19 @@
 import cv2
 import time
 import numpy as np
-from face_encoder import FaceEncoder
-from database import DatabaseManager, Session
+from src.face_encoder import FaceEncoder
+from src.multi_camera import MultiCameraManager
+from src.face_tracker import FaceTracker
+from src.face_detector import FaceDetector
+from src.detection_cascade import DetectionCascade, MotionGate
+from src.identity_voting import IdentityVoter
+from src.adaptive_scheduler import AdaptiveScheduler
+from src.sighting_aggregator import SightingAggregator
+from src.pipeline import RecognitionPipeline
+from src.frame_pool import SharedFramePool
+from src.worker_pool import create_worker_pool
+from src.config import AdaptiveConfig, BatchingConfig, CameraConfig, DetectionCascadeConfig, PipelineConfig, RecognitionConfig, SightingConfig, TrackingConfig
+from src.database import DatabaseManager, Session, init_db
 import logging
 import json
 
@@ -18,9 +29,10 @@ def calculate_frame_quality(frame):
     return (brightness / 255.0 * 0.5) + (min(blur / 1000.0, 0.5))
 
 def get_face_location(frame, face):
-    """Get face location in relative coordinates"""
+    """Get face location in relative coordinates from a (top, right, bottom, left) box"""
     height, width = frame.shape[:2]
-    x, y, w, h = face
+    top, right, bottom, left = face
+    x, y, w, h = left, top, right - left, bottom - top
     return {
         'x': float(x) / width,
         'y': float(y) / height,
@@ -28,19 +40,235 @@ def get_face_location(frame, face):
         'height': float(h) / height
     }
 
+def draw_face_label(frame, face, label, color, detail=None):
+    """Draw a face box with its label above and an optional detail line below"""
+    top, right, bottom, left = face
+    cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
+    cv2.putText(frame, label, (left, max(top - 8, 12)),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
+    if detail:
+        cv2.putText(frame, detail, (left, bottom + 16),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.45, color, 1)
+
+def run_pipeline(face_encoder, cameras, sightings):
+    """
+    Recognition through one staged pipeline per camera. The pipelines share
+    one worker process pool and, with batching enabled, one match
+    micro-batcher, so concurrent frames of different cameras are matched in
+    a single gallery search. The main thread is the log/render stage,
+    serving the cameras round-robin; enrollment is only available in the
+    tracked loop.
+    """
+    executor = create_worker_pool(PipelineConfig.WORKERS)
+    matcher = None
+    if BatchingConfig.ENABLED:
+        matcher = face_encoder.create_match_batcher(
+            max_batch_size=BatchingConfig.MAX_BATCH_SIZE,
+            max_wait=BatchingConfig.MAX_WAIT
+        )
+    running = []
+    try:
+        for stream in cameras.streams:
+            camera = stream.camera
+            pipeline = RecognitionPipeline(
+                face_encoder,
+                workers=PipelineConfig.WORKERS,
+                queue_size=PipelineConfig.QUEUE_SIZE,
+                max_in_flight=PipelineConfig.MAX_IN_FLIGHT,
+                drop_frames=PipelineConfig.DROP_FRAMES,
+                upsample=PipelineConfig.UPSAMPLE,
+                executor=executor,
+                matcher=matcher
+            )
+            frame_pool = None
+            if PipelineConfig.SHARED_FRAMES:
+                # Size slots from a real frame, the camera may not honour the configured resolution
+                ret, frame = camera.cap.read()
+                if not ret:
+                    print(f"Failed to grab a frame from camera {stream.camera_id}")
+                    continue
+                slots = PipelineConfig.FRAME_POOL_SLOTS or pipeline.frames_held + CameraConfig.CAPTURE_BUFFER_SIZE + 1
+                frame_pool = SharedFramePool(slots, frame.shape, frame.dtype)
+                pipeline.frame_pool = frame_pool
+            camera.start_capture(frame_pool=frame_pool)
+            pipeline.start(
+                camera.read_handle if frame_pool is not None else camera.read_frame,
+                source_closed=lambda camera=camera: camera.frame_buffer.closed
+            )
+            running.append((stream, pipeline, frame_pool))
+        if not running:
+            return
+        print("Controls:")
+        print("'q' - Quit")
+
+        while not all(pipeline.finished for _, pipeline, _ in running):
+            served = False
+            for stream, pipeline, _ in running:
+                result = pipeline.get_result(timeout=0)
+                if result is None:
+                    continue
+                served = True
+                stream.record_frame()
+                frame = result['frame']
+                frame_quality = calculate_frame_quality(frame)
+
+                for face, _, candidates in result['faces']:
+                    if not candidates or candidates[0][1] < RecognitionConfig.MATCH_THRESHOLD:
+                        draw_face_label(frame, face, "Unknown", (0, 0, 255))
+                        continue
+                    name, confidence, person_id = candidates[0]
+                    face_location = get_face_location(frame, face)
+                    detection_env = {
+                        'lighting': frame_quality,
+                        'face_size': face_location['width'] * face_location['height'],
+                        'faces_in_frame': len(result['faces']),
+                        'frame_sequence': result['sequence'],
+                        'location': face_location
+                    }
+                    sightings.observe(stream.camera_id, person_id, confidence, frame_quality,
+                                      box=face, environment=detection_env)
+                    draw_face_label(frame, face, f"{name}: {confidence:.2f}", (0, 255, 0))
+
+                depths = pipeline.queue_depths()
+                cv2.putText(frame, f"FPS: {int(stream.fps)} Queues: {depths['frames']}/{depths['in_flight']}/{depths['results']}",
+                           (10, frame.shape[0] - 10), cv2.FONT_HERSHEY_SIMPLEX,
+                           0.7, (0, 255, 0), 2)
+                cv2.imshow(f"Face Recognition - {stream.camera_id}", frame)
+                pipeline.release(result)
+
+            sightings.close_expired()
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+            if not served:
+                time.sleep(0.002)
+    finally:
+        for stream, pipeline, frame_pool in running:
+            pipeline.stop()
+            # A capture thread stuck in a read still writes into the pool
+            if stream.camera.stop_capture() and frame_pool is not None:
+                frame_pool.close()
+            print(f"Pipeline stats for camera {stream.camera_id}: {json.dumps(pipeline.stats())}")
+        executor.shutdown()
+        if matcher is not None:
+            matcher.close()
+            print(f"Match batcher stats: {json.dumps(matcher.stats())}")
+
+def build_cascade(detect):
+    """Detection cascade for one stream around the expensive `detect(crop)`, None when disabled"""
+    if not DetectionCascadeConfig.ENABLED:
+        return None
+    motion_gate = None
+    if DetectionCascadeConfig.MOTION_GATE:
+        motion_gate = MotionGate(
+            pixel_delta=DetectionCascadeConfig.MOTION_PIXEL_DELTA,
+            changed_fraction=DetectionCascadeConfig.MOTION_CHANGED_FRACTION
+        )
+    return DetectionCascade(
+        detect,
+        gate=FaceDetector(),
+        motion_gate=motion_gate,
+        region_padding=DetectionCascadeConfig.REGION_PADDING,
+        full_scan_every=DetectionCascadeConfig.FULL_SCAN_EVERY,
+        roi_padding=DetectionCascadeConfig.ROI_PADDING if DetectionCascadeConfig.ROI_SEARCH else None
+    )
+
+def build_tracker(voter):
+    """Face tracker for one stream"""
+    return FaceTracker(
+        detect_every=TrackingConfig.DETECT_EVERY_N_FRAMES,
+        iou_threshold=TrackingConfig.IOU_THRESHOLD,
+        max_centroid_shift=TrackingConfig.MAX_CENTROID_SHIFT,
+        max_misses=TrackingConfig.MAX_MISSES,
+        confidence_decay=TrackingConfig.CONFIDENCE_DECAY,
+        reencode_below=TrackingConfig.REENCODE_BELOW,
+        use_cv_trackers=TrackingConfig.USE_CV_TRACKERS,
+        match_threshold=RecognitionConfig.MATCH_THRESHOLD,
+        voter=voter,
+        reverify_every=TrackingConfig.VOTE_REVERIFY_FRAMES
+    )
+
+def apply_schedule(stream):
+    """Push a stream's adaptive settings into its tracker and cascade"""
+    settings = stream.state['scheduler'].settings
+    if settings['scale'] != stream.state['scale']:
+        # Track boxes live in the downscaled frame, move them to the new size
+        stream.state['tracker'].rescale(settings['scale'] / stream.state['scale'])
+        if stream.state['cascade'] is not None:
+            stream.state['cascade'].reset()
+        stream.state['scale'] = settings['scale']
+    stream.state['tracker'].detect_every = settings['detect_every']
+    stream.state['tracker'].encode_every = settings['encode_every']
+    stream.state['upsample'] = settings['upsample']
+
 def main():
-    # Initialize
+    # Initialize, creating tables added since the database was made (sightings, person_statistics)
+    init_db()
     db_session = Session()
-    db_manager = DatabaseManager(db_session)
     face_encoder = FaceEncoder(db_session)
-    cap = cv2.VideoCapture(0)
+    # Removals and renames made through the manager patch the live gallery
+    db_manager = DatabaseManager(db_session, recognizer=face_encoder)
+    # The writer keeps the statistics cache behind the overlay current
+    face_encoder.log_writer.statistics = db_manager.statistics
+    sightings = SightingAggregator(
+        face_encoder.log_writer,
+        gap=SightingConfig.GAP_SECONDS,
+        raw_detections=SightingConfig.RAW_DETECTIONS
+    )
+    if PipelineConfig.ENABLED:
+        cameras = MultiCameraManager(CameraConfig.CAMERA_IDS)
+        try:
+            run_pipeline(face_encoder, cameras, sightings)
+        finally:
+            cameras.release()
+            # Write out open sightings and detection logs still queued in memory
+            sightings.close_all()
+            face_encoder.close()
+        return
+
+    voter = None
+    if TrackingConfig.VOTING_ENABLED:
+        voter = IdentityVoter(
+            accept_confidence=RecognitionConfig.MATCH_THRESHOLD,
+            alpha=TrackingConfig.VOTE_EMA_ALPHA,
+            min_votes=TrackingConfig.VOTE_MIN_VOTES,
+            margin=TrackingConfig.VOTE_MARGIN,
+            early_accept=TrackingConfig.VOTE_EARLY_ACCEPT,
+            max_observations=TrackingConfig.VOTE_MAX_OBSERVATIONS,
+            missing_confidence=TrackingConfig.VOTE_CANDIDATE_THRESHOLD
+        )
+    # Every camera captures on its own thread; this loop serves them round-robin
+    # against the one gallery and database session. Trackers and cascades
+    # hold per-stream state.
+    cameras = MultiCameraManager(CameraConfig.CAMERA_IDS)
+    # Streams are processed one after another, so each frame gets 1/N of a camera's budget
+    target_fps = (AdaptiveConfig.TARGET_FPS or CameraConfig.TARGET_FPS) * len(cameras.streams)
+    for stream in cameras.streams:
+        stream.state['cascade'] = build_cascade(
+            lambda crop, stream=stream: face_encoder.hog_locations(crop, stream.state['upsample'])
+        )
+        stream.state['tracker'] = build_tracker(voter)
+        stream.state['unrecognized_count'] = 0
+        stream.state['scale'] = 0.5
+        stream.state['upsample'] = 1
+        stream.state['scheduler'] = None
+        if AdaptiveConfig.ENABLED:
+            stream.state['scheduler'] = AdaptiveScheduler(
+                target_fps=target_fps,
+                recover_ratio=AdaptiveConfig.RECOVER_RATIO,
+                cooldown=AdaptiveConfig.COOLDOWN_FRAMES
+            )
+            apply_schedule(stream)
+    cameras.start()
     
     # State variables
     adding_new_face = False
+    enroll_stream = None  # Stream the new face is taken from
+    encoding = None
+    enroll_frame = None
+    enroll_quality = 0.0
     temp_name = ""
     temp_group = ""
     input_mode = "name"  # Can be "name" or "group"
-    unrecognized_count = 0
     
     print("Controls:")
     print("'q' - Quit")
@@ -51,28 +279,56 @@ def main():
     print("'Tab' - Switch between name and group input")
     print("'backspace' - Delete last character")
     
-    # FPS calculation
-    prev_frame_time = 0
-    new_frame_time = 0
-
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
+    while True:
+        stream, frame = cameras.next_frame(timeout=CameraConfig.CAPTURE_READ_TIMEOUT)
+        if stream is None:
+            if not cameras.active_streams:
+                break
             continue
+        frame_start = time.time()
+        face_tracker = stream.state['tracker']
+        cascade = stream.state['cascade']
+        scheduler = stream.state['scheduler']
+        enrolling = adding_new_face and stream is enroll_stream
 
-        small_frame = resize_frame(frame, scale=0.5)
+        small_frame = resize_frame(frame, scale=stream.state['scale'])
         frame_quality = calculate_frame_quality(small_frame)
+        fps = stream.fps
 
-        # Calculate FPS
-        new_frame_time = time.time()
-        fps = 1/(new_frame_time-prev_frame_time) if prev_frame_time > 0 else 0
-        prev_frame_time = new_frame_time
+        # Full detection only on keyframes, tracks carry faces in between
+        stage_start = time.time()
+        if face_tracker.needs_detection():
+            if cascade is not None:
+                # Tracked boxes seed the search windows around known faces
+                face_locations = cascade.detect(
+                    small_frame,
+                    previous=[track.box for track in face_tracker.tracks.values()]
+                )
+            else:
+                face_locations = face_encoder.detect_faces(small_frame, stream.state['upsample'])
+            tracks = face_tracker.update(face_locations, small_frame)
+        else:
+            tracks = face_tracker.predict(small_frame)
+        if scheduler is not None:
+            scheduler.record('detect', time.time() - stage_start)
 
-        # Get face encoding
-        encoding = face_encoder.encode_face(small_frame)
+        # Encode only tracks that are new or whose identity has gone stale,
+        # except while enrolling, which needs a fresh encoding every frame
+        if enrolling:
+            to_encode = tracks[:1]
+        else:
+            to_encode = [track for track in tracks if face_tracker.needs_encoding(track)]
+        stage_start = time.time()
+        encodings = face_encoder.encode_locations(small_frame, [track.box for track in to_encode])
+        if scheduler is not None:
+            scheduler.record('encode', time.time() - stage_start)
+        if enrolling:
+            encoding = encodings[0] if encodings else None
+            enroll_frame = small_frame
+            enroll_quality = frame_quality
         
-        if encoding is not None:
-            if adding_new_face:
+        if tracks:
+            if enrolling:
                 # Display instructions and current input
                 cv2.putText(frame, f"Mode: {'Name' if input_mode == 'name' else 'Group'}", 
                            (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 
@@ -88,56 +344,69 @@ def main():
                            (10, 120), cv2.FONT_HERSHEY_SIMPLEX, 
                            0.7, (0, 255, 0), 2)
             else:
-                # Recognition mode
-                person_data = face_encoder.compare_faces(encoding)
+                # Recognition mode, freshly encoded tracks matched in one batch
+                matches = face_encoder.match_faces(
+                    encodings,
+                    top_k=TrackingConfig.VOTE_CANDIDATES,
+                    threshold=TrackingConfig.VOTE_CANDIDATE_THRESHOLD if voter else None
+                )
                 
-                if person_data:
-                    name, confidence, person_id = person_data
-                    unrecognized_count = 0
+                for track, candidates in zip(to_encode, matches):
+                    face_tracker.observe(track, candidates)
+                
+                for track in tracks:
+                    if track.identity is None:
+                        draw_face_label(small_frame, track.box, f"#{track.track_id} Unknown", (0, 0, 255))
+                        continue
                     
-                    # Get person statistics
-                    stats = db_manager.get_person_statistics(person_id)
+                    name, confidence, person_id = track.identity
                     
-                    # Display recognition results
-                    cv2.putText(small_frame, f"{name}: {confidence:.2f}", 
-                              (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 
-                              1, (0, 255, 0), 2)
-                    if stats:
-                        cv2.putText(small_frame, f"Seen {stats['total_detections']} times", 
-                                  (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 
-                                  0.7, (0, 255, 0), 2)
-                        
-                    # Log detection
-                    face_location = get_face_location(small_frame, face_encoder.last_face_location)
+                    # Every frame feeds the person's open sighting, rows are written when it closes
+                    face_location = get_face_location(small_frame, track.box)
                     detection_env = {
                         'lighting': frame_quality,
-                        'face_size': face_location['width'] * frame_quality['height']
+                        'face_size': face_location['width'] * face_location['height'],
+                        'faces_in_frame': len(tracks),
+                        'location': face_location
                     }
+                    sightings.observe(stream.camera_id, person_id, confidence, frame_quality,
+                                      track_id=track.track_id, box=track.box, environment=detection_env)
+                    
+                    # Get person statistics, served from memory
+                    stats = db_manager.get_person_statistics(person_id)
                     
-                    face_encoder.log_detection(
-                        person_id,
-                        confidence,
-                        frame_quality,
-                        json.dumps(detection_env),
-                        json.dumps(face_location)
+                    # Display recognition results carried by the track
+                    draw_face_label(
+                        small_frame, track.box, f"#{track.track_id} {name}: {confidence:.2f}", (0, 255, 0),
+                        f"Seen {stats['total_sightings']} times"
                     )
-                else:
-                    unrecognized_count += 1
+                
+                if any(track.identity is None for track in tracks):
+                    stream.state['unrecognized_count'] += 1
                     cv2.putText(small_frame, "Unknown Face Detected", 
                               (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 
                               1, (0, 0, 255), 2)
                     
-                    if unrecognized_count >= 30:
+                    if stream.state['unrecognized_count'] >= 30:
                         cv2.putText(small_frame, "Press 'a' to add or 'n' to skip", 
                                   (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 
                                   1, (0, 0, 255), 2)
+                else:
+                    stream.state['unrecognized_count'] = 0
 
         # Draw FPS and frame quality
         cv2.putText(small_frame, f"FPS: {int(fps)} Quality: {frame_quality:.2f}", 
                    (10, small_frame.shape[0] - 10), cv2.FONT_HERSHEY_SIMPLEX, 
                    0.7, (0, 255, 0), 2)
 
-        cv2.imshow('Face Recognition', small_frame)
+        window_name = 'Face Recognition'
+        if len(cameras.streams) > 1:
+            window_name += f" - camera {stream.camera_id}"
+        cv2.imshow(window_name, small_frame)
+        face_tracker.next_frame()
+        sightings.close_expired()
+        if scheduler is not None and scheduler.frame_done(time.time() - frame_start):
+            apply_schedule(stream)
         
         # Key handling
         key = cv2.waitKey(1) & 0xFF
@@ -146,6 +415,8 @@ def main():
             break
         elif key == ord('a') and not adding_new_face:
             adding_new_face = True
+            enroll_stream = stream
+            encoding = None
             temp_name = ""
             temp_group = ""
             input_mode = "name"
@@ -154,7 +425,7 @@ def main():
             adding_new_face = False
             temp_name = ""
             temp_group = ""
-            unrecognized_count = 0
+            stream.state['unrecognized_count'] = 0
         elif key == 9:  # Tab key
             input_mode = "group" if input_mode == "name" else "name"
             print(f"Switched to {input_mode} input")
@@ -172,20 +443,28 @@ def main():
                                 groups=[temp_group] if temp_group else None
                             )
                             
+                            # Save reference image, the source for later re-encoding
+                            _, buffer = cv2.imencode('.jpg', enroll_frame)
+                            reference_image = db_manager.add_reference_image(
+                                person.id,
+                                buffer.tobytes(),
+                                'front',
+                                {'quality': enroll_quality}
+                            )
+                            
                             # Add face encoding
-                            db_manager.add_face_encoding(
+                            face_encoding = db_manager.add_face_encoding(
                                 person.id,
                                 encoding,
-                                quality_score=frame_quality
+                                quality_score=enroll_quality,
+                                reference_image_id=reference_image.id
                             )
-                            
-                            # Save reference image
-                            _, buffer = cv2.imencode('.jpg', small_frame)
-                            db_manager.add_reference_image(
+                            face_encoder.add_known_face(
                                 person.id,
-                                buffer.tobytes(),
-                                'front',
-                                {'quality': frame_quality}
+                                temp_name,
+                                encoding,
+                                face_encoding.id,
+                                quality=enroll_quality
                             )
                             
                             print(f"Added face for: {temp_name}" + 
@@ -211,8 +490,13 @@ def main():
                     temp_group += chr(key)
                     print(f"Current group: {temp_group}", end='\r')
 
-    cap.release()
-    cv2.destroyAllWindows()
+    for camera_id, stats in cameras.stats().items():
+        print(f"Camera {camera_id}: captured {stats['captured']} frames, processed {stats['processed']}, "
+              f"dropped {stats['dropped']}, {stats['fps']:.1f} FPS")
+    cameras.release()
+    # Write out open sightings and detection logs still queued in memory
+    sightings.close_all()
+    face_encoder.close()
 
 if __name__ == "__main__":
     main()
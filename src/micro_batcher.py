@@ -0,0 +1,141 @@
+# src/micro_batcher.py
+import time
+import queue
+import bisect
+import logging
+import threading
+from concurrent.futures import Future
+
+_STOP = object()
+
+
+class Histogram:
+    """Counts of recorded values per bucket, upper bounds inclusive"""
+
+    def __init__(self, bounds):
+        self.bounds = sorted(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, value):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.bounds, value)] += 1
+            self.count += 1
+            self.total += value
+
+    def to_dict(self):
+        with self._lock:
+            buckets = {f"<={bound}": count for bound, count in zip(self.bounds, self.counts)}
+            buckets[f">{self.bounds[-1]}"] = self.counts[-1]
+            return {
+                'count': self.count,
+                'mean': self.total / self.count if self.count else 0.0,
+                'buckets': buckets
+            }
+
+
+class MicroBatcher:
+    """
+    Collects requests from any number of threads into batches.
+
+    A background thread takes the oldest pending request and keeps adding
+    requests until the batch holds `max_batch_size` or `max_wait` seconds
+    have passed since that oldest request was submitted. The whole batch
+    then goes through `process_batch(items) -> results` in one call, and
+    each result is routed back through the Future returned by `submit`.
+    If the batch function raises, every request in the batch fails with
+    the same exception.
+
+    Attributes:
+        batch_sizes: Histogram of requests per batch
+        latencies: Histogram of seconds from submit to result per request
+    """
+
+    def __init__(self, process_batch, max_batch_size=32, max_wait=0.005, name='micro-batcher'):
+        self.logger = logging.getLogger(__name__)
+        self.process_batch = process_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait
+        self.batch_sizes = Histogram([1, 2, 4, 8, 16, 32, 64])
+        self.latencies = Histogram([0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1])
+        self._queue = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, item):
+        """Queue one request; returns a Future resolved with its result"""
+        if self._closed:
+            raise RuntimeError("Micro-batcher is closed")
+        future = Future()
+        self._queue.put((item, future, time.time()))
+        return future
+
+    def __call__(self, item, timeout=None):
+        """Submit and wait for the result"""
+        return self.submit(item).result(timeout)
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = first[2] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.time()
+            try:
+                # Past the deadline, still take whatever is already waiting
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+            batch, stopping = self._collect(first)
+            self._process(batch)
+        # Fail anything submitted after close
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                item[1].set_exception(RuntimeError("Micro-batcher is closed"))
+
+    def _process(self, batch):
+        self.batch_sizes.record(len(batch))
+        try:
+            results = self.process_batch([item for item, _, _ in batch])
+            if len(results) != len(batch):
+                raise ValueError(f"Batch of {len(batch)} requests returned {len(results)} results")
+        except Exception as e:
+            self.logger.error(f"Batch of {len(batch)} requests failed: {str(e)}")
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+        now = time.time()
+        for (_, future, submitted_at), result in zip(batch, results):
+            self.latencies.record(now - submitted_at)
+            future.set_result(result)
+
+    def stats(self):
+        return {
+            'batch_size': self.batch_sizes.to_dict(),
+            'latency': self.latencies.to_dict(),
+            'pending': self._queue.qsize()
+        }
+
+    def close(self):
+        """Process what is already queued, then stop the batching thread"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout=5.0)
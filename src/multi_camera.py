@@ -0,0 +1,111 @@
+# src/multi_camera.py
+import time
+import logging
+from src.camera import CameraManager, CameraError
+
+
+class CameraStream:
+    """
+    One camera feed and the per-stream state of the recognition loop.
+
+    Attributes:
+        camera_id: OpenCV device index or stream URL
+        camera: CameraManager capturing on its own thread
+        state: Free-form per-stream state (tracker, cascade, counters)
+        frames: Frames handed out for processing
+    """
+
+    def __init__(self, camera_id, camera):
+        self.camera_id = camera_id
+        self.camera = camera
+        self.state = {}
+        self.frames = 0
+        self.last_frame_time = None
+        self.fps = 0.0
+
+    def record_frame(self):
+        now = time.time()
+        if self.last_frame_time is not None and now > self.last_frame_time:
+            # Smoothed, a single stream is only served every N-th turn
+            instant = 1.0 / (now - self.last_frame_time)
+            self.fps = 0.9 * self.fps + 0.1 * instant if self.fps else instant
+        self.last_frame_time = now
+        self.frames += 1
+
+
+class MultiCameraManager:
+    """
+    Runs several cameras in one process against one shared recognition
+    backend.
+
+    Every camera captures on its own thread into a latest-frame buffer, so
+    slow processing never builds a backlog. `next_frame` hands frames to the
+    single processing loop round-robin: each call starts looking at the
+    stream after the one served last and returns the first with a fresh
+    frame, so a busy camera cannot starve the others and every stream gets
+    an equal share of detection work. Because all processing happens on
+    the caller's thread, the gallery and the database session are shared
+    without copies or locking.
+
+    Attributes:
+        streams: CameraStream per camera, in configuration order
+    """
+
+    def __init__(self, camera_ids, camera_factory=CameraManager, buffer_size=None):
+        self.logger = logging.getLogger(__name__)
+        self.streams = []
+        for camera_id in camera_ids:
+            try:
+                camera = camera_factory(camera_id)
+            except CameraError as e:
+                self.logger.error(f"Skipping camera {camera_id}: {str(e)}")
+                continue
+            self.streams.append(CameraStream(camera_id, camera))
+        if not self.streams:
+            raise CameraError("No camera could be opened")
+        self.buffer_size = buffer_size
+        self._cursor = 0
+
+    def start(self):
+        for stream in self.streams:
+            stream.camera.start_capture(self.buffer_size)
+        self.logger.info(f"Started capture on {len(self.streams)} cameras")
+
+    @property
+    def active_streams(self):
+        return [stream for stream in self.streams if not stream.camera.frame_buffer.closed]
+
+    def next_frame(self, timeout=1.0, poll_interval=0.002):
+        """
+        Take the next fresh frame, serving streams round-robin
+        Returns: (stream, frame), or (None, None) on timeout or once every camera stopped
+        """
+        deadline = time.time() + timeout
+        while True:
+            count = len(self.streams)
+            for offset in range(count):
+                index = (self._cursor + offset) % count
+                stream = self.streams[index]
+                item = stream.camera.frame_buffer.get_latest(timeout=0)
+                if item is None:
+                    continue
+                _, captured_at, frame = item
+                stream.camera.frame_latency = time.time() - captured_at
+                stream.record_frame()
+                self._cursor = index + 1
+                return stream, frame
+            if not self.active_streams or time.time() >= deadline:
+                return None, None
+            time.sleep(poll_interval)
+
+    def stats(self):
+        """Per-camera processed FPS, frame counts and capture counters"""
+        stats = {}
+        for stream in self.streams:
+            capture = stream.camera.capture_stats() or {}
+            stats[stream.camera_id] = dict(capture, fps=stream.fps, processed=stream.frames)
+        return stats
+
+    def release(self):
+        for stream in self.streams:
+            stream.camera.release()
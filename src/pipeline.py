@@ -0,0 +1,305 @@
+# src/pipeline.py
+import os
+import time
+import queue
+import logging
+import threading
+import cv2
+from src.worker_pool import create_worker_pool
+
+_STOP = object()
+
+
+def detect_and_encode(frame, upsample=1):
+    """
+    Worker stage: locate and encode every face in a BGR frame
+    Returns: (face_locations, face_encodings)
+    """
+    import face_recognition
+    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    face_locations = face_recognition.face_locations(rgb_frame, number_of_times_to_upsample=upsample, model='hog')
+    if not face_locations:
+        return [], []
+    return face_locations, face_recognition.face_encodings(rgb_frame, face_locations)
+
+
+def detect_and_encode_shared(handle, upsample=1, pool_spec=None):
+    """
+    Worker stage for frames in a SharedFramePool, read in place through the handle.
+    `pool_spec` is the pool class and its `spec()`, used to attach by name.
+    """
+    pool_class, spec = pool_spec
+    pool = pool_class.attach(*spec)
+    return detect_and_encode(pool.view(handle), upsample)
+
+
+class StageMetrics:
+    """Processed count and average wall time of one pipeline stage"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self.count += 1
+            self.total_time += seconds
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'count': self.count,
+                'avg_ms': 1000.0 * self.total_time / self.count if self.count else 0.0
+            }
+
+
+class RecognitionPipeline:
+    """
+    Staged recognition pipeline: capture -> detect/encode -> match -> output.
+
+    Stages run on their own threads and are connected by bounded queues.
+    Detection and encoding, the CPU-heavy part, run in a pool of worker
+    processes so they are not serialised by the GIL. Futures are kept in
+    submission order, so results leave the pipeline in frame order even
+    though workers finish out of order. Matching stays in this process,
+    next to the shared gallery.
+
+    Backpressure: at most `max_in_flight` frames are inside the pool. When
+    the capture queue is full the oldest waiting frame is dropped (newest
+    wins) or, with `drop_frames=False`, capture blocks.
+
+    The consumer (logging and rendering, usually on the main thread) takes
+    results from `get_result`. Each result is a dict with the frame, its
+    sequence number, the faces as (location, encoding, matches) and the
+    capture timestamp.
+
+    With a `frame_pool`, `read_frame` yields FrameHandles instead of arrays
+    and only the handles cross process boundaries; workers attach to the
+    pool and read the pixels in place. The result's frame is then a view of
+    the slot, and the consumer hands it back with `release` when done.
+    The pool can be assigned any time before `start`; it needs at least
+    `frames_held` slots plus those held by the frame source.
+
+    A `matcher(encodings) -> matches`, such as a MicroBatcher shared by the
+    pipelines of several cameras, replaces the direct match_faces call.
+    """
+
+    def __init__(self, face_encoder, workers=None, queue_size=8, max_in_flight=None,
+                 drop_frames=True, upsample=1, top_k=1, executor=None, worker_fn=None, frame_pool=None,
+                 matcher=None):
+        self.logger = logging.getLogger(__name__)
+        self.face_encoder = face_encoder
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self.max_in_flight = max_in_flight or self.workers * 2
+        self.drop_frames = drop_frames
+        self.upsample = upsample
+        self.top_k = top_k
+        self.frame_pool = frame_pool
+        self.worker_fn = worker_fn
+        self.matcher = matcher
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._frames = queue.Queue(maxsize=queue_size)
+        self._in_flight = queue.Queue(maxsize=self.max_in_flight)
+        self._results = queue.Queue(maxsize=queue_size)
+        self._threads = []
+        self._stop = threading.Event()
+        self.dropped_frames = 0
+        self.metrics = {name: StageMetrics() for name in ('capture', 'encode', 'match')}
+
+    def start(self, read_frame, source_closed=None):
+        """
+        Start every stage, reading frames from `read_frame() -> (ret, frame)`.
+        A failed read ends the stream unless `source_closed` is given, in which
+        case capture retries until it returns True.
+        """
+        if self.worker_fn is None:
+            self.worker_fn = detect_and_encode if self.frame_pool is None else detect_and_encode_shared
+        if self._executor is None:
+            self._executor = create_worker_pool(self.workers)
+        stages = (
+            ('capture', self._capture_stage, (read_frame, source_closed)),
+            ('dispatch', self._dispatch_stage, ()),
+            ('match', self._match_stage, ()),
+        )
+        for name, target, args in stages:
+            thread = threading.Thread(target=target, args=args, name=f"pipeline-{name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        self.logger.info(f"Started recognition pipeline with {self.workers} workers")
+
+    def _put(self, stage_queue, item):
+        """Put unless the pipeline is stopping; returns False if it stopped"""
+        while not self._stop.is_set():
+            try:
+                stage_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, stage_queue):
+        """Get the next item, or _STOP once the pipeline is stopping"""
+        while not self._stop.is_set():
+            try:
+                return stage_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _STOP
+
+    def _capture_stage(self, read_frame, source_closed):
+        sequence = 0
+        while not self._stop.is_set():
+            started = time.time()
+            ret, frame = read_frame()
+            if not ret:
+                if source_closed is None or source_closed():
+                    break
+                continue
+            self.metrics['capture'].record(time.time() - started)
+            item = (sequence, started, frame)
+            sequence += 1
+            if self.drop_frames:
+                while True:
+                    try:
+                        self._frames.put_nowait(item)
+                        break
+                    except queue.Full:
+                        try:
+                            self._release_frame(self._frames.get_nowait()[2])
+                            self.dropped_frames += 1
+                        except queue.Empty:
+                            pass
+            elif not self._put(self._frames, item):
+                self._release_frame(frame)
+                break
+        self._put(self._frames, _STOP)
+
+    def _dispatch_stage(self):
+        while True:
+            item = self._get(self._frames)
+            if item is _STOP:
+                break
+            sequence, captured_at, frame = item
+            if self.frame_pool is None:
+                future = self._executor.submit(self.worker_fn, frame, self.upsample)
+            else:
+                pool_spec = (type(self.frame_pool), self.frame_pool.spec())
+                future = self._executor.submit(self.worker_fn, frame, self.upsample, pool_spec)
+            # Blocks while max_in_flight frames are in the pool
+            if not self._put(self._in_flight, (sequence, captured_at, frame, time.time(), future)):
+                future.cancel()
+                self._release_frame(frame)
+                break
+        self._put(self._in_flight, _STOP)
+
+    def _match_stage(self):
+        while True:
+            item = self._get(self._in_flight)
+            if item is _STOP:
+                break
+            sequence, captured_at, frame, submitted_at, future = item
+            try:
+                face_locations, face_encodings = future.result()
+            except Exception as e:
+                self.logger.error(f"Failed to process frame {sequence}: {str(e)}")
+                self._release_frame(frame)
+                continue
+            self.metrics['encode'].record(time.time() - submitted_at)
+
+            started = time.time()
+            if not face_encodings:
+                matches = []
+            elif self.matcher is not None:
+                matches = self.matcher(face_encodings)
+            else:
+                matches = self.face_encoder.match_faces(face_encodings, top_k=self.top_k)
+            self.metrics['match'].record(time.time() - started)
+            result = {
+                'sequence': sequence,
+                'captured_at': captured_at,
+                'frame': frame if self.frame_pool is None else self.frame_pool.view(frame),
+                'handle': None if self.frame_pool is None else frame,
+                'faces': list(zip(face_locations, face_encodings, matches))
+            }
+            if not self._put(self._results, result):
+                self._release_frame(result['handle'])
+                break
+        self._put(self._results, _STOP)
+
+    def get_result(self, timeout=None):
+        """
+        Take the next result in frame order
+        Returns: Result dict, or None on timeout or once the pipeline has drained
+        """
+        try:
+            result = self._results.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        if result is _STOP:
+            # Leave the marker for any other consumer
+            self._results.put(_STOP)
+            self._stop.set()
+            return None
+        return result
+
+    @property
+    def frames_held(self):
+        """Most frames the stage queues, the worker pool and the consumer can hold at once"""
+        return self._frames.maxsize + self.max_in_flight + self._results.maxsize + 2
+
+    def _release_frame(self, frame):
+        if self.frame_pool is not None and frame is not None:
+            self.frame_pool.release(frame)
+
+    def release(self, result):
+        """Return a result's frame slot to the frame pool"""
+        self._release_frame(result.get('handle'))
+
+    @property
+    def finished(self):
+        return self._stop.is_set() and not any(thread.is_alive() for thread in self._threads)
+
+    def queue_depths(self):
+        return {
+            'frames': self._frames.qsize(),
+            'in_flight': self._in_flight.qsize(),
+            'results': self._results.qsize()
+        }
+
+    def stats(self):
+        """Per-stage counts and timings, queue depths and dropped frames"""
+        return {
+            'stages': {name: metrics.to_dict() for name, metrics in self.metrics.items()},
+            'queue_depths': self.queue_depths(),
+            'dropped_frames': self.dropped_frames
+        }
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout=2.0)
+        self._threads = []
+        if self._owns_executor and self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        self._drain()
+
+    def _drain(self):
+        """Release the frames still waiting in any stage queue"""
+        for stage_queue, position in ((self._frames, 2), (self._in_flight, 2)):
+            while True:
+                try:
+                    item = stage_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not _STOP:
+                    self._release_frame(item[position])
+        while True:
+            try:
+                result = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if result is not _STOP:
+                self.release(result)
@@ -0,0 +1,256 @@
+# src/re_encode_gallery.py
+"""
+Re-encode the whole gallery from the stored reference images.
+
+    python -m src.re_encode_gallery --model-version dlib_resnet_v1_j10 --num-jitters 10 [--switch]
+    python -m src.re_encode_gallery --model-version dlib_resnet_v1_j10 --switch-only
+
+ReferenceImage rows are read in keyset-paginated chunks and encoded in a
+pool of worker processes. The new FaceEncoding rows are written inactive
+under the new model version, linked to their reference image, so the
+running recognizers keep using the current version. Progress is the
+database itself: a restarted job continues after the last reference
+image that already has an encoding of the new version, and a chunk's
+rows are committed together. Once every image is encoded, `--switch`
+first encodes the reference images stored since, e.g. by enrollments
+while the job ran, then activates the new version, deactivates the others
+and makes it the version new enrollments are written under, all in one
+transaction.
+"""
+import os
+import csv
+import time
+import argparse
+import logging
+from sqlalchemy import case, func, insert, update
+from src.bulk_enroll import encode_image_data, print_progress, progress_stats
+from src.config import EnrollmentConfig
+from src.database import (Session, FaceEncoding, Person, ReferenceImage, ACTIVE_MODEL_VERSION, ENCODING_DTYPES,
+                          init_db, pack_encoding, set_setting)
+from src.worker_pool import create_worker_pool
+
+
+def encode_reference(image_id, person_id, image_data, options):
+    """
+    Worker stage: encode the face of one reference image
+    Returns: encode_image_data result with the image and person ids
+    """
+    result = encode_image_data(image_data, largest_face=True, **options)
+    result.update(image_id=image_id, person_id=person_id)
+    return result
+
+
+def resume_point(session, model_version):
+    """Id of the last reference image already encoded under `model_version`, 0 if none"""
+    last_id = session.query(func.max(FaceEncoding.reference_image_id))\
+        .filter(FaceEncoding.model_version == model_version)\
+        .scalar()
+    return last_id or 0
+
+
+def reference_chunks(session_factory, after_id, chunk_size):
+    """Yield lists of (id, person_id, image_data) in id order, one query per chunk"""
+    while True:
+        session = session_factory()
+        try:
+            rows = session.query(ReferenceImage.id, ReferenceImage.person_id, ReferenceImage.image_data)\
+                .filter(ReferenceImage.id > after_id)\
+                .order_by(ReferenceImage.id)\
+                .limit(chunk_size)\
+                .all()
+        finally:
+            session.close()
+        if not rows:
+            return
+        after_id = rows[-1].id
+        yield [tuple(row) for row in rows]
+
+
+def write_encodings(session_factory, results, model_version, dtype):
+    """Insert one chunk of new-version encodings, inactive, in one transaction"""
+    rows = []
+    for result in results:
+        encoding_data, dim = pack_encoding(result['encoding'], dtype)
+        rows.append({
+            'person_id': result['person_id'],
+            'encoding_data': encoding_data,
+            'dim': dim,
+            'dtype': dtype,
+            'model_version': model_version,
+            'is_active': False,
+            'reference_image_id': result['image_id'],
+            'quality_score': result['quality']
+        })
+    if not rows:
+        return 0
+    session = session_factory()
+    try:
+        session.execute(insert(FaceEncoding), rows)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+    return len(rows)
+
+
+def re_encode(model_version, session_factory=Session, workers=None, chunk_size=200, dtype='float32',
+              options=None, failure_report=None, executor=None, encode=encode_reference, progress=None,
+              progress_interval=5.0):
+    """
+    Encode every reference image not yet encoded under `model_version`.
+    The next chunk is already in the pool while the previous one is
+    collected and written, so workers do not wait on the database.
+    Returns: Dict with resumed_after, encoded, failed, seconds and images_per_second
+    """
+    options = options or {}
+    session = session_factory()
+    try:
+        after_id = resume_point(session, model_version)
+        total = session.query(func.count(ReferenceImage.id)).filter(ReferenceImage.id > after_id).scalar()
+    finally:
+        session.close()
+    stats = {'resumed_after': after_id, 'encoded': 0, 'failed': 0}
+    start = last_progress = time.time()
+    if not total:
+        stats.update(seconds=0.0, images_per_second=0.0)
+        return stats
+
+    owns_executor = executor is None
+    if owns_executor:
+        executor = create_worker_pool(workers or EnrollmentConfig.WORKERS or os.cpu_count())
+    report_file = open(failure_report, 'a', newline='') if failure_report else None
+    report = csv.writer(report_file) if report_file else None
+
+    def collect(futures):
+        results = [future.result() for future in futures]
+        enrolled = [result for result in results if result['status'] == 'enrolled']
+        stats['encoded'] += write_encodings(session_factory, enrolled, model_version, dtype)
+        failed = [result for result in results if result['status'] != 'enrolled']
+        stats['failed'] += len(failed)
+        if report:
+            report.writerows([result['image_id'], result['person_id'], result['reason']] for result in failed)
+            report_file.flush()
+
+    try:
+        pending = None
+        for chunk in reference_chunks(session_factory, after_id, chunk_size):
+            futures = [executor.submit(encode, image_id, person_id, image_data, options)
+                       for image_id, person_id, image_data in chunk]
+            if pending:
+                collect(pending)
+            pending = futures
+
+            now = time.time()
+            if progress and now - last_progress >= progress_interval:
+                last_progress = now
+                progress(progress_stats(stats['encoded'], stats['failed'], start, now, total))
+        if pending:
+            collect(pending)
+    finally:
+        if owns_executor:
+            executor.shutdown(cancel_futures=True)
+        if report_file:
+            report_file.close()
+
+    stats['seconds'] = time.time() - start
+    handled = stats['encoded'] + stats['failed']
+    stats['images_per_second'] = handled / stats['seconds'] if stats['seconds'] > 0 else 0.0
+    return stats
+
+
+def persons_left_without(session, model_version):
+    """Active persons with an active encoding now but none under `model_version`"""
+    has_version = session.query(FaceEncoding.person_id).filter(FaceEncoding.model_version == model_version)
+    return [person_id for person_id, in session.query(FaceEncoding.person_id)
+            .join(Person)
+            .filter(FaceEncoding.is_active == True, Person.is_active == True)
+            .filter(FaceEncoding.person_id.notin_(has_version))
+            .distinct()]
+
+
+def count_encodings(session, model_version):
+    return session.query(func.count(FaceEncoding.id))\
+        .filter(FaceEncoding.model_version == model_version)\
+        .scalar()
+
+
+def switch_model_version(model_version, session_factory=Session, force=False, **re_encode_options):
+    """
+    Activate the encodings of `model_version` and deactivate every other
+    version in a single UPDATE, so readers see either version, never a mix.
+    Reference images stored after the job's resume point, by enrollments
+    still writing the old version, are encoded first with `re_encode_options`,
+    so their faces carry over. The same transaction makes `model_version`
+    the active version that new enrollments are written under. Refuses
+    when persons would be left without an active encoding (no reference
+    image, or none that could be encoded) unless `force`.
+    Returns: Dict with activated count, images caught up and persons left
+             without an encoding
+    """
+    session = session_factory()
+    try:
+        if not count_encodings(session, model_version):
+            raise ValueError(f"No encodings of model version '{model_version}'")
+    finally:
+        session.close()
+    caught_up = re_encode(model_version, session_factory, **re_encode_options)['encoded']
+
+    session = session_factory()
+    try:
+        activated = count_encodings(session, model_version)
+        orphaned = persons_left_without(session, model_version)
+        if orphaned and not force:
+            raise ValueError(f"{len(orphaned)} persons have no '{model_version}' encoding "
+                             f"(e.g. {orphaned[:10]}); re-enroll them or switch with force")
+        session.execute(update(FaceEncoding).values(
+            is_active=case((FaceEncoding.model_version == model_version, True), else_=False)
+        ))
+        set_setting(session, ACTIVE_MODEL_VERSION, model_version)
+        session.commit()
+        return {'activated': activated, 'caught_up': caught_up, 'orphaned': len(orphaned)}
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-encode every reference image under a new model version")
+    parser.add_argument('--model-version', required=True, help="Label stored with the new encodings")
+    parser.add_argument('--workers', type=int, default=EnrollmentConfig.WORKERS)
+    parser.add_argument('--chunk-size', type=int, default=200)
+    parser.add_argument('--dtype', choices=ENCODING_DTYPES, default='float32')
+    parser.add_argument('--upsample', type=int, default=EnrollmentConfig.UPSAMPLE)
+    parser.add_argument('--num-jitters', type=int, default=1)
+    parser.add_argument('--max-side', type=int, default=EnrollmentConfig.MAX_IMAGE_SIDE)
+    parser.add_argument('--failures', help="CSV report of reference images that could not be encoded")
+    parser.add_argument('--switch', action='store_true', help="Activate the new version when done")
+    parser.add_argument('--switch-only', action='store_true', help="Only activate an already encoded version")
+    parser.add_argument('--force', action='store_true', help="Switch even if some persons lose every encoding")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+
+    re_encode_options = {
+        'workers': args.workers,
+        'chunk_size': args.chunk_size,
+        'dtype': args.dtype,
+        'options': {'upsample': args.upsample, 'num_jitters': args.num_jitters, 'max_side': args.max_side},
+        'failure_report': args.failures
+    }
+    if not args.switch_only:
+        stats = re_encode(args.model_version, progress=print_progress, **re_encode_options)
+        print(f"Encoded {stats['encoded']} reference images, {stats['failed']} failed"
+              + (f", resumed after image {stats['resumed_after']}" if stats['resumed_after'] else "")
+              + f", {stats['images_per_second']:.1f} images/s")
+    if args.switch or args.switch_only:
+        result = switch_model_version(args.model_version, force=args.force, **re_encode_options)
+        print(f"Switched to '{args.model_version}' with {result['activated']} encodings, "
+              f"{result['caught_up']} of them from images stored during the job")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,37 +1,15 @@
 # re_encode_known_faces.py
 import os
-import cv2
-from src.face_encoder import FaceEncoder
-from src.database import init_db
+from src.bulk_enroll import print_progress, run_enrollment, tasks_from_directory
 
-def re_encode_known_faces():
-    db_session = init_db()
-    face_encoder = FaceEncoder(db_session)
-    
-    # Clear existing known faces
-    db_session.query(KnownFace).delete()
-    db_session.commit()
-    
-    # Directory containing known face images
-    known_faces_dir = os.path.join(os.getcwd(), 'known_faces')
-    images_and_names = []
-    
-    # Iterate through the known_faces directory and collect image paths and names
-    for filename in os.listdir(known_faces_dir):
-        if filename.lower().endswith(('.png', '.jpg', '.jpeg')):
-            name = os.path.splitext(filename)[0]  # Filename without extension as name
-            image_path = os.path.join(known_faces_dir, filename)
-            images_and_names.append((image_path, name))
-    
-    # Re-add known faces
-    for image_path, name in images_and_names:
-        image = cv2.imread(image_path)
-        encoding = face_encoder.encode_face(image)
-        if encoding is not None:
-            face_encoder.add_face(name, encoding)
-            print(f"Added {name} with encoding size {encoding.shape}")
-        else:
-            print(f"Face not detected in {image_path}")
+def re_encode_known_faces(known_faces_dir=None):
+    # Directory containing known face images, named after the person
+    known_faces_dir = known_faces_dir or os.path.join(os.getcwd(), 'known_faces')
+    tasks = tasks_from_directory(known_faces_dir)
+    
+    # Encode across worker processes and write in bulk
+    stats = run_enrollment(tasks, progress=print_progress)
+    print(f"Added {stats['enrolled']} faces, {stats['failed']} images without a usable face")
 
 if __name__ == "__main__":
-    re_encode_known_faces()
\ No newline at end of file
+    re_encode_known_faces()
@@ -0,0 +1,616 @@
+# src/search_index.py
+import logging
+import numpy as np
+
+
+def _pairwise_sq_distances(queries, points, point_sq_norms=None):
+    """Squared euclidean distances between every query row and every point row"""
+    if point_sq_norms is None:
+        point_sq_norms = np.einsum('ij,ij->i', points, points)
+    query_sq_norms = np.einsum('ij,ij->i', queries, queries)
+    sq = queries @ points.T
+    sq *= -2.0
+    sq += point_sq_norms
+    sq += query_sq_norms[:, None]
+    np.maximum(sq, 0.0, out=sq)
+    return sq
+
+
+def _top_k(distances, k):
+    """Indices of the k smallest distances, sorted ascending"""
+    k = min(k, distances.shape[0])
+    if k < distances.shape[0]:
+        candidates = np.argpartition(distances, k - 1)[:k]
+    else:
+        candidates = np.arange(distances.shape[0])
+    return candidates[np.argsort(distances[candidates], kind='stable')]
+
+
+class BruteForceIndex:
+    """
+    Exact search over every row of a FaceGallery.
+
+    Cost grows linearly with the gallery, which is fine for small sites and
+    serves as the ground truth for approximate indexes.
+    """
+
+    def __init__(self, gallery):
+        self.gallery = gallery
+
+    def build(self):
+        """Nothing to precompute, the gallery matrix is searched directly"""
+        pass
+
+    def add(self, rows):
+        """New gallery rows are searched directly, nothing to update"""
+        pass
+
+    def remove(self, rows):
+        """Tombstoned rows are skipped by the gallery scan, nothing to update"""
+        pass
+
+    def remap(self, mapping):
+        """Row numbers are not stored, nothing to update after compaction"""
+        pass
+
+    def search(self, encoding, k=1):
+        """
+        Find the k nearest gallery rows to an encoding
+        Returns: (rows, distances) arrays sorted by distance
+        """
+        if self.gallery.live_count == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        distances = self.gallery.distances(encoding)
+        rows = _top_k(distances, min(k, self.gallery.live_count))
+        return rows, distances[rows]
+
+    def search_batch(self, encodings, k=1):
+        """
+        Find the k nearest gallery rows for several encodings with one
+        (queries x gallery) distance computation
+        Returns: List of (rows, distances) per query
+        """
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, self.gallery.dim)
+        if self.gallery.live_count == 0:
+            empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+            return [empty] * len(encodings)
+        distances = self.gallery.distances_batch(encodings)
+        k = min(k, self.gallery.live_count)
+        if k < distances.shape[1]:
+            candidates = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        else:
+            candidates = np.broadcast_to(np.arange(distances.shape[1]), distances.shape)
+        candidate_distances = np.take_along_axis(distances, candidates, axis=1)
+        order = np.argsort(candidate_distances, axis=1, kind='stable')
+        rows = np.take_along_axis(candidates, order, axis=1)
+        distances = np.take_along_axis(candidate_distances, order, axis=1)
+        return list(zip(rows, distances))
+
+
+class IVFIndex:
+    """
+    Inverted-file index with a k-means coarse quantizer.
+
+    Gallery rows are partitioned into `n_lists` cells around k-means
+    centroids. A query visits only the `n_probe` closest cells and the
+    resulting shortlist is reranked with exact distances from the gallery
+    matrix. Raising `n_probe` trades latency for recall; probing every cell
+    is equivalent to a brute-force scan.
+
+    Rows added after `build` are assigned to their nearest existing cell.
+    Tombstoned gallery rows are filtered out of the shortlist and dropped
+    from the lists when the gallery is compacted.
+
+    Attributes:
+        gallery: FaceGallery the index is built over
+        n_lists: Number of cells, derived from the gallery size when None
+        n_probe: Number of cells visited per query
+    """
+
+    def __init__(self, gallery, n_lists=None, n_probe=8, train_iterations=10,
+                 max_train_size=65536, seed=0):
+        self.logger = logging.getLogger(__name__)
+        self.gallery = gallery
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.train_iterations = train_iterations
+        self.max_train_size = max_train_size
+        self.seed = seed
+        self.centroids = None
+        self._centroid_sq_norms = None
+        # Gallery rows owned by each cell
+        self._lists = []
+
+    def _choose_n_lists(self, size):
+        if self.n_lists:
+            return max(1, min(self.n_lists, size))
+        return max(1, min(int(np.sqrt(size)), size))
+
+    def _assign(self, points, chunk_size=16384):
+        """Nearest centroid for every point, computed in chunks to bound memory"""
+        assignments = np.empty(points.shape[0], dtype=np.int64)
+        for start in range(0, points.shape[0], chunk_size):
+            chunk = points[start:start + chunk_size]
+            sq = _pairwise_sq_distances(chunk, self.centroids, self._centroid_sq_norms)
+            assignments[start:start + chunk_size] = np.argmin(sq, axis=1)
+        return assignments
+
+    def _train(self, points, n_lists):
+        rng = np.random.default_rng(self.seed)
+        if points.shape[0] > self.max_train_size:
+            points = points[rng.choice(points.shape[0], self.max_train_size, replace=False)]
+
+        self.centroids = points[rng.choice(points.shape[0], n_lists, replace=False)].copy()
+        for _ in range(self.train_iterations):
+            self._centroid_sq_norms = np.einsum('ij,ij->i', self.centroids, self.centroids)
+            assignments = self._assign(points)
+            counts = np.bincount(assignments, minlength=n_lists)
+            sums = np.zeros_like(self.centroids)
+            np.add.at(sums, assignments, points)
+            occupied = counts > 0
+            # Empty cells keep their previous centroid
+            self.centroids[occupied] = sums[occupied] / counts[occupied, None]
+        self._centroid_sq_norms = np.einsum('ij,ij->i', self.centroids, self.centroids)
+
+    def build(self):
+        """Train the coarse quantizer and fill the inverted lists from the gallery"""
+        live_rows = np.flatnonzero(self.gallery.alive)
+        size = len(live_rows)
+        if size == 0:
+            self.centroids = None
+            self._lists = []
+            return
+
+        points = self.gallery.take(live_rows)
+        n_lists = self._choose_n_lists(size)
+        self._train(points, n_lists)
+
+        assignments = self._assign(points)
+        order = np.argsort(assignments, kind='stable')
+        counts = np.bincount(assignments, minlength=n_lists)
+        self._lists = np.split(live_rows[order], np.cumsum(counts)[:-1])
+        self.logger.info(f"Built IVF index over {size} encodings with {n_lists} lists")
+
+    def add(self, rows):
+        """Insert new gallery rows into their nearest cells"""
+        rows = np.atleast_1d(np.asarray(rows, dtype=np.int64))
+        if self.centroids is None:
+            self.build()
+            return
+        assignments = self._assign(self.gallery.take(rows))
+        for cell in np.unique(assignments):
+            self._lists[cell] = np.concatenate((self._lists[cell], rows[assignments == cell]))
+
+    def remove(self, rows):
+        """Tombstoned rows are skipped by the scan and dropped from the lists on compaction"""
+        pass
+
+    def remap(self, mapping):
+        """Rewrite stored rows after the gallery has been compacted"""
+        for cell, rows in enumerate(self._lists):
+            rows = mapping[rows]
+            self._lists[cell] = rows[rows >= 0]
+
+    def _shortlist(self, encoding):
+        query = np.asarray(encoding, dtype=np.float32).reshape(1, -1)
+        cell_distances = _pairwise_sq_distances(query, self.centroids, self._centroid_sq_norms)[0]
+        cells = _top_k(cell_distances, self.n_probe)
+        candidates = np.concatenate([self._lists[cell] for cell in cells])
+        if self.gallery.tombstones:
+            candidates = candidates[self.gallery.alive[candidates]]
+        return candidates
+
+    def search(self, encoding, k=1):
+        """
+        Find approximately the k nearest gallery rows to an encoding
+        Returns: (rows, distances) arrays sorted by distance
+        """
+        if self.centroids is None or self.gallery.live_count == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        candidates = self._shortlist(encoding)
+        if len(candidates) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        # Exact rerank of the shortlist against the full-precision gallery rows
+        query = np.asarray(encoding, dtype=np.float32).reshape(1, -1)
+        distances = np.sqrt(_pairwise_sq_distances(
+            query,
+            self.gallery.take(candidates),
+            self.gallery.sq_norms[candidates]
+        )[0])
+        best = _top_k(distances, k)
+        return candidates[best], distances[best]
+
+    def search_batch(self, encodings, k=1):
+        """
+        Search several encodings; each probes its own cells
+        Returns: List of (rows, distances) per query
+        """
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, self.gallery.dim)
+        return [self.search(encoding, k) for encoding in encodings]
+
+
+def search_rows(gallery, rows, encodings, k=1):
+    """
+    Exact search limited to the given gallery rows, such as the members
+    of a group scope
+    Returns: List of (rows, distances) per query
+    """
+    queries = np.asarray(encodings, dtype=np.float32).reshape(-1, gallery.dim)
+    rows = np.asarray(rows, dtype=np.int64)
+    if len(rows) == 0:
+        empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+        return [empty] * len(queries)
+    distances = np.sqrt(_pairwise_sq_distances(queries, gallery.take(rows), gallery.sq_norms[rows]))
+    results = []
+    for query_distances in distances:
+        best = _top_k(query_distances, k)
+        results.append((rows[best], query_distances[best]))
+    return results
+
+
+QUANTIZED_PRECISIONS = ('int8', 'float16')
+
+
+class QuantizedIndex:
+    """
+    Exhaustive scan over a compact copy of the gallery with an exact rerank.
+
+    Every gallery row is kept as float16, or as int8 with a per-dimension
+    scale fitted to the largest magnitude of each dimension at build time,
+    i.e. a half or a quarter of the float32 matrix. A query scans the codes
+    chunk by chunk for its `rerank` nearest candidates, which are then
+    reranked with exact distances from the float32 gallery rows, so the
+    codes add to the gallery's memory rather than replace it. Only with the
+    gallery attached to a memory-mapped snapshot do the float32 rows stay
+    in the shared page cache, with just the rows being reranked touched.
+
+    Rows added after `build` are quantized with the existing scale, values
+    beyond it are clipped until the next build. Tombstoned rows are skipped
+    by the scan and dropped from the codes when the gallery is compacted.
+
+    Attributes:
+        gallery: FaceGallery the index is built over
+        precision: 'int8' or 'float16'
+        rerank: Candidates per query reranked with exact distances
+        scale: Per-dimension int8 step, None for float16
+    """
+
+    def __init__(self, gallery, precision='int8', rerank=32, chunk_size=16384):
+        if precision not in QUANTIZED_PRECISIONS:
+            raise ValueError(f"Unknown precision '{precision}', expected one of {QUANTIZED_PRECISIONS}")
+        self.logger = logging.getLogger(__name__)
+        self.gallery = gallery
+        self.precision = precision
+        self.rerank = rerank
+        self.chunk_size = chunk_size
+        self.scale = None
+        self.size = 0
+        self._codes = np.empty((0, gallery.dim), dtype=np.int8 if precision == 'int8' else np.float16)
+        self._code_sq_norms = np.empty(0, dtype=np.float32)
+
+    @property
+    def nbytes(self):
+        """Memory held by the codes and their norms"""
+        return self._codes[:self.size].nbytes + self._code_sq_norms[:self.size].nbytes
+
+    def _quantize(self, encodings):
+        if self.precision == 'float16':
+            return encodings.astype(np.float16)
+        return np.clip(np.rint(encodings / self.scale), -127, 127).astype(np.int8)
+
+    def _dequantize(self, codes):
+        decoded = codes.astype(np.float32)
+        if self.scale is not None:
+            decoded *= self.scale
+        return decoded
+
+    def _reserve(self, capacity):
+        if capacity <= self._codes.shape[0]:
+            return
+        new_capacity = max(capacity, 2 * self._codes.shape[0], 1024)
+        codes = np.empty((new_capacity, self.gallery.dim), dtype=self._codes.dtype)
+        sq_norms = np.empty(new_capacity, dtype=np.float32)
+        codes[:self.size] = self._codes[:self.size]
+        sq_norms[:self.size] = self._code_sq_norms[:self.size]
+        self._codes, self._code_sq_norms = codes, sq_norms
+
+    def _encode(self, rows):
+        for start in range(0, len(rows), self.chunk_size):
+            chunk = rows[start:start + self.chunk_size]
+            codes = self._quantize(self.gallery.take(chunk))
+            self._codes[chunk] = codes
+            decoded = self._dequantize(codes)
+            # Norms of the decoded vectors keep the approximate distances consistent
+            self._code_sq_norms[chunk] = np.einsum('ij,ij->i', decoded, decoded)
+
+    def build(self):
+        """Fit the int8 scale and quantize every gallery row"""
+        size = len(self.gallery)
+        if self.precision == 'int8':
+            max_abs = np.zeros(self.gallery.dim, dtype=np.float32)
+            live_rows = np.flatnonzero(self.gallery.alive)
+            for start in range(0, len(live_rows), self.chunk_size):
+                chunk = self.gallery.take(live_rows[start:start + self.chunk_size])
+                np.maximum(max_abs, np.abs(chunk).max(axis=0), out=max_abs)
+            self.scale = np.where(max_abs > 0, max_abs / 127.0, 1.0).astype(np.float32)
+        self.size = 0
+        self._reserve(size)
+        self._encode(np.arange(size))
+        self.size = size
+        self.logger.info(f"Built {self.precision} index over {size} encodings "
+                         f"({self.nbytes / 2 ** 20:.1f} MiB of codes)")
+
+    def add(self, rows):
+        """Quantize new gallery rows"""
+        if self.precision == 'int8' and self.scale is None:
+            self.build()
+            return
+        rows = np.atleast_1d(np.asarray(rows, dtype=np.int64))
+        self._reserve(len(self.gallery))
+        self._encode(rows)
+        self.size = max(self.size, int(rows.max()) + 1)
+
+    def remove(self, rows):
+        """Tombstoned rows are skipped by the scan and dropped from the codes on compaction"""
+        pass
+
+    def remap(self, mapping):
+        """Pack the codes of surviving rows after the gallery has been compacted"""
+        keep = np.flatnonzero(mapping[:self.size] >= 0)
+        self._codes[:len(keep)] = self._codes[keep]
+        self._code_sq_norms[:len(keep)] = self._code_sq_norms[keep]
+        self.size = len(keep)
+
+    def _scan(self, queries, n):
+        """
+        Approximate n nearest rows per query from the codes
+        Returns: (rows, squared distances), each (queries, n), unsorted
+        """
+        weights = queries * self.scale if self.scale is not None else queries
+        query_sq_norms = np.einsum('ij,ij->i', queries, queries)[:, None]
+        alive = self.gallery.alive
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        best_sq = np.empty((len(queries), 0), dtype=np.float32)
+        for start in range(0, self.size, self.chunk_size):
+            end = min(start + self.chunk_size, self.size)
+            # x.q is sum(code * scale * q), so the codes are only cast, never rescaled
+            sq = weights @ self._codes[start:end].astype(np.float32).T
+            sq *= -2.0
+            sq += self._code_sq_norms[start:end]
+            sq += query_sq_norms
+            if self.gallery.tombstones:
+                sq[:, ~alive[start:end]] = np.inf
+
+            rows = np.concatenate((best_rows, np.broadcast_to(np.arange(start, end), sq.shape)), axis=1)
+            sq = np.concatenate((best_sq, sq), axis=1)
+            if sq.shape[1] > n:
+                keep = np.argpartition(sq, n - 1, axis=1)[:, :n]
+                rows = np.take_along_axis(rows, keep, axis=1)
+                sq = np.take_along_axis(sq, keep, axis=1)
+            best_rows, best_sq = rows, sq
+        return best_rows, best_sq
+
+    def search(self, encoding, k=1):
+        """
+        Find approximately the k nearest gallery rows to an encoding
+        Returns: (rows, distances) arrays sorted by exact distance
+        """
+        return self.search_batch(encoding, k)[0]
+
+    def search_batch(self, encodings, k=1):
+        """
+        Scan the codes once for several encodings, then rerank each
+        query's candidates exactly
+        Returns: List of (rows, distances) per query
+        """
+        queries = np.asarray(encodings, dtype=np.float32).reshape(-1, self.gallery.dim)
+        if self.size == 0 or self.gallery.live_count == 0:
+            empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+            return [empty] * len(queries)
+
+        candidates, approximate = self._scan(queries, min(max(k, self.rerank), self.gallery.live_count))
+        results = []
+        for query, rows, sq in zip(queries, candidates, approximate):
+            rows = rows[np.isfinite(sq)]
+            distances = np.sqrt(_pairwise_sq_distances(
+                query.reshape(1, -1),
+                self.gallery.take(rows),
+                self.gallery.sq_norms[rows]
+            )[0])
+            best = _top_k(distances, k)
+            results.append((rows[best], distances[best]))
+        return results
+
+
+class PrototypeIndex:
+    """
+    Two-level search over per-person prototypes.
+
+    Every person is summarized by the mean of their encodings (the
+    centroid) and up to `n_exemplars` of their encodings: the best by
+    quality score first, then each next one the encoding farthest from
+    those already chosen among the person's better half by quality, so the
+    exemplars cover poses and lighting instead of repeating the best
+    shot. A query ranks all centroids, keeps the `n_candidates` closest
+    persons and returns the nearest exemplar of each with its exact
+    distance, so the cost grows with the number of persons rather than
+    with the number of encodings per person.
+
+    Rows added or removed after `build` refresh the prototype of their
+    person, and a person left without live rows loses their prototype;
+    compaction rebuilds the prototypes.
+
+    Attributes:
+        gallery: FaceGallery the index is built over
+        qualities: Quality score per encoding id, missing ids count as 0.
+            Kept by reference, so the owner can score rows before adding them
+        n_exemplars: Exemplar encodings kept per person
+        n_candidates: Persons refined per query after the centroid scan
+        person_ids: Person of every prototype
+        centroids: (persons, dim) mean encoding of every person
+        exemplars: (persons, n_exemplars) gallery rows, -1 where a person has fewer
+    """
+
+    def __init__(self, gallery, qualities=None, n_exemplars=3, n_candidates=8):
+        self.logger = logging.getLogger(__name__)
+        self.gallery = gallery
+        self.qualities = qualities if qualities is not None else {}
+        self.n_exemplars = n_exemplars
+        self.n_candidates = n_candidates
+        self.person_ids = np.empty(0, dtype=np.int64)
+        self.centroids = np.empty((0, gallery.dim), dtype=np.float32)
+        self.exemplars = np.empty((0, n_exemplars), dtype=np.int64)
+        self._centroid_sq_norms = np.empty(0, dtype=np.float32)
+        self._prototype_of = {}
+
+    @property
+    def nbytes(self):
+        return self.centroids.nbytes + self.exemplars.nbytes + self._centroid_sq_norms.nbytes
+
+    def _quality(self, rows):
+        quality = [self.qualities.get(int(encoding_id)) for encoding_id in self.gallery.encoding_ids[rows]]
+        return np.array([0.0 if value is None else value for value in quality], dtype=np.float32)
+
+    def _prototype(self, rows):
+        """Centroid and exemplar rows of one person's live rows"""
+        encodings = self.gallery.take(rows)
+        centroid = encodings.mean(axis=0)
+        exemplars = np.full(self.n_exemplars, -1, dtype=np.int64)
+        if len(rows) <= self.n_exemplars:
+            exemplars[:len(rows)] = rows
+            return centroid, exemplars
+
+        quality = self._quality(rows)
+        # Best quality first, the medoid-like row closest to the centroid breaks ties
+        to_centroid = np.linalg.norm(encodings - centroid, axis=1)
+        first = np.lexsort((to_centroid, -quality))[0]
+        pool = np.flatnonzero(quality >= np.median(quality))
+        chosen = [first]
+        nearest = np.linalg.norm(encodings[pool] - encodings[first], axis=1)
+        while len(chosen) < min(self.n_exemplars, len(pool) + 1):
+            # Farthest from every exemplar chosen so far
+            pick = int(np.argmax(nearest))
+            if nearest[pick] <= 0:
+                break
+            chosen.append(pool[pick])
+            nearest = np.minimum(nearest, np.linalg.norm(encodings[pool] - encodings[pool[pick]], axis=1))
+        exemplars[:len(chosen)] = rows[chosen]
+        return centroid, exemplars
+
+    def build(self):
+        """Compute the prototype of every person with live rows"""
+        live_rows = np.flatnonzero(self.gallery.alive)
+        people = self.gallery.person_ids[live_rows]
+        order = np.argsort(people, kind='stable')
+        person_ids, starts = np.unique(people[order], return_index=True)
+        groups = np.split(live_rows[order], starts[1:]) if len(live_rows) else []
+
+        self.person_ids = person_ids.astype(np.int64)
+        self.centroids = np.empty((len(person_ids), self.gallery.dim), dtype=np.float32)
+        self.exemplars = np.full((len(person_ids), self.n_exemplars), -1, dtype=np.int64)
+        for index, rows in enumerate(groups):
+            self.centroids[index], self.exemplars[index] = self._prototype(rows)
+        self._centroid_sq_norms = np.einsum('ij,ij->i', self.centroids, self.centroids)
+        self._prototype_of = {int(person_id): index for index, person_id in enumerate(self.person_ids)}
+        self.logger.info(f"Built prototypes of {len(person_ids)} persons over {len(live_rows)} encodings")
+
+    def _refresh(self, person_ids):
+        """Recompute the prototypes of some persons from their live rows, dropping persons without any"""
+        dropped = []
+        for person_id in person_ids:
+            rows = self.gallery.rows_for_person(person_id)
+            index = self._prototype_of.get(int(person_id))
+            if len(rows) == 0:
+                if index is not None:
+                    dropped.append(index)
+                continue
+            centroid, exemplars = self._prototype(rows)
+            if index is None:
+                index = len(self.person_ids)
+                self._prototype_of[int(person_id)] = index
+                self.person_ids = np.append(self.person_ids, person_id)
+                self.centroids = np.vstack((self.centroids, centroid))
+                self.exemplars = np.vstack((self.exemplars, exemplars))
+                self._centroid_sq_norms = np.append(self._centroid_sq_norms, centroid @ centroid)
+            else:
+                self.centroids[index] = centroid
+                self.exemplars[index] = exemplars
+                self._centroid_sq_norms[index] = centroid @ centroid
+        if dropped:
+            keep = np.setdiff1d(np.arange(len(self.person_ids)), dropped)
+            self.person_ids = self.person_ids[keep]
+            self.centroids = self.centroids[keep]
+            self.exemplars = self.exemplars[keep]
+            self._centroid_sq_norms = self._centroid_sq_norms[keep]
+            self._prototype_of = {int(person_id): index for index, person_id in enumerate(self.person_ids)}
+
+    def add(self, rows):
+        """Refresh the prototypes of the persons owning new gallery rows"""
+        rows = np.atleast_1d(np.asarray(rows, dtype=np.int64))
+        self._refresh(np.unique(self.gallery.person_ids[rows]))
+
+    def remove(self, rows):
+        """Refresh the prototypes of the persons owning newly tombstoned rows"""
+        rows = np.atleast_1d(np.asarray(rows, dtype=np.int64))
+        for encoding_id in self.gallery.encoding_ids[rows]:
+            self.qualities.pop(int(encoding_id), None)
+        self._refresh(np.unique(self.gallery.person_ids[rows]))
+
+    def remap(self, mapping):
+        """Rebuild the prototypes once the gallery has been compacted"""
+        self.build()
+
+    def search(self, encoding, k=1):
+        """
+        Find the nearest exemplars of up to k persons
+        Returns: (rows, distances) arrays sorted by distance
+        """
+        return self.search_batch(encoding, k)[0]
+
+    def search_batch(self, encodings, k=1):
+        """
+        Rank the centroids of all persons for several encodings at once,
+        then refine each query over its candidates' exemplars
+        Returns: List of (rows, distances) per query
+        """
+        queries = np.asarray(encodings, dtype=np.float32).reshape(-1, self.gallery.dim)
+        if len(self.person_ids) == 0 or self.gallery.live_count == 0:
+            empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+            return [empty] * len(queries)
+
+        centroid_distances = _pairwise_sq_distances(queries, self.centroids, self._centroid_sq_norms)
+        n_candidates = min(max(k, self.n_candidates), len(self.person_ids))
+        results = []
+        for query, distances in zip(queries, centroid_distances):
+            persons = _top_k(distances, n_candidates)
+            exemplars = self.exemplars[persons]
+            rows = exemplars.ravel()
+            valid = rows >= 0
+            valid[valid] = self.gallery.alive[rows[valid]]
+            rows = rows[valid]
+            owners = np.repeat(np.arange(len(persons)), self.n_exemplars)[valid]
+            row_distances = np.sqrt(_pairwise_sq_distances(
+                query.reshape(1, -1),
+                self.gallery.take(rows),
+                self.gallery.sq_norms[rows]
+            )[0])
+            # Nearest exemplar per person, then the k nearest persons
+            order = np.lexsort((row_distances, owners))
+            first = order[np.r_[True, owners[order][1:] != owners[order][:-1]]] if len(order) else order
+            best = first[_top_k(row_distances[first], k)] if len(first) else first
+            results.append((rows[best], row_distances[best]))
+        return results
+
+
+def create_index(gallery, index_type='brute_force', **options):
+    """Build the search index named by `index_type` over a gallery"""
+    if index_type == 'brute_force':
+        return BruteForceIndex(gallery)
+    if index_type == 'ivf':
+        return IVFIndex(gallery, **options)
+    if index_type == 'quantized':
+        return QuantizedIndex(gallery, **options)
+    if index_type == 'prototype':
+        return PrototypeIndex(gallery, **options)
+    raise ValueError(f"Unknown index type: {index_type}")
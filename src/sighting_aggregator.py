@@ -0,0 +1,112 @@
+# src/sighting_aggregator.py
+import json
+import time
+import datetime
+
+
+class SightingSession:
+    """An open sighting of one person (or unidentified track) on one camera"""
+
+    def __init__(self, camera_id, person_id, track_id, timestamp):
+        self.camera_id = camera_id
+        self.person_id = person_id
+        self.track_id = track_id
+        self.first_seen = timestamp
+        self.last_seen = timestamp
+        self.frame_count = 0
+        self.confidence_sum = 0.0
+        self.best_confidence = None
+        self.best_frame_quality = None
+        self.environment = None
+
+    def update(self, timestamp, confidence, frame_quality, environment):
+        self.last_seen = timestamp
+        self.frame_count += 1
+        if confidence is not None:
+            self.confidence_sum += confidence
+            if self.best_confidence is None or confidence > self.best_confidence:
+                self.best_confidence = confidence
+        if frame_quality is not None and (self.best_frame_quality is None or frame_quality > self.best_frame_quality):
+            self.best_frame_quality = frame_quality
+            # Keep the context of the best frame
+            self.environment = environment
+
+    def to_row(self):
+        return {
+            'person_id': self.person_id,
+            'camera_id': str(self.camera_id) if self.camera_id is not None else None,
+            'track_id': self.track_id,
+            'first_seen': datetime.datetime.utcfromtimestamp(self.first_seen),
+            'last_seen': datetime.datetime.utcfromtimestamp(self.last_seen),
+            'frame_count': self.frame_count,
+            'best_confidence': self.best_confidence,
+            'mean_confidence': self.confidence_sum / self.frame_count if self.frame_count else None,
+            'best_frame_quality': self.best_frame_quality,
+            'environment_data': json.dumps(self.environment) if self.environment else None
+        }
+
+
+class SightingAggregator:
+    """
+    Folds per-frame recognitions into sighting sessions.
+
+    Observations are keyed by (camera, person), or by (camera, track) while
+    a face is unidentified. A session stays open in memory while it keeps
+    being observed and is written as a single Sighting row once nothing was
+    seen for `gap` seconds, so a minute in front of a camera costs one row
+    instead of one per frame. With `raw_detections` every observation of an
+    identified person is also written as a DetectionLog row, for debugging.
+
+    Attributes:
+        sessions: Open sessions keyed by (camera_id, 'person' or 'track', id)
+        closed: Sessions written so far
+    """
+
+    def __init__(self, writer, gap=2.0, raw_detections=False):
+        self.writer = writer
+        self.gap = gap
+        self.raw_detections = raw_detections
+        self.sessions = {}
+        self.closed = 0
+
+    def observe(self, camera_id, person_id, confidence=None, frame_quality=None, track_id=None,
+                box=None, environment=None, timestamp=None):
+        """Record one frame in which the person (or unidentified track) was seen"""
+        timestamp = time.time() if timestamp is None else timestamp
+        key = (camera_id, 'person', person_id) if person_id is not None else (camera_id, 'track', track_id)
+        session = self.sessions.get(key)
+        if session is None:
+            session = self.sessions[key] = SightingSession(camera_id, person_id, track_id, timestamp)
+        session.update(timestamp, confidence, frame_quality, environment)
+
+        if self.raw_detections and person_id is not None:
+            self.writer.log(
+                person_id,
+                confidence,
+                frame_quality,
+                environment_data=json.dumps(environment) if environment else None,
+                detection_time=datetime.datetime.utcfromtimestamp(timestamp),
+                box=box
+            )
+        return session
+
+    def close_expired(self, now=None):
+        """
+        Write out sessions not observed for `gap` seconds
+        Returns: Number of sessions closed
+        """
+        now = time.time() if now is None else now
+        expired = [key for key, session in self.sessions.items() if now - session.last_seen >= self.gap]
+        for key in expired:
+            self._close(key)
+        return len(expired)
+
+    def close_all(self):
+        """Write out every open session, e.g. on shutdown"""
+        for key in list(self.sessions):
+            self._close(key)
+
+    def _close(self, key):
+        session = self.sessions.pop(key)
+        self.writer.log_sighting(session.to_row())
+        self.closed += 1
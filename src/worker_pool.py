@@ -0,0 +1,22 @@
+# src/worker_pool.py
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+
+
+def init_worker():
+    """Process initializer: one OpenCV thread per worker process, the pool provides the parallelism"""
+    cv2.setNumThreads(1)
+
+
+def create_worker_pool(workers):
+    """
+    Pool of `workers` spawned processes for the detection and encoding
+    stages. Spawned rather than forked, so workers do not inherit camera
+    handles, threads or database connections of the parent.
+    """
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=init_worker
+    )
@@ -0,0 +1,27 @@
+# tests/conftest.py
+import os
+import tempfile
+
+# Tests that go through the default engine (init_db, Session) get a throwaway
+# database instead of face_recognition.db; set before src.database is imported
+os.environ.setdefault('FACE_RECOGNITION_DB', os.path.join(tempfile.mkdtemp(prefix='face_recognition_tests_'),
+                                                          'face_recognition.db'))
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from src.database import Base
+
+@pytest.fixture
+def session_factory():
+    """Sessions on an empty in-memory database, shared across threads"""
+    engine = create_engine('sqlite://', connect_args={'check_same_thread': False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)
+
+@pytest.fixture
+def session(session_factory):
+    session = session_factory()
+    yield session
+    session.close()
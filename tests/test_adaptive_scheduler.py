@@ -0,0 +1,46 @@
+# tests/test_adaptive_scheduler.py
+import pytest
+from src.adaptive_scheduler import AdaptiveScheduler
+
+@pytest.fixture
+def scheduler():
+    return AdaptiveScheduler(target_fps=10, alpha=1.0, cooldown=2)
+
+def run_frames(scheduler, frames, detect, encode):
+    changes = 0
+    for _ in range(frames):
+        scheduler.record('detect', detect)
+        scheduler.record('encode', encode)
+        changes += scheduler.frame_done(detect + encode)
+    return changes
+
+def test_degrades_the_most_expensive_stage(scheduler):
+    start = scheduler.settings
+    run_frames(scheduler, 2, detect=0.15, encode=0.01)
+    assert scheduler.detection_level == 2
+    assert scheduler.settings['detect_every'] > start['detect_every']
+    assert scheduler.settings['encode_every'] == 1
+
+    run_frames(scheduler, 2, detect=0.01, encode=0.15)
+    assert scheduler.encoding_level == 1
+    assert scheduler.settings['encode_every'] == 2
+
+def test_recovers_in_reverse_order(scheduler):
+    run_frames(scheduler, 2, detect=0.15, encode=0.01)
+    run_frames(scheduler, 2, detect=0.01, encode=0.15)
+    run_frames(scheduler, 2, detect=0.01, encode=0.01)
+    assert (scheduler.detection_level, scheduler.encoding_level) == (2, 0)
+    run_frames(scheduler, 2, detect=0.01, encode=0.01)
+    assert scheduler.detection_level == 1
+    run_frames(scheduler, 2, detect=0.01, encode=0.01)
+    assert scheduler.detection_level == 0
+
+def test_holds_settings_inside_budget(scheduler):
+    settings = scheduler.settings
+    assert run_frames(scheduler, 10, detect=0.04, encode=0.03) == 0
+    assert scheduler.settings == settings
+
+def test_cooldown_spaces_changes():
+    scheduler = AdaptiveScheduler(target_fps=10, alpha=1.0, cooldown=5)
+    assert run_frames(scheduler, 4, detect=0.5, encode=0.0) == 0
+    assert run_frames(scheduler, 1, detect=0.5, encode=0.0) == 1
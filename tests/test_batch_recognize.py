@@ -0,0 +1,96 @@
+# tests/test_batch_recognize.py
+import csv
+import json
+import datetime
+import cv2
+import numpy as np
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from src.batch_recognize import (CsvOutput, DatabaseOutput, FrameReader, JsonlOutput, Source, run_batch,
+                                 sources_from_paths)
+from src.database import DetectionLogWriter, Person, Sighting
+
+def fake_detect_and_encode(frame, upsample=1):
+    """One face per frame, encoded as the frame's brightness: 0 is unknown, 1-5 a person id"""
+    value = int(frame[0, 0, 0]) // 40
+    return [(10, 30, 30, 10)], [np.full(4, value, dtype=np.float32)]
+
+class FakeEncoder:
+    def match_faces(self, encodings, top_k=1, threshold=None):
+        return [[(f"person-{int(e[0])}", 0.9, int(e[0]))] if e[0] else [] for e in encodings]
+
+def write_video(path, values, fps=10.0):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'MJPG'), fps, (64, 48))
+    if not writer.isOpened():
+        pytest.skip("OpenCV was built without a video writer")
+    for value in values:
+        writer.write(np.full((48, 64, 3), value * 40 + 20, dtype=np.uint8))
+    writer.release()
+
+def write_images(directory, values):
+    directory.mkdir()
+    for i, value in enumerate(values):
+        cv2.imwrite(str(directory / f"{i:04d}.png"), np.full((48, 64, 3), value * 40 + 20, dtype=np.uint8))
+
+def batch(sources, outputs, **options):
+    with ThreadPoolExecutor(2) as executor:
+        return run_batch(sources, FakeEncoder(), outputs, executor=executor,
+                         worker_fn=fake_detect_and_encode, **options)
+
+def test_sources_from_paths(tmp_path):
+    (tmp_path / "cam1").mkdir()
+    for path in ("cam1/0001.jpg", "cam1/0002.png", "clip.MP4", "notes.txt"):
+        (tmp_path / path).write_bytes(b'')
+    sources = sources_from_paths([str(tmp_path)])
+    assert sources == [
+        Source(str(tmp_path / "clip.MP4"), [str(tmp_path / "clip.MP4")], True),
+        Source(str(tmp_path / "cam1"), [str(tmp_path / "cam1/0001.jpg"), str(tmp_path / "cam1/0002.png")], False)
+    ]
+
+def test_reader_samples_every_nth_frame(tmp_path):
+    write_video(tmp_path / "clip.avi", [0, 1] * 5, fps=10.0)
+    reader = FrameReader([Source("clip", [str(tmp_path / "clip.avi")], True)], stride=3, max_side=32,
+                         start_time=1000.0)
+    frames = []
+    while True:
+        ret, frame = reader.read_frame()
+        if not ret:
+            break
+        frames.append((reader.take(len(frames)), frame.shape))
+    assert [info.index for info, _ in frames] == [0, 3, 6, 9]
+    assert [info.timestamp for info, _ in frames] == pytest.approx([1000.0, 1000.3, 1000.6, 1000.9])
+    assert frames[0][1] == (24, 32, 3) and frames[0][0].scale == 0.5
+    assert (reader.frames_scanned, reader.media_seconds) == (10, pytest.approx(1.0))
+
+def test_streams_faces_to_jsonl_and_csv(tmp_path):
+    write_images(tmp_path / "cam1", [1, 2, 0, 2, 3, 0])
+    jsonl, csv_path = tmp_path / "faces.jsonl", tmp_path / "faces.csv"
+    stats = batch(sources_from_paths([str(tmp_path / "cam1")]), [JsonlOutput(str(jsonl)), CsvOutput(str(csv_path))],
+                  stride=2, max_side=None)
+    assert (stats['frames'], stats['faces'], stats['recognized'], stats['failed_frames']) == (3, 3, 2, 0)
+    assert stats['frames_per_second'] > 0
+
+    records = [json.loads(line) for line in jsonl.read_text().splitlines()]
+    assert [(record['frame'], record['person_id']) for record in records] == [(0, 1), (2, None), (4, 3)]
+    assert records[0]['candidates'] == [["person-1", 0.9, 1]]
+    assert (records[0]['top'], records[0]['left']) == (10, 10)
+    with open(csv_path, newline='') as report:
+        rows = list(csv.DictReader(report))
+    assert [row['name'] for row in rows] == ["person-1", "", "person-3"]
+
+def test_writes_sightings_in_footage_time(tmp_path, session_factory):
+    session = session_factory()
+    session.add_all([Person(id=1, name="Alice"), Person(id=2, name="Bob")])
+    session.commit()
+
+    # Alice leaves for longer than the gap and comes back: two sightings
+    write_video(tmp_path / "clip.avi", [1] * 5 + [0] * 30 + [1] * 5 + [2] * 5, fps=10.0)
+    writer = DetectionLogWriter(session_factory, overflow='block', block_timeout=None)
+    stats = batch([Source("cam", [str(tmp_path / "clip.avi")], True)], [DatabaseOutput(writer, gap=2.0)],
+                  stride=1, start_time=0.0)
+    assert stats['frames'] == 45
+    assert stats['realtime_factor'] > 0
+
+    sightings = session.query(Sighting).order_by(Sighting.first_seen).all()
+    assert [(s.person_id, s.frame_count, s.camera_id) for s in sightings] == [(1, 5, "cam"), (1, 5, "cam"), (2, 5, "cam")]
+    assert sightings[1].first_seen == datetime.datetime(1970, 1, 1, 0, 0, 3, 500000)
@@ -0,0 +1,118 @@
+# tests/test_bulk_enroll.py
+import os
+import csv
+import numpy as np
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from src.bulk_enroll import Checkpoint, ImageTask, encode_image, run_enrollment, tasks_from_directory, tasks_from_manifest
+from src.database import (ACTIVE_MODEL_VERSION, FaceEncoding, Group, Person, ReferenceImage, set_setting,
+                          unpack_encodings)
+
+def fake_encode(task, upsample=1, largest_face=False):
+    """Encodes any file whose name does not contain 'bad', without face_recognition"""
+    if 'bad' in task.path:
+        return {'task': task, 'status': 'failed', 'reason': "no face found"}
+    seed = sum(map(ord, task.path))
+    return {
+        'task': task,
+        'status': 'enrolled',
+        'encoding': np.random.default_rng(seed).normal(size=128).astype(np.float32),
+        'box': [0, 10, 10, 0],
+        'quality': 0.5,
+        'image_data': b'jpeg bytes'
+    }
+
+def enroll(tasks, session_factory, **options):
+    with ThreadPoolExecutor(2) as executor:
+        return run_enrollment(tasks, session_factory, executor=executor, encode=fake_encode, **options)
+
+def test_tasks_from_directory(tmp_path):
+    (tmp_path / "Jane Doe").mkdir()
+    for path in ("Jane Doe/1.jpg", "Jane Doe/2.PNG", "John.jpg", "notes.txt"):
+        (tmp_path / path).write_bytes(b'')
+    tasks = tasks_from_directory(str(tmp_path))
+    assert sorted((task.name, os.path.basename(task.path)) for task in tasks) == \
+        [("Jane Doe", "1.jpg"), ("Jane Doe", "2.PNG"), ("John", "John.jpg")]
+
+def test_tasks_from_manifest(tmp_path):
+    manifest = tmp_path / "manifest.csv"
+    manifest.write_text("path,name,groups\nphotos/a.jpg,Alice,staff; admins\n/abs/b.jpg,Bob,\n")
+    tasks = tasks_from_manifest(str(manifest))
+    assert tasks[0] == ImageTask(str(tmp_path / "photos/a.jpg"), "Alice", ("staff", "admins"))
+    assert tasks[1] == ImageTask("/abs/b.jpg", "Bob", ())
+
+def test_enrolls_in_chunks(session_factory, tmp_path):
+    tasks = [ImageTask(f"/photos/{name}/{i}.jpg", name, ("staff",)) for name in ("Alice", "Bob") for i in range(5)]
+    tasks.append(ImageTask("/photos/Carol/bad.jpg", "Carol", ()))
+    report = tmp_path / "failures.csv"
+    stats = enroll(tasks, session_factory, chunk_size=3, failure_report=str(report), groups=["visitors"])
+    assert (stats['enrolled'], stats['failed'], stats['persons_created']) == (10, 1, 2)
+
+    session = session_factory()
+    assert sorted(name for name, in session.query(Person.name)) == ["Alice", "Bob"]
+    rows = session.query(FaceEncoding).all()
+    assert len(rows) == 10 and session.query(ReferenceImage).count() == 10
+    encodings, valid = unpack_encodings([row.encoding_data for row in rows], [row.dtype for row in rows], 128)
+    assert len(valid) == 10
+    alice = session.query(Person).filter_by(name="Alice").one()
+    assert sorted(group.name for group in alice.groups) == ["staff", "visitors"]
+    assert session.query(Group).count() == 2
+    session.close()
+
+    with open(report) as report_file:
+        assert list(csv.reader(report_file)) == [['path', 'name', 'reason'],
+                                                 ['/photos/Carol/bad.jpg', 'Carol', 'no face found']]
+
+def test_resumes_from_checkpoint(session_factory, tmp_path):
+    checkpoint = str(tmp_path / "enroll.ckpt")
+    tasks = [ImageTask(f"/photos/{i}.jpg", f"Person {i % 3}", ()) for i in range(9)]
+    enroll(tasks[:4], session_factory, chunk_size=2, checkpoint_path=checkpoint)
+    stats = enroll(tasks, session_factory, chunk_size=2, checkpoint_path=checkpoint)
+    assert (stats['skipped'], stats['enrolled']) == (4, 5)
+
+    session = session_factory()
+    assert session.query(FaceEncoding).count() == 9
+    # Persons from the first run are reused by name
+    assert session.query(Person).count() == 3
+    session.close()
+
+def test_writes_the_active_model_version(session_factory):
+    session = session_factory()
+    set_setting(session, ACTIVE_MODEL_VERSION, 'v2')
+    session.commit()
+    enroll([ImageTask("/photos/a.jpg", "Alice", ())], session_factory)
+    assert [version for version, in session.query(FaceEncoding.model_version)] == ['v2']
+    session.close()
+
+def test_resume_skips_chunk_committed_before_crash(session_factory, tmp_path, monkeypatch):
+    checkpoint = str(tmp_path / "enroll.ckpt")
+    tasks = [ImageTask(f"/photos/{i}.jpg", f"Person {i % 3}", ()) for i in range(6)]
+    record = Checkpoint.record
+    calls = []
+
+    def crash_on_second_record(self, paths):
+        calls.append(paths)
+        if len(calls) == 2:
+            raise KeyboardInterrupt
+        record(self, paths)
+
+    # The second chunk is committed, then the run dies before recording it
+    monkeypatch.setattr(Checkpoint, 'record', crash_on_second_record)
+    with pytest.raises(KeyboardInterrupt):
+        enroll(tasks, session_factory, chunk_size=2, checkpoint_path=checkpoint)
+    monkeypatch.setattr(Checkpoint, 'record', record)
+    session = session_factory()
+    committed = session.query(FaceEncoding).count()
+    assert committed > len(Checkpoint(checkpoint).done)
+
+    stats = enroll(tasks, session_factory, chunk_size=2, checkpoint_path=checkpoint)
+    assert (stats['skipped'], stats['enrolled']) == (committed, 6 - committed)
+    assert session.query(FaceEncoding).count() == 6
+    session.close()
+    assert len(Checkpoint(checkpoint).done) == 6
+
+def test_encode_image_failures(tmp_path):
+    broken = tmp_path / "broken.jpg"
+    broken.write_bytes(b'not an image')
+    assert encode_image(ImageTask(str(broken), "X", ()))['reason'] == "not a decodable image"
+    assert encode_image(ImageTask(str(tmp_path / "missing.jpg"), "X", ()))['reason'].startswith("unreadable")
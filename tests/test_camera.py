@@ -1,11 +1,13 @@
 # tests/test_camera.py
 
+import threading
 import pytest
 import cv2
 import numpy as np
 from unittest.mock import Mock, patch
-from src.camera import CameraManager, CameraError
+from src.camera import CameraManager, CameraError, FrameBuffer
 from src.config import CameraConfig
+from src.frame_pool import SharedFramePool
 
 @pytest.fixture
 def mock_camera():
@@ -53,4 +55,58 @@ def test_camera_resolution(resolution, mock_camera):
         mock_config.FRAME_WIDTH = resolution[0]
         mock_config.FRAME_HEIGHT = resolution[1]
         cam = CameraManager()
-        assert mock_camera.return_value.set.called
\ No newline at end of file
+        assert mock_camera.return_value.set.called
+
+def test_frame_buffer_latest_frame_wins():
+    buffer = FrameBuffer(capacity=2)
+    for i in range(5):
+        buffer.put(i)
+    sequence, _, frame = buffer.get_latest(timeout=0)
+    assert frame == 4 and sequence == 4
+    assert buffer.dropped == 4
+    assert buffer.get_latest(timeout=0) is None
+    buffer.close()
+    assert buffer.get_latest() is None
+
+def test_threaded_capture(mock_camera):
+    cam = CameraManager()
+    cam.start_capture(buffer_size=1)
+    ret, frame = cam.read_frame()
+    assert ret
+    assert frame.shape == (480, 640, 3)
+    cam.stop_capture()
+    stats = cam.capture_stats()
+    assert stats['consumed'] == 1
+    assert stats['captured'] >= 1
+
+def test_threaded_capture_into_frame_pool(mock_camera):
+    pool = SharedFramePool(4, (480, 640, 3))
+    cam = CameraManager()
+    cam.start_capture(buffer_size=1, frame_pool=pool)
+    ret, handle = cam.read_handle()
+    assert ret
+    assert pool.view(handle).shape == (480, 640, 3)
+    pool.release(handle)
+    cam.stop_capture()
+    # Dropped and buffered frames hand their slots back
+    assert pool.free_slots == 4
+    pool.close()
+
+def test_stop_capture_keeps_pool_while_read_blocks(mock_camera):
+    unblock = threading.Event()
+
+    def blocking_read(*args):
+        unblock.wait()
+        return False, None
+
+    mock_camera.return_value.read.side_effect = blocking_read
+    pool = SharedFramePool(2, (480, 640, 3))
+    cam = CameraManager()
+    cam.start_capture(buffer_size=1, frame_pool=pool)
+    with patch.object(cam._capture_thread, 'join'):
+        assert not cam.stop_capture()
+    assert cam.frame_pool is pool
+    unblock.set()
+    assert cam.stop_capture()
+    assert cam.frame_pool is None
+    pool.close()
@@ -0,0 +1,96 @@
+# tests/test_detection_cascade.py
+import pytest
+import numpy as np
+from src.detection_cascade import DetectionCascade, MotionGate, expand_region, merge_regions
+
+class FakeGate:
+    def __init__(self, faces):
+        self.faces = faces
+
+    def detect_faces(self, frame):
+        return self.faces
+
+class FakeDetector:
+    """Reports one face in the middle of whatever it is given"""
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, frame):
+        self.calls.append(frame.shape[:2])
+        height, width = frame.shape[:2]
+        return [(height // 4, 3 * width // 4, 3 * height // 4, width // 4)]
+
+@pytest.fixture
+def frame():
+    return np.zeros((240, 320, 3), dtype=np.uint8)
+
+def test_expand_region_is_clipped():
+    assert expand_region((10, 60, 60, 10), 0.5, (100, 100)) == (0, 85, 85, 0)
+
+def test_merge_regions():
+    regions = merge_regions([(0, 50, 50, 0), (40, 90, 90, 40), (200, 250, 250, 200)])
+    assert sorted(regions) == [(0, 90, 90, 0), (200, 250, 250, 200)]
+
+def test_empty_gate_skips_expensive_detector(frame):
+    detector = FakeDetector()
+    cascade = DetectionCascade(detector, gate=FakeGate([]), full_scan_every=0)
+    assert cascade.detect(frame) == []
+    assert detector.calls == []
+    assert cascade.stats['gated'] == 1
+
+def test_expensive_detector_runs_in_candidate_region(frame):
+    detector = FakeDetector()
+    cascade = DetectionCascade(detector, gate=FakeGate([(100, 80, 40, 40)]),
+                               region_padding=0.5, full_scan_every=0)
+    faces = cascade.detect(frame)
+    # Region is (60, 160, 140, 80), 80x80
+    assert detector.calls == [(80, 80)]
+    assert faces == [(80, 140, 120, 100)]
+
+def test_periodic_full_scan(frame):
+    detector = FakeDetector()
+    cascade = DetectionCascade(detector, gate=FakeGate([]), full_scan_every=3)
+    for _ in range(4):
+        cascade.detect(frame)
+    assert detector.calls == [(240, 320), (240, 320)]
+
+def test_static_scene_reuses_previous_result(frame):
+    detector = FakeDetector()
+    cascade = DetectionCascade(detector, motion_gate=MotionGate(), full_scan_every=0)
+    first = cascade.detect(frame)
+    second = cascade.detect(frame.copy())
+    assert first == second
+    assert len(detector.calls) == 1
+    assert cascade.stats['static'] == 1
+
+def test_motion_gate_detects_change(frame):
+    gate = MotionGate()
+    assert gate.has_motion(frame)
+    assert not gate.has_motion(frame)
+    changed = frame.copy()
+    changed[60:180, 80:240] = 255
+    assert gate.has_motion(changed)
+
+def test_roi_search_around_previous_faces(frame):
+    detector = FakeDetector()
+    cascade = DetectionCascade(detector, full_scan_every=0, roi_padding=0.25)
+    cascade.detect(frame)
+    assert detector.calls == [(240, 320)]
+    # Previous face is (60, 240, 180, 80), 160x120
+    cascade.detect(frame)
+    assert detector.calls[-1] == (180, 240)
+    cascade.detect(frame, previous=[(100, 120, 120, 100)])
+    assert detector.calls[-1] == (30, 30)
+    assert cascade.stats['roi_searches'] == 2
+
+def test_empty_roi_falls_back_to_normal_stages(frame):
+    calls = []
+
+    def detector(crop):
+        calls.append(crop.shape[:2])
+        return [] if crop.shape[:2] != (240, 320) else [(10, 30, 30, 10)]
+
+    cascade = DetectionCascade(detector, full_scan_every=0, roi_padding=0.5)
+    faces = cascade.detect(frame, previous=[(100, 120, 120, 100)])
+    assert calls == [(40, 40), (240, 320)]
+    assert faces == [(10, 30, 30, 10)]
@@ -0,0 +1,88 @@
+# tests/test_encoding_storage.py
+import json
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import sessionmaker
+from src.database import FaceEncoding, pack_encoding, unpack_encodings
+from src.database.migrate_encodings import migrate_json_encodings
+
+def test_round_trip_mixed_dtypes():
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(3, 128)).astype(np.float32)
+    packed = [pack_encoding(vectors[0]), pack_encoding(vectors[1], 'float16'), pack_encoding(vectors[2])]
+    assert len(packed[0][0]) == 512 and len(packed[1][0]) == 256
+    encodings, valid = unpack_encodings([data for data, _ in packed], ['float32', 'float16', 'float32'], 128)
+    assert valid.tolist() == [0, 1, 2]
+    assert encodings.dtype == np.float32
+    np.testing.assert_array_equal(encodings[[0, 2]], vectors[[0, 2]])
+    np.testing.assert_allclose(encodings[1], vectors[1], atol=1e-2)
+
+def test_invalid_rows_are_skipped():
+    good, _ = pack_encoding(np.ones(128))
+    encodings, valid = unpack_encodings([good, good[:100], None, good], ['float32', 'float32', 'float32', 'int8'], 128)
+    assert valid.tolist() == [0]
+    assert encodings.shape == (1, 128)
+
+def test_unknown_dtype_is_rejected():
+    with pytest.raises(ValueError):
+        pack_encoding(np.ones(128), 'int8')
+
+@pytest.fixture
+def legacy_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE persons (id INTEGER PRIMARY KEY, name VARCHAR(100) NOT NULL, "
+                                "created_at DATETIME, last_updated_at DATETIME, is_active BOOLEAN, "
+                                "notes VARCHAR(500), person_metadata VARCHAR(1000))"))
+        connection.execute(text("CREATE TABLE face_encodings (id INTEGER PRIMARY KEY, "
+                                "person_id INTEGER NOT NULL REFERENCES persons (id), "
+                                "encoding VARCHAR(2000) NOT NULL, quality_score FLOAT, created_at DATETIME)"))
+        connection.execute(text("INSERT INTO persons (id, name, is_active) VALUES (1, 'Test Person', 1)"))
+    return engine
+
+def insert_json(engine, rows):
+    with engine.begin() as connection:
+        connection.execute(text("INSERT INTO face_encodings (id, person_id, encoding) VALUES (:id, 1, :encoding)"),
+                           [{'id': row_id, 'encoding': encoding} for row_id, encoding in rows])
+
+def test_migrates_json_rows(legacy_engine):
+    vectors = np.random.default_rng(1).normal(size=(5, 128)).astype(np.float32)
+    insert_json(legacy_engine, [(i + 1, json.dumps(vector.tolist())) for i, vector in enumerate(vectors)])
+
+    result = migrate_json_encodings(legacy_engine, batch_size=2)
+    assert result == {'converted': 5, 'failed': 0, 'failed_ids': [], 'dropped_json': True}
+    assert 'encoding' not in {column['name'] for column in inspect(legacy_engine).get_columns('face_encodings')}
+
+    session = sessionmaker(bind=legacy_engine)()
+    rows = session.query(FaceEncoding).order_by(FaceEncoding.id).all()
+    assert all(row.dim == 128 and row.dtype == 'float32' and row.is_active for row in rows)
+    encodings, _ = unpack_encodings([row.encoding_data for row in rows], [row.dtype for row in rows], 128)
+    np.testing.assert_array_equal(encodings, vectors)
+
+    # New rows insert without the JSON column
+    data, dim = pack_encoding(vectors[0], 'float16')
+    session.add(FaceEncoding(person_id=1, encoding_data=data, dim=dim, dtype='float16', model_version='test'))
+    session.commit()
+    session.close()
+
+def test_keeps_json_column_when_rows_fail(legacy_engine):
+    insert_json(legacy_engine, [(1, json.dumps([0.5] * 128)), (2, 'not json')])
+    result = migrate_json_encodings(legacy_engine, dtype='float16')
+    assert result['converted'] == 1
+    assert result['failed_ids'] == [2]
+    assert not result['dropped_json']
+
+    # The kept JSON column no longer blocks new rows
+    session = sessionmaker(bind=legacy_engine)()
+    data, dim = pack_encoding(np.zeros(128), 'float16')
+    session.add(FaceEncoding(person_id=1, encoding_data=data, dim=dim, dtype='float16', model_version='test'))
+    session.commit()
+    assert session.query(FaceEncoding).count() == 3
+    session.close()
+
+    # A rerun retries the failed row and leaves the schema alone
+    result = migrate_json_encodings(legacy_engine)
+    assert (result['converted'], result['failed_ids']) == (0, [2])
+    indexes = {index['name'] for index in inspect(legacy_engine).get_indexes('face_encodings')}
+    assert {index.name for index in FaceEncoding.__table__.indexes} <= indexes
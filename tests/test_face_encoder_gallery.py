@@ -0,0 +1,133 @@
+# tests/test_face_encoder_gallery.py
+import numpy as np
+from src.config import RecognitionConfig
+from src.database import DatabaseManager
+from src.face_encoder import FaceEncoder
+from src.gallery_snapshot import read_manifest
+from src.search_index import BruteForceIndex, PrototypeIndex
+
+def encoding(seed):
+    # Far apart from each other, so every person only matches itself
+    vector = np.zeros(128, dtype=np.float32)
+    vector[seed] = 1.0
+    return vector
+
+def enroll(manager, name, seed, groups=None):
+    person = manager.create_person(name, groups=groups)
+    face_encoding = manager.add_face_encoding(person.id, encoding(seed))
+    return person.id, face_encoding.id
+
+def best(face_encoder, seed, **options):
+    matches = face_encoder.match_faces([encoding(seed)], **options)[0]
+    return matches[0][0] if matches else None
+
+def test_loads_and_patches_gallery_in_place(session):
+    manager = DatabaseManager(session)
+    alice, alice_encoding = enroll(manager, "Alice", 1)
+    face_encoder = FaceEncoder(session, index_type='brute_force')
+    assert best(face_encoder, 1) == "Alice"
+
+    bob, bob_encoding = enroll(manager, "Bob", 2)
+    assert best(face_encoder, 2) is None
+    assert face_encoder.add_known_face(bob, "Bob", encoding(2), bob_encoding)
+    assert best(face_encoder, 2) == "Bob"
+
+    assert face_encoder.remove_known_face(bob_encoding)
+    assert best(face_encoder, 2) is None
+    assert face_encoder.remove_person(alice)
+    assert best(face_encoder, 1) is None
+
+def test_manager_changes_reach_the_gallery(session):
+    manager = DatabaseManager(session)
+    alice, _ = enroll(manager, "Alice", 1)
+    bob, bob_encoding = enroll(manager, "Bob", 2)
+    face_encoder = FaceEncoder(session, index_type='brute_force')
+    manager.recognizer = face_encoder
+
+    manager.update_person(alice, name="Alicia")
+    assert best(face_encoder, 1) == "Alicia"
+    assert manager.deactivate_face_encoding(bob_encoding)
+    assert best(face_encoder, 2) is None
+    assert manager.soft_delete_person(alice)
+    assert best(face_encoder, 1) is None
+    # A reload agrees with the patched gallery
+    assert FaceEncoder(session, index_type='brute_force').gallery.live_count == 0
+
+def test_snapshot_replays_database_changes(session, tmp_path, monkeypatch):
+    # Patched in place: neither rewritten nor compacted
+    monkeypatch.setattr(RecognitionConfig, 'SNAPSHOT_REFRESH_RATIO', 10.0)
+    monkeypatch.setattr(RecognitionConfig, 'COMPACTION_TOMBSTONE_RATIO', 1.0)
+    manager = DatabaseManager(session)
+    alice, _ = enroll(manager, "Alice", 1)
+    bob, _ = enroll(manager, "Bob", 2)
+    FaceEncoder(session, index_type='brute_force', snapshot_dir=str(tmp_path))
+
+    manager.soft_delete_person(bob)
+    enroll(manager, "Carol", 3)
+    face_encoder = FaceEncoder(session, index_type='brute_force', snapshot_dir=str(tmp_path))
+    assert face_encoder.gallery.base_size == 2
+    assert [best(face_encoder, seed) for seed in (1, 2, 3)] == ["Alice", None, "Carol"]
+
+def test_snapshot_is_refreshed_after_many_changes(session, tmp_path):
+    manager = DatabaseManager(session)
+    enroll(manager, "Alice", 1)
+    bob, _ = enroll(manager, "Bob", 2)
+    FaceEncoder(session, index_type='brute_force', snapshot_dir=str(tmp_path))
+    assert read_manifest(str(tmp_path))['generation'] == 1
+
+    manager.soft_delete_person(bob)
+    enroll(manager, "Carol", 3)
+    face_encoder = FaceEncoder(session, index_type='brute_force', snapshot_dir=str(tmp_path))
+    # Half the snapshot changed: the patched gallery became the next generation
+    manifest = read_manifest(str(tmp_path))
+    assert (manifest['generation'], manifest['count']) == (2, 2)
+    assert (face_encoder.gallery.base_size, face_encoder.gallery.tombstones) == (2, 0)
+    assert [best(face_encoder, seed) for seed in (1, 2, 3)] == ["Alice", None, "Carol"]
+
+    # Nothing left to replay, so the next start keeps that generation
+    FaceEncoder(session, index_type='brute_force', snapshot_dir=str(tmp_path))
+    assert read_manifest(str(tmp_path))['generation'] == 2
+
+def test_match_batcher_routes_each_request(session):
+    manager = DatabaseManager(session)
+    enroll(manager, "Alice", 1)
+    enroll(manager, "Bob", 2)
+    face_encoder = FaceEncoder(session, index_type='brute_force')
+    batcher = face_encoder.create_match_batcher(max_wait=0.01)
+    futures = [batcher.submit([encoding(2), encoding(1)]), batcher.submit([]), batcher.submit([encoding(1)])]
+    results = [future.result(timeout=5) for future in futures]
+    batcher.close()
+    assert [[matches[0][0] for matches in result] for result in results] == [["Bob", "Alice"], [], ["Alice"]]
+    assert batcher.stats()['batch_size']['count'] == 1
+
+def test_group_changes_reach_the_scopes(session):
+    face_encoder = FaceEncoder(session, index_type='brute_force')
+    manager = DatabaseManager(session, recognizer=face_encoder)
+    # Enrolled the way main.py does it: create, store the encoding, patch the gallery
+    alice, alice_encoding = enroll(manager, "Alice", 1, groups=["staff"])
+    face_encoder.add_known_face(alice, "Alice", encoding(1), alice_encoding)
+    assert best(face_encoder, 1, scope="staff") == "Alice"
+    assert best(face_encoder, 1, scope="visitors") is None
+
+    manager.update_person(alice, groups=["visitors"])
+    assert best(face_encoder, 1, scope="staff") is None
+    assert best(face_encoder, 1, scope="visitors") == "Alice"
+
+def test_index_follows_the_gallery_size(session, monkeypatch):
+    monkeypatch.setattr(RecognitionConfig, 'PROTOTYPE_MIN_GALLERY_SIZE', 3)
+    manager = DatabaseManager(session)
+    enroll(manager, "Alice", 1)
+    enroll(manager, "Bob", 2)
+    face_encoder = FaceEncoder(session, index_type='prototype')
+    assert isinstance(face_encoder.index, BruteForceIndex)
+
+    # Growing past the threshold switches to the configured index without a reload
+    carol, carol_encoding = enroll(manager, "Carol", 3)
+    face_encoder.add_known_face(carol, "Carol", encoding(3), carol_encoding, quality=0.8)
+    assert isinstance(face_encoder.index, PrototypeIndex)
+    assert [best(face_encoder, seed) for seed in (1, 2, 3)] == ["Alice", "Bob", "Carol"]
+
+    # Shrinking below it falls back to an exact scan once the gallery is compacted
+    face_encoder.remove_known_face(carol_encoding)
+    assert isinstance(face_encoder.index, BruteForceIndex)
+    assert [best(face_encoder, seed) for seed in (1, 2, 3)] == ["Alice", "Bob", None]
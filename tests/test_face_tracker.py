@@ -0,0 +1,108 @@
+# tests/test_face_tracker.py
+import pytest
+from src.face_tracker import FaceTracker, box_iou
+
+@pytest.fixture
+def tracker():
+    return FaceTracker(detect_every=3, max_misses=1)
+
+def test_box_iou():
+    assert box_iou((0, 10, 10, 0), (0, 10, 10, 0)) == pytest.approx(1.0)
+    assert box_iou((0, 10, 10, 0), (0, 20, 10, 10)) == 0.0
+    assert box_iou((0, 10, 10, 0), (0, 15, 10, 5)) == pytest.approx(1 / 3)
+
+def test_stable_track_ids(tracker):
+    first = tracker.update([(10, 60, 60, 10), (10, 200, 60, 150)])
+    tracker.next_frame()
+    second = tracker.update([(12, 202, 62, 152), (12, 62, 62, 12)])
+    assert [track.track_id for track in second] == [first[1].track_id, first[0].track_id]
+
+def test_centroid_fallback_for_fast_motion(tracker):
+    track = tracker.update([(10, 60, 60, 10)])[0]
+    tracker.next_frame()
+    moved = tracker.update([(27, 77, 77, 27)])[0]
+    assert moved.track_id == track.track_id
+
+def test_detection_cadence(tracker):
+    assert tracker.needs_detection()
+    tracker.update([(10, 60, 60, 10)])
+    for _ in range(2):
+        tracker.next_frame()
+        assert not tracker.needs_detection()
+        assert len(tracker.predict()) == 1
+    tracker.next_frame()
+    assert tracker.needs_detection()
+
+def test_lost_tracks_are_dropped(tracker):
+    tracker.update([(10, 60, 60, 10)])
+    tracker.next_frame()
+    tracker.update([])
+    assert len(tracker.tracks) == 1
+    assert tracker.predict() == []
+    tracker.next_frame()
+    tracker.update([])
+    assert tracker.tracks == {}
+    assert tracker.needs_detection()
+
+def test_encoding_only_when_new_or_stale():
+    tracker = FaceTracker(detect_every=1, confidence_decay=0.9, reencode_below=0.5)
+    track = tracker.update([(10, 60, 60, 10)])[0]
+    assert tracker.needs_encoding(track)
+    tracker.set_identity(track, ("Alice", 0.7, 1))
+    tracker.next_frame()
+    tracker.update([(10, 60, 60, 10)])
+    assert not tracker.needs_encoding(track)
+    for _ in range(3):
+        tracker.next_frame()
+        tracker.update([(10, 60, 60, 10)])
+    # 0.7 * 0.9^4 < 0.5
+    assert tracker.needs_encoding(track)
+    assert track.identity[0] == "Alice"
+
+def test_voting_stops_encoding_once_decided():
+    from src.identity_voting import IdentityVoter
+    tracker = FaceTracker(detect_every=1, voter=IdentityVoter(min_votes=2), reverify_every=10)
+    track = tracker.update([(10, 60, 60, 10)])[0]
+    assert not tracker.observe(track, [("Alice", 0.65, 1)])
+    tracker.next_frame()
+    tracker.update([(10, 60, 60, 10)])
+    assert tracker.needs_encoding(track)
+    assert tracker.observe(track, [("Alice", 0.66, 1)])
+    assert track.identity[0] == "Alice"
+    for _ in range(9):
+        tracker.next_frame()
+        tracker.update([(10, 60, 60, 10)])
+        assert not tracker.needs_encoding(track)
+    tracker.next_frame()
+    tracker.update([(10, 60, 60, 10)])
+    assert tracker.needs_encoding(track)
+
+def test_drift_resets_votes():
+    from src.identity_voting import IdentityVoter
+    tracker = FaceTracker(detect_every=1, voter=IdentityVoter())
+    track = tracker.update([(10, 60, 60, 10)])[0]
+    tracker.observe(track, [("Alice", 0.9, 1)])
+    assert track.evidence.decided
+    tracker.next_frame()
+    # Matched only through the centroid fallback
+    tracker.update([(27, 77, 77, 27)])
+    assert not track.evidence.decided
+    assert tracker.needs_encoding(track)
+
+def test_encode_every_throttles_reencoding():
+    tracker = FaceTracker(detect_every=1, encode_every=3)
+    track = tracker.update([(10, 60, 60, 10)])[0]
+    assert tracker.needs_encoding(track)
+    tracker.set_identity(track, None)
+    for _ in range(2):
+        tracker.next_frame()
+        tracker.update([(10, 60, 60, 10)])
+        assert not tracker.needs_encoding(track)
+
+def test_rescale_moves_boxes_and_forces_detection(tracker):
+    track = tracker.update([(10, 60, 60, 10)])[0]
+    tracker.next_frame()
+    assert not tracker.needs_detection()
+    tracker.rescale(2.0)
+    assert track.box == (20, 120, 120, 20)
+    assert tracker.needs_detection()
@@ -0,0 +1,51 @@
+# tests/test_frame_pool.py
+
+import multiprocessing
+import numpy as np
+import pytest
+from src.frame_pool import FramePoolError, SharedFramePool
+
+@pytest.fixture
+def pool():
+    frame_pool = SharedFramePool(2, (4, 6, 3))
+    yield frame_pool
+    frame_pool.close()
+
+def read_slot_sum(spec, handle):
+    attached = SharedFramePool.attach(*spec)
+    return int(attached.view(handle).sum())
+
+def test_views_share_memory(pool):
+    handle = pool.acquire()
+    view = pool.view(handle)
+    view[:] = 7
+    assert pool.view(handle).sum() == 7 * view.size
+    assert np.shares_memory(view, pool.view(handle))
+
+def test_slots_recycle_after_last_release(pool):
+    first = pool.acquire()
+    second = pool.acquire()
+    assert pool.acquire(timeout=0) is None
+
+    pool.retain(first)
+    pool.release(first)
+    assert pool.free_slots == 0
+    pool.release(first)
+    assert pool.free_slots == 1
+
+    reused = pool.acquire(timeout=0)
+    assert reused.slot == first.slot
+    assert reused.generation == first.generation + 1
+    with pytest.raises(FramePoolError):
+        pool.view(first)
+    pool.release(second)
+    pool.release(reused)
+    assert pool.free_slots == 2
+
+def test_attach_from_another_process(pool):
+    handle = pool.acquire()
+    pool.view(handle)[:] = 3
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(1) as workers:
+        total = workers.apply(read_slot_sum, (pool.spec(), handle))
+    assert total == 3 * 4 * 6 * 3
@@ -0,0 +1,80 @@
+# tests/test_gallery.py
+import pytest
+import numpy as np
+from src.gallery import FaceGallery
+
+@pytest.fixture
+def encodings():
+    rng = np.random.default_rng(0)
+    return rng.random((50, 128), dtype=np.float32)
+
+@pytest.fixture
+def gallery(encodings):
+    gallery = FaceGallery(capacity=8)
+    gallery.load(
+        encodings,
+        person_ids=np.arange(50) // 2,
+        names=[f"Person {i // 2}" for i in range(50)],
+        encoding_ids=np.arange(100, 150)
+    )
+    return gallery
+
+def test_load_grows_capacity(gallery):
+    assert len(gallery) == 50
+    assert gallery.capacity >= 50
+    assert gallery.encodings.dtype == np.float32
+    assert gallery.encodings.flags['C_CONTIGUOUS']
+    assert isinstance(gallery.person_ids, np.ndarray)
+    assert isinstance(gallery.names, np.ndarray)
+
+def test_distances_match_euclidean(gallery, encodings):
+    query = encodings[7] + 0.01
+    expected = np.linalg.norm(encodings - query, axis=1)
+    np.testing.assert_allclose(gallery.distances(query), expected, atol=1e-4)
+
+def test_best_match(gallery, encodings):
+    row, distance = gallery.best_match(encodings[13])
+    assert row == 13
+    assert distance == pytest.approx(0.0, abs=1e-2)
+    assert gallery.person_ids[row] == 6
+    assert gallery.names[row] == "Person 6"
+    assert gallery.encoding_ids[row] == 113
+
+def test_empty_gallery():
+    gallery = FaceGallery()
+    assert gallery.best_match(np.zeros(128)) is None
+
+def test_load_length_mismatch():
+    gallery = FaceGallery()
+    with pytest.raises(ValueError):
+        gallery.load(np.zeros((2, 128)), person_ids=[1], names=["a", "b"])
+
+def test_add_and_remove(gallery, encodings):
+    row = gallery.add(encodings[3] * 2, person_id=99, name="New", encoding_id=500)
+    assert row == 50 and len(gallery) == 51
+    assert gallery.best_match(encodings[3] * 2)[0] == row
+
+    assert gallery.remove_rows(gallery.rows_for_person(99)) == 1
+    assert gallery.live_count == 50
+    assert np.isinf(gallery.distances(encodings[3])[row])
+    assert gallery.best_match(encodings[3] * 2)[0] != row
+
+def test_compact(gallery, encodings):
+    gallery.remove_rows(gallery.rows_for_person(0))
+    gallery.remove_rows(gallery.rows_for_encoding(120))
+    mapping = gallery.compact()
+    assert len(gallery) == 47
+    assert gallery.tombstones == 0
+    assert list(mapping[:3]) == [-1, -1, 0]
+    assert mapping[20] == -1
+    np.testing.assert_array_equal(gallery.encodings[mapping[30]], encodings[30])
+    assert gallery.encoding_ids[mapping[30]] == 130
+
+def test_distances_batch(gallery, encodings):
+    gallery.remove_rows([4])
+    queries = encodings[[1, 4, 9]] + 0.01
+    distances = gallery.distances_batch(queries)
+    assert distances.shape == (3, 50)
+    for query, row in zip(queries, distances):
+        np.testing.assert_allclose(row, gallery.distances(query), atol=1e-4)
+    assert np.isinf(distances[:, 4]).all()
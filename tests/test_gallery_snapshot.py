@@ -0,0 +1,72 @@
+# tests/test_gallery_snapshot.py
+import os
+import json
+import pytest
+import numpy as np
+from src.gallery import FaceGallery
+from src.gallery_snapshot import SnapshotError, read_snapshot, write_snapshot
+
+@pytest.fixture
+def rows():
+    rng = np.random.default_rng(3)
+    encodings = rng.random((20, 128), dtype=np.float32)
+    person_ids = np.arange(20) // 4
+    encoding_ids = np.arange(1, 21)
+    names = [f"Person {i}" for i in person_ids]
+    return encodings, person_ids, encoding_ids, names
+
+def test_round_trip_is_memory_mapped(tmp_path, rows):
+    encodings, person_ids, encoding_ids, names = rows
+    manifest = write_snapshot(tmp_path, encodings, person_ids, encoding_ids, names, high_water_mark=20)
+    assert manifest['count'] == 20 and manifest['generation'] == 1
+
+    snapshot = read_snapshot(tmp_path)
+    assert isinstance(snapshot.encodings, np.memmap)
+    assert not snapshot.encodings.flags.writeable
+    np.testing.assert_array_equal(snapshot.encodings, encodings)
+    np.testing.assert_array_equal(snapshot.encoding_ids, encoding_ids)
+    assert list(snapshot.names) == names
+    assert snapshot.high_water_mark == 20
+
+def test_new_generation_replaces_old_files(tmp_path, rows):
+    encodings, person_ids, encoding_ids, names = rows
+    write_snapshot(tmp_path, encodings, person_ids, encoding_ids, names, high_water_mark=20)
+    write_snapshot(tmp_path, encodings[:5], person_ids[:5], encoding_ids[:5], names[:5], high_water_mark=5)
+    assert len(read_snapshot(tmp_path)) == 5
+    assert all(name.endswith('.2.npy') for name in os.listdir(tmp_path) if name.endswith('.npy'))
+
+def test_missing_and_unknown_snapshot(tmp_path, rows):
+    with pytest.raises(SnapshotError):
+        read_snapshot(tmp_path)
+    encodings, person_ids, encoding_ids, names = rows
+    write_snapshot(tmp_path, encodings, person_ids, encoding_ids, names, high_water_mark=20)
+    manifest_path = tmp_path / 'manifest.json'
+    manifest = json.loads(manifest_path.read_text())
+    manifest['format_version'] = 99
+    manifest_path.write_text(json.dumps(manifest))
+    with pytest.raises(SnapshotError):
+        read_snapshot(tmp_path)
+
+def test_gallery_attach_snapshot(tmp_path, rows):
+    encodings, person_ids, encoding_ids, names = rows
+    write_snapshot(tmp_path, encodings, person_ids, encoding_ids, names, high_water_mark=20)
+    snapshot = read_snapshot(tmp_path)
+
+    gallery = FaceGallery()
+    gallery.attach(snapshot.encodings, snapshot.person_ids, snapshot.names,
+                   snapshot.encoding_ids, snapshot.sq_norms)
+    assert gallery.base_size == 20
+    # The mapped rows are served in place, not copied
+    assert gallery.encodings is snapshot.encodings
+    row = gallery.add(np.full(128, 2.0), person_id=50, name="New", encoding_id=21)
+    gallery.remove_rows(gallery.rows_for_encoding(3))
+
+    expected = np.linalg.norm(np.vstack((encodings, np.full(128, 2.0))) - encodings[0], axis=1)
+    expected[2] = np.inf
+    np.testing.assert_allclose(gallery.distances(encodings[0]), expected, atol=1e-3)
+    np.testing.assert_array_equal(gallery.take([1, row]), [encodings[1], np.full(128, 2.0)])
+
+    mapping = gallery.compact()
+    assert gallery.base_size == 0
+    assert len(gallery) == 20
+    np.testing.assert_array_equal(gallery.encodings[mapping[row]], np.full(128, 2.0))
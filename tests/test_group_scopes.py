@@ -0,0 +1,56 @@
+# tests/test_group_scopes.py
+import numpy as np
+import pytest
+from src.gallery import FaceGallery
+from src.group_scopes import GroupScopes
+from src.search_index import BruteForceIndex, search_rows
+
+@pytest.fixture
+def gallery():
+    rng = np.random.default_rng(0)
+    gallery = FaceGallery()
+    # Two encodings for each of persons 0..9
+    person_ids = np.repeat(np.arange(10), 2)
+    gallery.load(rng.normal(size=(20, 128)), person_ids, [str(i) for i in person_ids])
+    return gallery
+
+@pytest.fixture
+def scopes(gallery):
+    scopes = GroupScopes(gallery)
+    scopes.load([('staff', 1), ('staff', 2), ('visitors', 2), ('visitors', 7)])
+    return scopes
+
+def test_rows_of_groups(scopes):
+    assert scopes.rows('staff').tolist() == [2, 3, 4, 5]
+    assert scopes.rows(['staff', 'visitors']).tolist() == [2, 3, 4, 5, 14, 15]
+    assert len(scopes.rows('unknown')) == 0
+
+def test_membership_changes(scopes):
+    scopes.rows('staff')
+    scopes.set_person_groups(1, ['visitors'])
+    assert scopes.rows('staff').tolist() == [4, 5]
+    assert scopes.rows('visitors').tolist() == [2, 3, 4, 5, 14, 15]
+    assert scopes.groups_of(1) == {'visitors'}
+
+def test_rows_follow_gallery_changes(gallery, scopes):
+    assert scopes.rows('staff').tolist() == [2, 3, 4, 5]
+    row = gallery.add(np.zeros(128), person_id=2, name="2")
+    scopes.rows_added(row)
+    assert scopes.rows('staff').tolist() == [2, 3, 4, 5, 20]
+
+    gallery.remove_rows([0, 3])
+    assert scopes.rows('staff').tolist() == [2, 4, 5, 20]
+    scopes.remap(gallery.compact())
+    assert scopes.rows('staff').tolist() == [1, 2, 3, 18]
+    assert set(gallery.person_ids[scopes.rows('staff')]) == {1, 2}
+
+def test_scoped_search_only_returns_members(gallery, scopes):
+    query = gallery.encodings[14] + 0.01
+    assert BruteForceIndex(gallery).search(query, k=1)[0][0] == 14
+    (rows, distances), = search_rows(gallery, scopes.rows('staff'), [query], k=2)
+    assert set(gallery.person_ids[rows]) <= {1, 2}
+    exact = np.linalg.norm(gallery.encodings[[2, 3, 4, 5]] - query, axis=1)
+    np.testing.assert_allclose(distances, np.sort(exact)[:2], rtol=1e-4)
+
+    (rows, distances), = search_rows(gallery, scopes.rows('nobody'), [query], k=1)
+    assert len(rows) == 0
@@ -0,0 +1,43 @@
+# tests/test_identity_voting.py
+import pytest
+from src.identity_voting import IdentityVoter
+
+@pytest.fixture
+def voter():
+    return IdentityVoter(accept_confidence=0.6, min_votes=3, early_accept=0.8, max_observations=5)
+
+def test_consistent_matches_are_labelled_after_min_votes(voter):
+    evidence = voter.new_evidence()
+    assert not voter.observe(evidence, [("Alice", 0.65, 1), ("Bob", 0.5, 2)])
+    assert not voter.observe(evidence, [("Alice", 0.66, 1)])
+    assert voter.observe(evidence, [("Alice", 0.64, 1), ("Bob", 0.45, 2)])
+    assert evidence.decided
+    assert evidence.identity[0] == "Alice"
+    assert evidence.identity[2] == 1
+
+def test_strong_first_match_terminates_early(voter):
+    evidence = voter.new_evidence()
+    assert voter.observe(evidence, [("Alice", 0.85, 1)])
+    assert evidence.identity[2] == 1
+
+def test_flicker_is_not_labelled(voter):
+    evidence = voter.new_evidence()
+    for i in range(4):
+        leader = ("Alice", 0.62, 1) if i % 2 else ("Bob", 0.62, 2)
+        assert not voter.observe(evidence, [leader])
+    assert not evidence.decided
+
+def test_unknown_after_max_observations(voter):
+    evidence = voter.new_evidence()
+    results = [voter.observe(evidence, []) for _ in range(5)]
+    assert results == [False] * 4 + [True]
+    assert evidence.decided and evidence.identity is None
+
+def test_disagreeing_verification_restarts_voting(voter):
+    evidence = voter.new_evidence()
+    voter.observe(evidence, [("Alice", 0.9, 1)])
+    assert not voter.observe(evidence, [("Alice", 0.7, 1)])
+    assert evidence.decided
+    assert not voter.observe(evidence, [("Bob", 0.65, 2)])
+    assert not evidence.decided
+    assert evidence.observations == 1
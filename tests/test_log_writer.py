@@ -0,0 +1,86 @@
+# tests/test_log_writer.py
+import threading
+import pytest
+from src.database import DetectionLog, DetectionLogWriter, Person
+
+@pytest.fixture
+def session_factory(session_factory):
+    session = session_factory()
+    session.add(Person(id=1, name="Test Person"))
+    session.commit()
+    session.close()
+    return session_factory
+
+def count_logs(session_factory):
+    session = session_factory()
+    try:
+        return session.query(DetectionLog).count()
+    finally:
+        session.close()
+
+def test_flushes_in_batches(session_factory):
+    writer = DetectionLogWriter(session_factory, batch_size=10, flush_interval=60)
+    for _ in range(25):
+        assert writer.log(1, 0.9, 0.5, location_x=10, location_y=20, environment_data='{}')
+    writer.flush(timeout=5)
+    assert count_logs(session_factory) == 25
+    assert writer.batches == 3
+    writer.close()
+
+def test_flushes_on_interval(session_factory):
+    writer = DetectionLogWriter(session_factory, batch_size=100, flush_interval=0.05)
+    writer.log(1, 0.8)
+    done = threading.Event()
+    for _ in range(100):
+        if writer.written == 1:
+            done.set()
+            break
+        done.wait(0.02)
+    assert done.is_set()
+    writer.close()
+
+def test_close_writes_remaining_events(session_factory):
+    writer = DetectionLogWriter(session_factory, batch_size=100, flush_interval=60)
+    for _ in range(5):
+        writer.log(1, 0.7)
+    writer.close()
+    assert count_logs(session_factory) == 5
+    assert not writer.log(1, 0.7)
+
+@pytest.mark.parametrize("overflow, kept", [('drop_oldest', 3), ('drop_newest', 3)])
+def test_overflow_policy(session_factory, overflow, kept):
+    # A writer that never flushes on its own until closed
+    writer = DetectionLogWriter(session_factory, max_queue=3, batch_size=100, flush_interval=60, overflow=overflow)
+    results = [writer.log(1, 0.5 + i / 100.0) for i in range(5)]
+    assert writer.dropped == 2
+    if overflow == 'drop_newest':
+        assert results == [True, True, True, False, False]
+    writer.close()
+    session = session_factory()
+    confidences = sorted(log.confidence for log in session.query(DetectionLog))
+    session.close()
+    assert len(confidences) == kept
+    expected = [0.52, 0.53, 0.54] if overflow == 'drop_oldest' else [0.5, 0.51, 0.52]
+    assert confidences == pytest.approx(expected)
+
+def test_unknown_overflow_policy(session_factory):
+    with pytest.raises(ValueError):
+        DetectionLogWriter(session_factory, overflow='ignore')
+
+def test_sightings_share_the_writer(session_factory):
+    import datetime
+    from src.database import Sighting
+    writer = DetectionLogWriter(session_factory, batch_size=100, flush_interval=60)
+    now = datetime.datetime.utcnow()
+    writer.log(1, 0.9, box=(20, 60, 60, 10))
+    writer.log_sighting({'person_id': 1, 'camera_id': '0', 'track_id': 5, 'first_seen': now,
+                         'last_seen': now, 'frame_count': 30, 'best_confidence': 0.9,
+                         'mean_confidence': 0.8, 'best_frame_quality': 0.5, 'environment_data': None})
+    writer.close()
+    session = session_factory()
+    log = session.query(DetectionLog).one()
+    sighting = session.query(Sighting).one()
+    session.close()
+    assert (log.location_x, log.location_y) == (10, 20)
+    assert sighting.frame_count == 30
+    assert writer.batches == 1
@@ -0,0 +1,62 @@
+# tests/test_micro_batcher.py
+
+import threading
+import pytest
+from src.micro_batcher import Histogram, MicroBatcher
+
+def test_requests_are_batched_and_routed_back():
+    batches = []
+    def double(items):
+        batches.append(list(items))
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher(double, max_batch_size=4, max_wait=0.05)
+    futures = [batcher.submit(i) for i in range(10)]
+    assert [future.result(timeout=2) for future in futures] == [i * 2 for i in range(10)]
+    batcher.close()
+    assert all(len(batch) <= 4 for batch in batches)
+    assert len(batches) < 10
+    stats = batcher.stats()
+    assert stats['batch_size']['count'] == len(batches)
+    assert stats['latency']['count'] == 10
+
+def test_concurrent_requesters_share_batches():
+    sizes = []
+    def identity(items):
+        sizes.append(len(items))
+        return items
+
+    batcher = MicroBatcher(identity, max_batch_size=8, max_wait=0.05)
+    barrier = threading.Barrier(6)
+    results = {}
+    def requester(i):
+        barrier.wait()
+        results[i] = batcher(i, timeout=2)
+    threads = [threading.Thread(target=requester, args=(i,)) for i in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    batcher.close()
+    assert results == {i: i for i in range(6)}
+    assert max(sizes) > 1
+
+def test_batch_failure_fails_every_request():
+    def fail(items):
+        raise ValueError("boom")
+    batcher = MicroBatcher(fail, max_batch_size=2, max_wait=0.01)
+    futures = [batcher.submit(i) for i in range(2)]
+    for future in futures:
+        with pytest.raises(ValueError):
+            future.result(timeout=2)
+    batcher.close()
+    with pytest.raises(RuntimeError):
+        batcher.submit(1)
+
+def test_histogram_buckets():
+    histogram = Histogram([1, 4])
+    for value in (1, 2, 5):
+        histogram.record(value)
+    stats = histogram.to_dict()
+    assert stats['buckets'] == {'<=1': 1, '<=4': 1, '>4': 1}
+    assert stats['mean'] == pytest.approx(8 / 3)
@@ -0,0 +1,57 @@
+# tests/test_multi_camera.py
+
+import pytest
+from src.camera import CameraError, FrameBuffer
+from src.multi_camera import MultiCameraManager
+
+class FakeCamera:
+    def __init__(self, camera_id):
+        if camera_id == 'broken':
+            raise CameraError("Failed to open camera")
+        self.camera_id = camera_id
+        self.frame_buffer = FrameBuffer(2)
+        self.frame_latency = 0.0
+        self.released = False
+
+    def start_capture(self, buffer_size=None):
+        pass
+
+    def capture_stats(self):
+        return {'captured': self.frame_buffer.captured, 'consumed': self.frame_buffer.consumed,
+                'dropped': self.frame_buffer.dropped, 'latency': self.frame_latency}
+
+    def release(self):
+        self.released = True
+        self.frame_buffer.close()
+
+def test_streams_are_served_round_robin():
+    cameras = MultiCameraManager([0, 1, 2], camera_factory=FakeCamera)
+    for _ in range(2):
+        for stream in cameras.streams:
+            stream.camera.frame_buffer.put(f"frame-{stream.camera_id}")
+        served = [cameras.next_frame(timeout=0)[0].camera_id for _ in range(3)]
+        assert served == [0, 1, 2]
+    assert cameras.next_frame(timeout=0) == (None, None)
+
+def test_busy_stream_does_not_starve_others():
+    cameras = MultiCameraManager([0, 1], camera_factory=FakeCamera)
+    busy, quiet = cameras.streams
+    busy.camera.frame_buffer.put('a')
+    stream, _ = cameras.next_frame(timeout=0)
+    assert stream is busy
+    busy.camera.frame_buffer.put('b')
+    quiet.camera.frame_buffer.put('c')
+    stream, frame = cameras.next_frame(timeout=0)
+    assert stream is quiet and frame == 'c'
+
+def test_stats_and_broken_cameras():
+    cameras = MultiCameraManager(['broken', 5], camera_factory=FakeCamera)
+    assert [stream.camera_id for stream in cameras.streams] == [5]
+    cameras.streams[0].camera.frame_buffer.put('frame')
+    cameras.next_frame(timeout=0)
+    stats = cameras.stats()
+    assert stats[5]['processed'] == 1 and stats[5]['captured'] == 1
+    cameras.release()
+    assert cameras.active_streams == []
+    with pytest.raises(CameraError):
+        MultiCameraManager(['broken'], camera_factory=FakeCamera)
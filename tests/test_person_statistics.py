@@ -0,0 +1,91 @@
+# tests/test_person_statistics.py
+import datetime
+import pytest
+from src.database import (DatabaseManager, DetectionLogWriter, Person, PersonStatistics,
+                          PersonStatisticsCache)
+
+@pytest.fixture
+def session_factory(session_factory):
+    session = session_factory()
+    session.add_all([Person(id=1, name="Test Person"), Person(id=2, name="Other Person")])
+    session.commit()
+    session.close()
+    return session_factory
+
+def sighting(person_id, frames, mean_confidence, start):
+    return {
+        'person_id': person_id,
+        'camera_id': '0',
+        'track_id': 1,
+        'first_seen': start,
+        'last_seen': start + datetime.timedelta(seconds=frames),
+        'frame_count': frames,
+        'best_confidence': mean_confidence + 0.05,
+        'mean_confidence': mean_confidence,
+        'best_frame_quality': 0.5,
+        'environment_data': None
+    }
+
+def test_writer_maintains_counters(session_factory):
+    cache = PersonStatisticsCache()
+    writer = DetectionLogWriter(session_factory, batch_size=10, flush_interval=60, statistics=cache)
+    start = datetime.datetime(2024, 1, 1, 12, 0)
+    writer.log_sighting(sighting(1, 10, 0.8, start))
+    writer.log_sighting(sighting(1, 30, 0.6, start + datetime.timedelta(minutes=5)))
+    writer.log(1, 0.9, detection_time=start + datetime.timedelta(minutes=10))
+    writer.flush(timeout=5)
+    writer.close()
+
+    session = session_factory()
+    row = session.get(PersonStatistics, 1)
+    assert row.total_sightings == 2
+    assert row.frames_seen == 40
+    assert row.total_detections == 1
+    assert row.best_confidence == pytest.approx(0.9)
+    assert row.first_seen == start
+    assert row.last_seen == start + datetime.timedelta(minutes=10)
+    assert session.get(PersonStatistics, 2) is None
+    session.close()
+
+    stats = cache.get(1)
+    assert stats['total_sightings'] == 2
+    assert stats['avg_confidence'] == pytest.approx((8 + 18 + 0.9) / 41)
+
+def test_unknown_person_reads_as_zero():
+    stats = PersonStatisticsCache().get(7)
+    assert stats['person_id'] == 7
+    assert stats['total_sightings'] == 0
+    assert stats['avg_confidence'] == 0.0
+
+def test_manager_loads_cache_once(session_factory):
+    session = session_factory()
+    session.add(PersonStatistics(person_id=2, total_detections=3, total_sightings=1,
+                                 frames_seen=0, confidence_sum=2.4))
+    session.commit()
+    manager = DatabaseManager(session)
+    assert manager.get_person_statistics(2)['total_detections'] == 3
+
+    # Later changes arrive through the writer, not through queries
+    session.query(PersonStatistics).delete()
+    session.commit()
+    assert manager.get_person_statistics(2)['total_detections'] == 3
+    session.close()
+
+def test_rebuild_from_history(session_factory):
+    start = datetime.datetime(2024, 1, 1, 12, 0)
+    writer = DetectionLogWriter(session_factory, flush_interval=60)
+    writer.log_sighting(sighting(1, 4, 0.5, start))
+    writer.log(1, 0.7, detection_time=start)
+    writer.close()
+
+    session = session_factory()
+    session.query(PersonStatistics).delete()
+    session.commit()
+    manager = DatabaseManager(session)
+    assert manager.rebuild_person_statistics() == 1
+    stats = manager.get_person_statistics(1)
+    assert stats['total_sightings'] == 1
+    assert stats['total_detections'] == 1
+    assert stats['frames_seen'] == 4
+    assert stats['best_confidence'] == pytest.approx(0.7)
+    session.close()
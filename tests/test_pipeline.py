@@ -0,0 +1,140 @@
+# tests/test_pipeline.py
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from src.micro_batcher import MicroBatcher
+from src.pipeline import RecognitionPipeline
+from src.worker_pool import create_worker_pool
+
+def fake_detect_and_encode(frame, upsample=1):
+    # Later frames finish first, so workers complete out of order
+    sequence = int(frame[0, 0])
+    time.sleep(0.02 * (sequence % 3))
+    return [(0, 10, 10, 0)], [np.full(4, sequence, dtype=np.float32)]
+
+class FakeEncoder:
+    def match_faces(self, encodings, top_k=1, threshold=None):
+        return [[(f"person-{int(encoding[0])}", 0.9, int(encoding[0]))] for encoding in encodings]
+
+def frame_source(count):
+    frames = iter(range(count))
+    def read_frame():
+        try:
+            return True, np.full((4, 4), next(frames), dtype=np.uint8)
+        except StopIteration:
+            return False, None
+    return read_frame
+
+def drain(pipeline):
+    results = []
+    while True:
+        result = pipeline.get_result(timeout=5)
+        if result is None:
+            break
+        results.append(result)
+    return results
+
+def test_pipeline_preserves_frame_order():
+    pipeline = RecognitionPipeline(FakeEncoder(), workers=3, drop_frames=False,
+                                   executor=ThreadPoolExecutor(3), worker_fn=fake_detect_and_encode)
+    pipeline.start(frame_source(12))
+    results = drain(pipeline)
+    pipeline.stop()
+    assert [result['sequence'] for result in results] == list(range(12))
+    assert [result['faces'][0][2][0][2] for result in results] == list(range(12))
+    stats = pipeline.stats()
+    assert stats['stages']['match']['count'] == 12
+    assert stats['dropped_frames'] == 0
+
+def test_pipeline_runs_workers_in_processes():
+    executor = create_worker_pool(2)
+    pipeline = RecognitionPipeline(FakeEncoder(), workers=2, drop_frames=False,
+                                   executor=executor, worker_fn=fake_detect_and_encode)
+    pipeline.start(frame_source(6))
+    results = drain(pipeline)
+    pipeline.stop()
+    executor.shutdown()
+    assert [result['sequence'] for result in results] == list(range(6))
+
+def test_pipeline_drops_oldest_frames_when_full():
+    def slow_worker(frame, upsample=1):
+        time.sleep(0.05)
+        return [], []
+    pipeline = RecognitionPipeline(FakeEncoder(), workers=1, queue_size=1, max_in_flight=1,
+                                   executor=ThreadPoolExecutor(1), worker_fn=slow_worker)
+    pipeline.start(frame_source(50))
+    results = drain(pipeline)
+    pipeline.stop()
+    sequences = [result['sequence'] for result in results]
+    assert sequences == sorted(sequences)
+    assert pipeline.dropped_frames > 0
+    assert len(results) + pipeline.dropped_frames == 50
+
+def test_pipeline_stop_ends_every_stage():
+    # A live source that keeps producing; stop must not wait for it to end
+    def read_frame():
+        time.sleep(0.01)
+        return True, np.zeros((4, 4), dtype=np.uint8)
+    pipeline = RecognitionPipeline(FakeEncoder(), workers=1, queue_size=2, drop_frames=False,
+                                   executor=ThreadPoolExecutor(1), worker_fn=fake_detect_and_encode)
+    pipeline.start(read_frame)
+    assert pipeline.get_result(timeout=5) is not None
+    threads = list(pipeline._threads)
+    pipeline.stop()
+    assert not any(thread.is_alive() for thread in threads)
+
+def fake_detect_and_encode_shared(handle, upsample=1, pool_spec=None):
+    pool_class, spec = pool_spec
+    return fake_detect_and_encode(pool_class.attach(*spec).view(handle), upsample)
+
+def test_pipeline_passes_shared_frame_handles():
+    from src.frame_pool import SharedFramePool
+    pool = SharedFramePool(16, (4, 4), np.uint8)
+    frames = iter(range(6))
+    def read_handle():
+        try:
+            sequence = next(frames)
+        except StopIteration:
+            return False, None
+        handle = pool.acquire(sequence)
+        pool.view(handle)[:] = sequence
+        return True, handle
+
+    executor = create_worker_pool(2)
+    pipeline = RecognitionPipeline(FakeEncoder(), workers=2, drop_frames=False, executor=executor,
+                                   worker_fn=fake_detect_and_encode_shared, frame_pool=pool)
+    pipeline.start(read_handle)
+    results = drain(pipeline)
+    assert [int(result['frame'][0, 0]) for result in results] == list(range(6))
+    for result in results:
+        pipeline.release(result)
+    pipeline.stop()
+    executor.shutdown()
+    assert pool.free_slots == 16
+    pool.close()
+
+def test_pipelines_share_a_match_batcher():
+    encoder = FakeEncoder()
+    batches = []
+    def match_batch(requests):
+        batches.append(len(requests))
+        return [encoder.match_faces(encodings) for encodings in requests]
+    matcher = MicroBatcher(match_batch, max_batch_size=8, max_wait=0.01)
+    executor = ThreadPoolExecutor(4)
+    pipelines = [
+        RecognitionPipeline(encoder, workers=2, drop_frames=False, executor=executor,
+                            worker_fn=fake_detect_and_encode, matcher=matcher)
+        for _ in range(2)
+    ]
+    for pipeline in pipelines:
+        pipeline.start(frame_source(10))
+    results = [drain(pipeline) for pipeline in pipelines]
+    for pipeline in pipelines:
+        pipeline.stop()
+    matcher.close()
+    executor.shutdown()
+    for pipeline_results in results:
+        assert [result['faces'][0][2][0][2] for result in pipeline_results] == list(range(10))
+    assert sum(batches) == 20
+    assert matcher.stats()['batch_size']['count'] == len(batches)
@@ -0,0 +1,107 @@
+# tests/test_re_encode_gallery.py
+import numpy as np
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from src.database import DatabaseManager, FaceEncoding, Person, ReferenceImage, active_model_version, pack_encoding
+from src.re_encode_gallery import re_encode, resume_point, switch_model_version
+
+@pytest.fixture
+def session_factory(session_factory):
+    session = session_factory()
+    session.add_all([Person(id=1, name="Alice"), Person(id=2, name="Bob")])
+    for image_id in range(1, 8):
+        session.add(ReferenceImage(id=image_id, person_id=1 + image_id % 2,
+                                   image_data=b'bad' if image_id == 4 else b'jpeg'))
+    # The gallery as the current model encoded it
+    for person_id in (1, 2):
+        data, dim = pack_encoding(np.zeros(128))
+        session.add(FaceEncoding(person_id=person_id, encoding_data=data, dim=dim, model_version='v1'))
+    session.commit()
+    session.close()
+    return session_factory
+
+def fake_encode(image_id, person_id, image_data, options):
+    if image_data == b'bad':
+        return {'status': 'failed', 'reason': "no face found", 'image_id': image_id, 'person_id': person_id}
+    return {'status': 'enrolled', 'encoding': np.full(128, image_id, dtype=np.float32), 'box': [0, 1, 1, 0],
+            'quality': 0.5, 'image_id': image_id, 'person_id': person_id}
+
+def run(session_factory, **options):
+    with ThreadPoolExecutor(2) as executor:
+        return re_encode('v2', session_factory, chunk_size=3, executor=executor, encode=fake_encode, **options)
+
+def count(session_factory, version, active):
+    session = session_factory()
+    try:
+        return session.query(FaceEncoding).filter_by(model_version=version, is_active=active).count()
+    finally:
+        session.close()
+
+def test_writes_new_version_inactive(session_factory, tmp_path):
+    report = tmp_path / "failures.csv"
+    stats = run(session_factory, failure_report=str(report))
+    assert (stats['encoded'], stats['failed'], stats['resumed_after']) == (6, 1, 0)
+    assert count(session_factory, 'v2', False) == 6
+    assert count(session_factory, 'v1', True) == 2
+    assert report.read_text().strip() == "4,1,no face found"
+
+    session = session_factory()
+    row = session.query(FaceEncoding).filter_by(model_version='v2', reference_image_id=5).one()
+    assert row.person_id == 2 and np.frombuffer(row.encoding_data, dtype=np.float32)[0] == 5
+    session.close()
+
+def test_resumes_after_last_encoded_image(session_factory):
+    run(session_factory)
+    session = session_factory()
+    assert resume_point(session, 'v2') == 7
+    # Images stored while the job was down are picked up on the next run
+    session.add(ReferenceImage(id=8, person_id=1, image_data=b'jpeg'))
+    session.commit()
+    session.close()
+
+    stats = run(session_factory)
+    assert (stats['resumed_after'], stats['encoded']) == (7, 1)
+    assert count(session_factory, 'v2', False) == 7
+
+def test_switch_is_all_or_nothing(session_factory):
+    with pytest.raises(ValueError):
+        switch_model_version('v2', session_factory)
+    run(session_factory)
+    result = switch_model_version('v2', session_factory)
+    assert result == {'activated': 6, 'caught_up': 0, 'orphaned': 0}
+    assert count(session_factory, 'v2', True) == 6
+    assert count(session_factory, 'v1', True) == 0
+
+def test_switch_refuses_to_orphan_persons(session_factory):
+    run(session_factory)
+    session = session_factory()
+    session.add(Person(id=3, name="Carol"))
+    data, dim = pack_encoding(np.zeros(128))
+    session.add(FaceEncoding(person_id=3, encoding_data=data, dim=dim, model_version='v1'))
+    session.commit()
+    session.close()
+
+    with pytest.raises(ValueError):
+        switch_model_version('v2', session_factory)
+    assert count(session_factory, 'v1', True) == 3
+    assert switch_model_version('v2', session_factory, force=True)['orphaned'] == 1
+
+def test_switch_catches_up_with_enrollments_during_the_job(session_factory):
+    run(session_factory)
+    # Enrolled while the job ran, under the version still active
+    session = session_factory()
+    session.add(ReferenceImage(id=8, person_id=1, image_data=b'jpeg'))
+    data, dim = pack_encoding(np.zeros(128))
+    session.add(FaceEncoding(person_id=1, encoding_data=data, dim=dim, model_version='v1', reference_image_id=8))
+    session.commit()
+    session.close()
+
+    with ThreadPoolExecutor(2) as executor:
+        result = switch_model_version('v2', session_factory, executor=executor, encode=fake_encode)
+    assert (result['activated'], result['caught_up']) == (7, 1)
+    assert count(session_factory, 'v2', True) == 7
+
+    # New enrollments follow the switched version
+    manager = DatabaseManager(session_factory())
+    assert active_model_version(manager.session) == 'v2'
+    assert manager.add_face_encoding(2, np.ones(128)).model_version == 'v2'
@@ -0,0 +1,201 @@
+# tests/test_search_index.py
+import pytest
+import numpy as np
+from src.gallery import FaceGallery
+from src.search_index import BruteForceIndex, IVFIndex, PrototypeIndex, QuantizedIndex, create_index
+
+@pytest.fixture
+def gallery():
+    rng = np.random.default_rng(1)
+    # Clustered data, closer to real face encodings than uniform noise
+    centers = rng.normal(size=(20, 128)).astype(np.float32)
+    encodings = centers[rng.integers(0, 20, 2000)] + rng.normal(scale=0.1, size=(2000, 128))
+    gallery = FaceGallery()
+    gallery.load(encodings, person_ids=np.arange(2000), names=[str(i) for i in range(2000)])
+    return gallery
+
+def test_brute_force_matches_exact_scan(gallery):
+    index = BruteForceIndex(gallery)
+    index.build()
+    query = gallery.encodings[42]
+    rows, distances = index.search(query, k=5)
+    expected = np.argsort(np.linalg.norm(gallery.encodings - query, axis=1))[:5]
+    assert rows[0] == 42
+    assert set(rows) == set(expected)
+    assert np.all(np.diff(distances) >= 0)
+
+def test_ivf_recall(gallery):
+    index = IVFIndex(gallery, n_lists=32, n_probe=4)
+    index.build()
+    hits = 0
+    for row in range(0, 2000, 20):
+        rows, _ = index.search(gallery.encodings[row] + 0.01, k=1)
+        hits += rows[0] == row
+    assert hits / 100 >= 0.95
+
+def test_ivf_full_probe_is_exact(gallery):
+    index = IVFIndex(gallery, n_lists=16, n_probe=16)
+    index.build()
+    query = np.random.default_rng(2).normal(size=128)
+    rows, distances = index.search(query, k=3)
+    exact = np.linalg.norm(gallery.encodings - query.astype(np.float32), axis=1)
+    np.testing.assert_array_equal(rows, np.argsort(exact)[:3])
+    np.testing.assert_allclose(distances, np.sort(exact)[:3], rtol=1e-4)
+
+def test_ivf_lists_cover_gallery(gallery):
+    index = IVFIndex(gallery, n_lists=10)
+    index.build()
+    assert sorted(np.concatenate(index._lists)) == list(range(len(gallery)))
+
+def test_empty_index():
+    index = IVFIndex(FaceGallery())
+    index.build()
+    rows, distances = index.search(np.zeros(128), k=1)
+    assert len(rows) == 0 and len(distances) == 0
+
+def test_create_index_unknown_type(gallery):
+    with pytest.raises(ValueError):
+        create_index(gallery, 'hnsw')
+
+def test_ivf_incremental_updates(gallery):
+    index = IVFIndex(gallery, n_lists=16, n_probe=16)
+    index.build()
+    new_encoding = np.full(128, 5.0, dtype=np.float32)
+    row = gallery.add(new_encoding, person_id=5000, name="New")
+    index.add(row)
+    assert index.search(new_encoding, k=1)[0][0] == row
+
+    gallery.remove_rows([row, 7])
+    assert index.search(new_encoding, k=1)[0][0] != row
+    index.remap(gallery.compact())
+    rows, _ = index.search(gallery.encodings[7], k=1)
+    assert rows[0] == 7
+    assert sorted(np.concatenate(index._lists)) == list(range(len(gallery)))
+
+@pytest.mark.parametrize("precision", ['int8', 'float16'])
+def test_quantized_agrees_with_exact_scan(gallery, precision):
+    index = QuantizedIndex(gallery, precision=precision, rerank=16, chunk_size=500)
+    index.build()
+    assert index.nbytes < gallery.encodings.nbytes / (1.5 if precision == 'float16' else 3)
+    queries = gallery.encodings[::20] + np.random.default_rng(3).normal(scale=0.05, size=(100, 128))
+    exact = BruteForceIndex(gallery).search_batch(queries, k=1)
+    results = index.search_batch(queries, k=1)
+    agreement = np.mean([rows[0] == exact_rows[0] for (rows, _), (exact_rows, _) in zip(results, exact)])
+    assert agreement >= 0.99
+    # Reported distances come from the float32 rerank
+    np.testing.assert_allclose([d[0] for _, d in results], [d[0] for _, d in exact], atol=1e-3)
+
+def test_quantized_incremental_updates(gallery):
+    index = QuantizedIndex(gallery, rerank=8)
+    index.build()
+    new_encoding = gallery.encodings[10] + 0.02
+    row = gallery.add(new_encoding, person_id=5000, name="New")
+    index.add(row)
+    assert index.search(new_encoding, k=1)[0][0] == row
+
+    gallery.remove_rows([row, 7])
+    assert index.search(new_encoding, k=1)[0][0] != row
+    index.remap(gallery.compact())
+    assert index.size == len(gallery)
+    rows, _ = index.search(gallery.encodings[7], k=1)
+    assert rows[0] == 7
+
+def test_quantized_unknown_precision(gallery):
+    with pytest.raises(ValueError):
+        create_index(gallery, 'quantized', precision='int4')
+
+@pytest.fixture
+def people():
+    rng = np.random.default_rng(4)
+    # 12 encodings for each of 50 persons
+    centers = rng.normal(scale=0.1, size=(50, 128)).astype(np.float32)
+    person_ids = np.repeat(np.arange(50), 12)
+    gallery = FaceGallery()
+    gallery.load(centers[person_ids] + rng.normal(scale=0.03, size=(600, 128)), person_ids,
+                 [str(i) for i in person_ids], encoding_ids=np.arange(600) + 1000)
+    return gallery
+
+def test_prototype_exemplars(people):
+    qualities = {1000 + row: 0.1 for row in range(600)}
+    qualities[1005] = 0.9
+    index = PrototypeIndex(people, qualities, n_exemplars=3)
+    index.build()
+    assert index.centroids.shape == (50, 128)
+    assert index.exemplars[0, 0] == 5
+    # Exemplars are distinct rows of their own person
+    for person, exemplars in zip(index.person_ids, index.exemplars):
+        assert len(set(exemplars)) == 3
+        assert set(people.person_ids[exemplars]) == {person}
+
+def test_prototype_matches_full_scan_by_person(people):
+    index = PrototypeIndex(people, n_candidates=4)
+    index.build()
+    queries = people.encodings[::7] + np.random.default_rng(5).normal(scale=0.03, size=(86, 128))
+    exact = BruteForceIndex(people).search_batch(queries, k=1)
+    results = index.search_batch(queries, k=3)
+    for (rows, distances), (exact_rows, _) in zip(results, exact):
+        assert people.person_ids[rows[0]] == people.person_ids[exact_rows[0]]
+        # One exemplar per person, nearest first
+        assert len(set(people.person_ids[rows])) == 3
+        assert np.all(np.diff(distances) >= 0)
+
+def test_prototype_incremental_updates(people):
+    index = PrototypeIndex(people)
+    index.build()
+    new_encoding = np.full(128, 0.5, dtype=np.float32)
+    row = people.add(new_encoding, person_id=500, name="New", encoding_id=5000)
+    index.add(row)
+    rows, distances = index.search(new_encoding, k=1)
+    assert rows[0] == row and distances[0] < 1e-3
+
+    people.remove_rows(people.rows_for_person(500))
+    assert people.person_ids[index.search(new_encoding, k=1)[0][0]] != 500
+    index.remap(people.compact())
+    assert 500 not in index.person_ids
+
+def test_prototype_removals(people):
+    index = PrototypeIndex(people, n_exemplars=3)
+    index.build()
+    # Removing every exemplar of a person promotes their remaining rows
+    exemplars = index.exemplars[index.person_ids == 7][0]
+    people.remove_rows(exemplars)
+    index.remove(exemplars)
+    refreshed = index.exemplars[index.person_ids == 7][0]
+    assert not set(refreshed) & set(exemplars)
+    assert people.person_ids[index.search(people.encodings[people.rows_for_person(7)[0]], k=1)[0][0]] == 7
+
+    # A person without live rows loses their centroid
+    rows = people.rows_for_person(3)
+    people.remove_rows(rows)
+    index.remove(rows)
+    assert 3 not in index.person_ids and len(index.person_ids) == 49
+    assert index.centroids.shape == (49, 128)
+    assert 3 not in people.person_ids[index.search(people.encodings[rows[0]], k=5)[0]]
+
+def test_prototype_scores_added_rows(people):
+    qualities = {1000 + row: 0.1 for row in range(600)}
+    index = PrototypeIndex(people, qualities, n_exemplars=3)
+    index.build()
+    # Shared with the owner, which scores a row before adding it
+    new_encoding = people.encodings[people.rows_for_person(9)].mean(axis=0)
+    qualities[5000] = 0.9
+    row = people.add(new_encoding, person_id=9, name="9", encoding_id=5000)
+    index.add(row)
+    assert index.exemplars[index.person_ids == 9][0][0] == row
+
+    people.remove_rows([row])
+    index.remove([row])
+    assert 5000 not in qualities
+    assert row not in index.exemplars
+
+@pytest.mark.parametrize("index_class", [BruteForceIndex, IVFIndex, QuantizedIndex])
+def test_search_batch_matches_single_search(gallery, index_class):
+    index = index_class(gallery)
+    index.build()
+    queries = gallery.encodings[[3, 300, 1500]] + 0.01
+    results = index.search_batch(queries, k=3)
+    assert len(results) == 3
+    for query, (rows, distances) in zip(queries, results):
+        single_rows, single_distances = index.search(query, k=3)
+        np.testing.assert_array_equal(rows, single_rows)
+        np.testing.assert_allclose(distances, single_distances, atol=1e-3)
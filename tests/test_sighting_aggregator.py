@@ -0,0 +1,60 @@
+# tests/test_sighting_aggregator.py
+import pytest
+from src.sighting_aggregator import SightingAggregator
+
+class FakeWriter:
+    def __init__(self):
+        self.sightings = []
+        self.detections = []
+
+    def log_sighting(self, row):
+        self.sightings.append(row)
+
+    def log(self, person_id, confidence, frame_quality=None, **kwargs):
+        self.detections.append((person_id, confidence, kwargs.get('box')))
+
+@pytest.fixture
+def writer():
+    return FakeWriter()
+
+def test_frames_fold_into_one_sighting(writer):
+    sightings = SightingAggregator(writer, gap=2.0)
+    for i, confidence in enumerate([0.7, 0.9, 0.8]):
+        sightings.observe('cam-1', 7, confidence, frame_quality=0.1 * i, timestamp=100.0 + i,
+                          environment={'frame': i})
+    assert sightings.close_expired(now=103.0) == 0
+    assert sightings.close_expired(now=104.0) == 1
+
+    row, = writer.sightings
+    assert row['person_id'] == 7 and row['camera_id'] == 'cam-1'
+    assert row['frame_count'] == 3
+    assert row['best_confidence'] == pytest.approx(0.9)
+    assert row['mean_confidence'] == pytest.approx(0.8)
+    assert row['best_frame_quality'] == pytest.approx(0.2)
+    assert (row['last_seen'] - row['first_seen']).total_seconds() == pytest.approx(2.0)
+    assert '"frame": 2' in row['environment_data']
+    assert writer.detections == []
+
+def test_gap_starts_a_new_sighting(writer):
+    sightings = SightingAggregator(writer, gap=1.0)
+    sightings.observe(0, 7, 0.8, timestamp=10.0)
+    sightings.close_expired(now=12.0)
+    sightings.observe(0, 7, 0.8, timestamp=12.0)
+    sightings.close_all()
+    assert [row['frame_count'] for row in writer.sightings] == [1, 1]
+
+def test_sessions_are_keyed_per_camera_and_track(writer):
+    sightings = SightingAggregator(writer)
+    sightings.observe(0, 7, 0.8, timestamp=1.0)
+    sightings.observe(1, 7, 0.8, timestamp=1.0)
+    sightings.observe(0, None, track_id=3, timestamp=1.0)
+    sightings.observe(0, None, track_id=4, timestamp=1.0)
+    assert len(sightings.sessions) == 4
+    sightings.close_all()
+    assert sorted(row['track_id'] or 0 for row in writer.sightings) == [0, 0, 3, 4]
+
+def test_raw_detections_debug_mode(writer):
+    sightings = SightingAggregator(writer, raw_detections=True)
+    sightings.observe(0, 7, 0.8, box=(1, 2, 3, 4), timestamp=1.0)
+    sightings.observe(0, None, track_id=3, timestamp=1.0)
+    assert writer.detections == [(7, 0.8, (1, 2, 3, 4))]
@@ -0,0 +1,83 @@
+# utilities/benchmark_gallery.py
+import sys
+import os
+import time
+import argparse
+import numpy as np
+
+# Add the project root to PYTHONPATH
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.gallery import FaceGallery
+from src.search_index import BruteForceIndex, PrototypeIndex, QuantizedIndex
+
+def synthetic_gallery(size, persons, dim=128, seed=0):
+    """Several noisy encodings per person around a per-person center, like an enrolled gallery"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(scale=0.1, size=(persons, dim)).astype(np.float32)
+    person_ids = rng.integers(0, persons, size)
+    encodings = centers[person_ids] + rng.normal(scale=0.03, size=(size, dim)).astype(np.float32)
+    gallery = FaceGallery(dim=dim, capacity=size)
+    gallery.load(encodings, person_ids, person_ids.astype(str), encoding_ids=np.arange(size))
+    qualities = dict(enumerate(rng.random(size).tolist()))
+    return gallery, qualities
+
+def measure(index, queries, batch_size):
+    """
+    Time single and batched search
+    Returns: (single QPS, batched QPS, top-1 rows)
+    """
+    start = time.perf_counter()
+    for query in queries:
+        index.search(query, k=1)
+    single_qps = len(queries) / (time.perf_counter() - start)
+
+    top1 = []
+    start = time.perf_counter()
+    for offset in range(0, len(queries), batch_size):
+        top1.extend(rows[0] for rows, _ in index.search_batch(queries[offset:offset + batch_size], k=1))
+    batch_qps = len(queries) / (time.perf_counter() - start)
+    return single_qps, batch_qps, np.array(top1)
+
+def benchmark(size, persons, n_queries, batch_size, rerank, exemplars, candidates):
+    gallery, qualities = synthetic_gallery(size, persons)
+    rng = np.random.default_rng(1)
+    # Probes are fresh captures of enrolled people
+    queries = gallery.encodings[rng.integers(0, size, n_queries)] \
+        + rng.normal(scale=0.03, size=(n_queries, gallery.dim)).astype(np.float32)
+
+    exact_index = BruteForceIndex(gallery)
+    exact_index.build()
+    single_qps, batch_qps, exact_top1 = measure(exact_index, queries, batch_size)
+    print(f"Gallery of {size} encodings for {persons} persons, {n_queries} queries, batches of {batch_size}")
+    print(f"{'index':<10} {'memory MiB':>11} {'single QPS':>11} {'batch QPS':>10} {'top-1 row':>10} {'top-1 person':>13}")
+    print(f"{'float32':<10} {gallery.encodings.nbytes / 2 ** 20:>11.1f} {single_qps:>11.0f} {batch_qps:>10.0f} "
+          f"{1.0:>10.4f} {1.0:>13.4f}")
+
+    indexes = [
+        ('float16', QuantizedIndex(gallery, precision='float16', rerank=rerank)),
+        ('int8', QuantizedIndex(gallery, precision='int8', rerank=rerank)),
+        ('prototype', PrototypeIndex(gallery, qualities, n_exemplars=exemplars, n_candidates=candidates))
+    ]
+    for label, index in indexes:
+        index.build()
+        single_qps, batch_qps, top1 = measure(index, queries, batch_size)
+        same_row = np.mean(top1 == exact_top1)
+        same_person = np.mean(gallery.person_ids[top1] == gallery.person_ids[exact_top1])
+        print(f"{label:<10} {index.nbytes / 2 ** 20:>11.1f} {single_qps:>11.0f} {batch_qps:>10.0f} "
+              f"{same_row:>10.4f} {same_person:>13.4f}")
+    print("Index memory excludes the float32 rows used for exact distances, which can stay "
+          "memory-mapped from a gallery snapshot; prototypes only return exemplar rows, "
+          "so compare them by person")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare quantized and prototype gallery search with the exact scan")
+    parser.add_argument('--size', type=int, default=200000, help="Encodings in the synthetic gallery")
+    parser.add_argument('--persons', type=int, default=10000)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--rerank', type=int, default=32, help="Candidates reranked with exact distances")
+    parser.add_argument('--exemplars', type=int, default=3, help="Prototype exemplars per person")
+    parser.add_argument('--candidates', type=int, default=8, help="Persons refined after the centroid scan")
+    args = parser.parse_args()
+    benchmark(args.size, args.persons, args.queries, args.batch_size, args.rerank, args.exemplars, args.candidates)
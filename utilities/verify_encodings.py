@@ -1,21 +1,28 @@
 # utilities/verify_encodings.py
 import sys
 import os
-import numpy as np
-from src.database import KnownFace, init_db
 
 # Add the project root to PYTHONPATH
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-def verify_encodings():
-    db_session = init_db()
-    known_faces = db_session.query(KnownFace).all()
-    for face in known_faces:
-        encoding = np.frombuffer(face.face_encoding, dtype=np.float32)
-        if encoding.shape[0] != 128:
-            print(f"Encoding for {face.name} has incorrect shape: {encoding.shape}")
+from src.database import FaceEncoding, Session, unpack_encodings
+
+def verify_encodings(dim=128):
+    db_session = Session()
+    face_encodings = db_session.query(FaceEncoding).all()
+    _, valid = unpack_encodings(
+        [face.encoding_data for face in face_encodings],
+        [face.dtype for face in face_encodings],
+        dim
+    )
+    valid = set(valid.tolist())
+    for i, face in enumerate(face_encodings):
+        if i in valid:
+            print(f"Encoding {face.id} of {face.person.name} is valid ({face.dtype}, {face.model_version}).")
         else:
-            print(f"Encoding for {face.name} is valid.")
+            print(f"Encoding {face.id} of {face.person.name} is invalid: {len(face.encoding_data or b'')} bytes "
+                  f"of {face.dtype}, expected {dim} values")
+    db_session.close()
 
 if __name__ == "__main__":
-    verify_encodings()
\ No newline at end of file
+    verify_encodings()